@@ -0,0 +1,319 @@
+# alarm_engine.py：本地报警规则引擎（样本到达时在App内判断，不再依赖设备往返）
+#
+# 每条样本只更新“设备 × 规则”的少量状态，O(1)；规则变化时可在内存中的历史样本上批量重算当前报警状态
+# 支持：上下限 + 回差（滞回）+ 最短持续时间、变化速率；通知按设备和规则去抖
+# 本模块不依赖Kivy，App和无界面网关共用
+import math
+
+METRICS = ("do", "ph", "temp")
+METRIC_NAMES = {"do": "溶解氧", "ph": "PH值", "temp": "温度"}
+METRIC_UNITS = {"do": "mg/L", "ph": "", "temp": "℃"}
+
+EVENT_RAISED = "raised"    # 进入报警
+EVENT_CLEARED = "cleared"  # 报警解除
+
+DEFAULT_DEBOUNCE = 60.0  # 同一设备同一规则两次通知的最小间隔（秒）
+
+# 默认规则（App和网关共用）
+DO_RANGE_RULE = "do_range"
+DO_RATE_RULE = "do_rate"
+PH_RANGE_RULE = "ph_range"
+DO_HYSTERESIS = 0.2     # mg/L
+DO_MIN_DURATION = 10.0  # 秒，过滤单个毛刺样本
+
+
+class AlarmEvent:
+    __slots__ = ("kind", "rule", "device_id", "value", "ts")
+
+    def __init__(self, kind, rule, device_id, value, ts):
+        self.kind = kind
+        self.rule = rule
+        self.device_id = device_id
+        self.value = value
+        self.ts = ts
+
+    @property
+    def message(self):
+        name = METRIC_NAMES[self.rule.metric]
+        if self.kind == EVENT_RAISED:
+            return f"⚠️ 设备{self.device_id}{self.rule.describe(self.value)}"
+        return f"✅ 设备{self.device_id}{name}恢复正常（{self.rule.format_value(self.value)}）"
+
+
+class _RuleState:
+    """单个设备在单条规则上的状态"""
+    __slots__ = ("active", "pending_since", "anchor_ts", "anchor_value", "rate")
+
+    def __init__(self):
+        self.active = False
+        self.pending_since = None  # 条件开始满足的时间（未满足最短持续时间时）
+        self.anchor_ts = None      # 变化速率规则：计算窗口起点
+        self.anchor_value = None
+        self.rate = None
+
+
+class _Rule:
+    def __init__(self, rule_id, metric, min_duration=0.0):
+        """
+        :param rule_id: 规则编号（同一引擎内唯一）
+        :param metric: do/ph/temp
+        :param min_duration: 条件需持续满足的秒数才报警（过滤瞬时毛刺）
+        """
+        if metric not in METRICS:
+            raise ValueError(f"不支持的指标：{metric}")
+        self.rule_id = rule_id
+        self.metric = metric
+        self.min_duration = min_duration
+
+    def format_value(self, value):
+        return f"{METRIC_NAMES[self.metric]}{round(value, 2)}{METRIC_UNITS[self.metric]}"
+
+    def step(self, state, ts, value):
+        """
+        用一个样本更新状态
+        :return: EVENT_RAISED / EVENT_CLEARED / None
+        """
+        if state.active:
+            if self._cleared(state, ts, value):
+                state.active = False
+                state.pending_since = None
+                return EVENT_CLEARED
+            return None
+        if not self._triggered(state, ts, value):
+            state.pending_since = None
+            return None
+        if state.pending_since is None:
+            state.pending_since = ts
+        if ts - state.pending_since >= self.min_duration:
+            state.active = True
+            return EVENT_RAISED
+        return None
+
+
+class ThresholdRule(_Rule):
+    """上下限报警：超出[low, high]报警，回到[low + hysteresis, high - hysteresis]内才解除"""
+
+    def __init__(self, rule_id, metric, high=None, low=None, hysteresis=0.0, min_duration=0.0):
+        super().__init__(rule_id, metric, min_duration)
+        if high is None and low is None:
+            raise ValueError("上限和下限至少指定一个")
+        if high is not None and low is not None and high < low:
+            raise ValueError(f"上限{high}低于下限{low}")
+        if high is not None and low is not None and high - hysteresis < low + hysteresis:
+            raise ValueError("回差过大：解除区间为空")
+        self.high = high
+        self.low = low
+        self.hysteresis = hysteresis
+
+    def _triggered(self, state, ts, value):
+        return (self.high is not None and value > self.high) or (self.low is not None and value < self.low)
+
+    def _cleared(self, state, ts, value):
+        return ((self.high is None or value <= self.high - self.hysteresis)
+                and (self.low is None or value >= self.low + self.hysteresis))
+
+    def describe(self, value):
+        if self.high is not None and value > self.high:
+            return f"{self.format_value(value)}，高于上限{self.high}"
+        return f"{self.format_value(value)}，低于下限{self.low}"
+
+
+class RateOfChangeRule(_Rule):
+    """
+    变化速率报警：window秒内的平均变化速率（每分钟）超过max_rate报警
+    只保存窗口起点一个样本（窗口满后以当前样本为新起点），每条样本O(1)
+    """
+
+    def __init__(self, rule_id, metric, max_rate, window=120.0, hysteresis=0.0, min_duration=0.0,
+                 direction=0):
+        """
+        :param max_rate: 每分钟变化量上限（取绝对值比较）
+        :param window: 计算速率的时间窗口（秒）
+        :param hysteresis: 速率回落到max_rate - hysteresis以下才解除
+        :param direction: 0=升降都报警，-1=只报下降，1=只报上升
+        """
+        super().__init__(rule_id, metric, min_duration)
+        self.max_rate = max_rate
+        self.window = window
+        self.hysteresis = hysteresis
+        self.direction = direction
+
+    def _update_rate(self, state, ts, value):
+        if state.anchor_ts is None:
+            state.anchor_ts, state.anchor_value = ts, value
+            return
+        elapsed = ts - state.anchor_ts
+        if elapsed >= self.window:
+            state.rate = (value - state.anchor_value) / elapsed * 60
+            state.anchor_ts, state.anchor_value = ts, value
+
+    def _directed_rate(self, state):
+        if state.rate is None:
+            return 0.0
+        return abs(state.rate) if self.direction == 0 else max(0.0, state.rate * self.direction)
+
+    def step(self, state, ts, value):
+        self._update_rate(state, ts, value)
+        return super().step(state, ts, value)
+
+    def _triggered(self, state, ts, value):
+        return self._directed_rate(state) > self.max_rate
+
+    def _cleared(self, state, ts, value):
+        return self._directed_rate(state) <= self.max_rate - self.hysteresis
+
+    def describe(self, value):
+        return f"{METRIC_NAMES[self.metric]}变化过快（{self.format_value(value)}）"
+
+
+class AlarmEngine:
+    """
+    规则引擎：evaluate()在样本到达时调用；notifier(event)在报警进入/解除时调用（按设备和规则去抖）
+    非线程安全：App中只在主线程调用；网关中同一设备总由同一个工作线程处理
+    """
+
+    def __init__(self, rules=(), notifier=None, debounce=DEFAULT_DEBOUNCE):
+        """
+        :param rules: 规则列表
+        :param notifier: 通知函数notifier(AlarmEvent)
+        :param debounce: 同一设备同一规则两次“进入报警”通知的最小间隔（秒，按样本时间计算）；
+                         间隔内的反复进入/解除只记录状态，不再通知
+        """
+        self.notifier = notifier
+        self.debounce = debounce
+        self._states = {}  # (设备编号, 规则编号) -> _RuleState
+        self._last_notified = {}  # (设备编号, 规则编号) -> 最近一次进入报警通知的样本时间
+        self._suppressed = set()  # 进入报警时被去抖的(设备编号, 规则编号)，解除时也不通知
+        self._set_rules(rules)
+
+    def _set_rules(self, rules):
+        self.rules = list(rules)
+        self._by_metric = {metric: [rule for rule in self.rules if rule.metric == metric] for metric in METRICS}
+
+    def evaluate(self, device_id, ts, do_value=None, ph_value=None, temp_value=None, notify=True):
+        """
+        用一个样本更新所有相关规则（缺失字段、NaN跳过）
+        :return: 本样本产生的事件列表
+        """
+        events = self._step(self._by_metric, device_id, ts, do_value, ph_value, temp_value)
+        if notify:
+            for event in events:
+                self._notify((device_id, event.rule.rule_id), event)
+        return events
+
+    def _step(self, by_metric, device_id, ts, do_value, ph_value, temp_value):
+        events = None
+        for metric, value in (("do", do_value), ("ph", ph_value), ("temp", temp_value)):
+            if value is None or math.isnan(value):
+                continue
+            for rule in by_metric[metric]:
+                key = (device_id, rule.rule_id)
+                state = self._states.get(key)
+                if state is None:
+                    state = self._states[key] = _RuleState()
+                kind = rule.step(state, ts, value)
+                if kind is None:
+                    continue
+                if events is None:
+                    events = []
+                events.append(AlarmEvent(kind, rule, device_id, value, ts))
+        return events or []
+
+    def _notify(self, key, event, now=None):
+        """
+        :param now: 去抖所用的样本时间，默认为事件时间（重算时为重放到的最新样本时间）
+        """
+        if self.notifier is None:
+            return
+        if event.kind == EVENT_RAISED:
+            now = event.ts if now is None else now
+            last = self._last_notified.get(key)
+            if last is not None and now - last < self.debounce:
+                self._suppressed.add(key)
+                return
+            self._last_notified[key] = now
+            self._suppressed.discard(key)
+        elif key in self._suppressed:
+            self._suppressed.discard(key)
+            return
+        self.notifier(event)
+
+    def is_active(self, device_id, rule_id):
+        state = self._states.get((device_id, rule_id))
+        return state is not None and state.active
+
+    def active_alarms(self):
+        """当前处于报警状态的[(设备编号, 规则编号), ...]（可在其他线程调用，先复制再遍历）"""
+        return [key for key, state in list(self._states.items()) if state.active]
+
+    def set_rules(self, rules, histories=None, latest=None):
+        """
+        替换规则：未修改的规则（同一对象）保留当前状态；新增/修改的规则在已缓存的历史样本上重算报警状态
+        重放不逐条通知，结束时仍处于报警状态的规则按重放到的最新样本时间去抖后通知一次
+        :param histories: {设备编号: SampleRingBuffer}（内存中的历史缓冲区），不传则从下一条样本开始判断
+        :param latest: {设备编号: (ts, do, ph, temp)}，各设备最近一条样本；死区内的样本不写入历史缓冲区，
+                       重放完历史后再用它判断一次（数值稳定期间最短持续时间照常累计）
+        :return: 重算后处于报警状态的事件列表（每个设备每条规则最多一个）
+        """
+        kept_ids = {rule.rule_id for rule in rules if any(rule is old for old in self.rules)}
+        changed = [rule for rule in rules if rule.rule_id not in kept_ids]
+        self._set_rules(rules)
+        rule_ids = {rule.rule_id for rule in self.rules}
+        self._states = {key: state for key, state in self._states.items() if key[1] in kept_ids}
+        self._suppressed = {key for key in self._suppressed if key[1] in kept_ids}
+        self._last_notified = {key: ts for key, ts in self._last_notified.items() if key[1] in rule_ids}
+        histories, latest = histories or {}, latest or {}
+        if not changed:
+            return []
+        by_metric = {metric: [rule for rule in changed if rule.metric == metric] for metric in METRICS}
+        active = []
+        for device_id in sorted(set(histories) | set(latest)):
+            raised, now = {}, None
+            history = histories.get(device_id)
+            if history is not None:
+                # 按时间正序逐列读取，不为每个样本创建对象
+                columns = (history.column("ts"), history.column("do_value"),
+                           history.column("ph_value"), history.column("temp_value"))
+                for ts, do_value, ph_value, temp_value in zip(*columns):
+                    self._replay(by_metric, device_id, ts, (do_value, ph_value, temp_value), raised)
+                    now = ts
+            sample = latest.get(device_id)
+            if sample is not None and (now is None or sample[0] > now):
+                self._replay(by_metric, device_id, sample[0], sample[1:], raised)
+                now = sample[0]
+            for key, event in raised.items():
+                self._notify(key, event, now)
+                active.append(event)
+        return active
+
+    def _replay(self, by_metric, device_id, ts, values, raised):
+        """重算时用一个样本更新规则，raised记录当前处于报警状态的规则的进入事件"""
+        for event in self._step(by_metric, device_id, ts, *values):
+            key = (device_id, event.rule.rule_id)
+            if event.kind == EVENT_RAISED:
+                raised[key] = event
+            else:
+                raised.pop(key, None)
+
+
+def do_threshold_rule(max_do, min_do):
+    """用户在首页设置的溶解氧阈值对应的规则（阈值区间过窄时自动缩小回差）"""
+    hysteresis = max(0.0, min(DO_HYSTERESIS, (max_do - min_do) / 2))
+    return ThresholdRule(DO_RANGE_RULE, "do", high=max_do, low=min_do,
+                         hysteresis=hysteresis, min_duration=DO_MIN_DURATION)
+
+
+def default_rules(max_do=None, min_do=None):
+    """默认规则：PH 6~9、溶解氧每分钟变化超过1mg/L；设置了溶解氧阈值时再加上阈值规则"""
+    rules = [
+        ThresholdRule(PH_RANGE_RULE, "ph", high=9.0, low=6.0, hysteresis=0.1, min_duration=DO_MIN_DURATION),
+        RateOfChangeRule(DO_RATE_RULE, "do", max_rate=1.0, window=120.0, hysteresis=0.2),
+    ]
+    if max_do is not None:
+        rules.append(do_threshold_rule(max_do, min_do))
+    return rules
+
+
+def replace_rule(rules, rule):
+    """返回把同编号规则替换为rule后的新规则列表（不存在则追加）"""
+    return [r for r in rules if r.rule_id != rule.rule_id] + [rule]
@@ -0,0 +1,63 @@
+# app_logging.py：分级日志（格式化和输出都在后台线程完成，不阻塞网络线程/UI线程）
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+ROOT_LOGGER_NAME = "esp32"
+# 逐条打印解析后的传感器数据（数据量大，默认关闭，可在个人中心页面开启）
+PAYLOAD_LOGGER_NAME = "esp32.payload"
+
+_listener = None
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    标准QueueHandler会在调用线程里先把消息格式化好再入队；
+    这里直接把LogRecord入队，由后台线程格式化（日志参数按%s延迟格式化）
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def get_logger(name):
+    """获取模块日志器（如get_logger("mqtt") -> esp32.mqtt）"""
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def setup_logging(level=logging.INFO):
+    """
+    初始化日志：调用线程只负责入队，后台线程统一输出到控制台（Android上即logcat）
+    :param level: 全局日志级别
+    """
+    global _listener
+    if _listener is not None:
+        return
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    root.setLevel(level)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.propagate = False
+    set_payload_debug(False)
+
+
+def shutdown_logging():
+    """停止后台输出线程（会先输出完队列中剩余的日志）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def set_payload_debug(enabled):
+    """运行时开关：是否输出每条传感器数据的调试信息"""
+    logging.getLogger(PAYLOAD_LOGGER_NAME).setLevel(logging.DEBUG if enabled else logging.INFO)
+
+
+def is_payload_debug_enabled():
+    return logging.getLogger(PAYLOAD_LOGGER_NAME).isEnabledFor(logging.DEBUG)
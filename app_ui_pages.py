@@ -1,6 +1,5 @@
-import datetime
-from kivy.config import Config
-from kivymd.app import MDApp
+import time
+from threading import Thread
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.label import MDLabel
 from kivymd.uix.textfield import MDTextField
@@ -9,16 +8,97 @@ from kivy.metrics import dp
 from kivy.clock import Clock
 from kivy.core.window import Window
 from kivy.graphics import Color, Rectangle
-from kivy.uix.image import Image
-from kivy.uix.scrollview import ScrollView
+from kivy.uix.image import AsyncImage
 from kivymd.uix.scrollview import MDScrollView
-from ui_utils import NoBorderButton
-import json
+from ui_utils import NoBorderButton, PageManager, set_page_hooks, switch_page
 from kivymd.toast import toast
+from history_store import SensorHistoryStore
+from history_store import DEFAULT_DEVICE_ID
+from device_state import DeviceStateTable, sensor_values
+from history_ingest import record_samples
+from rollups import RollupTable
+from deadband import ChangeFilter, DisplayCache
+from command_queue import STATUS_PENDING, STATUS_SENT, STATUS_NAMES
+from app_logging import get_logger
+from alarm_engine import AlarmEngine, EVENT_RAISED, default_rules, do_threshold_rule, replace_rule
+from startup_profile import STARTUP
+from thresholds import THRESHOLD_TOPIC, validate_threshold, build_threshold_payload
+
+logger = get_logger("ui")
 
 # ======================== 全局变量：存储历史数据 ========================
-GLOBAL_HISTORY_DATA = []
+HISTORY_BUFFER_CAPACITY = 20000  # 每个设备在内存中保留的样本数（历史页面是虚拟化列表）
+HISTORY_PRELOAD_PER_DEVICE = 2000  # 启动时每个设备从数据库预加载的样本数
+DEVICE_TABLE = DeviceStateTable(HISTORY_BUFFER_CAPACITY)  # 设备编号 -> 最新数值 + 历史样本
+SELECTED_DEVICE_ID = DEFAULT_DEVICE_ID  # 当前界面展示的设备
 HISTORY_UPDATE_CALLBACKS = []
+DEVICE_SELECT_CALLBACKS = []
+HISTORY_STORE = None  # 持久化存储（App启动时初始化）
+ROLLUP_TABLE = RollupTable()  # 设备编号 -> 每分钟/每小时/每天聚合（长时间范围的趋势图读取）
+CHANGE_FILTER = ChangeFilter()  # 历史只记录变化超过死区的样本 + 心跳样本（个人中心可关闭）
+ALARM_ENGINE = AlarmEngine(default_rules())  # 本地报警规则（样本到达即判断，不等设备往返）
+
+def init_history_store(db_path):
+    """
+    打开持久化存储（只建表，不读数据）；每个设备最近的样本和聚合数据在后台线程读取，
+    读完后在主线程合并到内存（不阻塞首帧，读取期间收到的实时数据照常显示）
+    """
+    global HISTORY_STORE
+    HISTORY_STORE = SensorHistoryStore(db_path)
+    HISTORY_STORE.start(startup_snapshot=True)
+    Thread(target=_preload_history, args=(HISTORY_STORE,), name="history-preload", daemon=True).start()
+    return HISTORY_STORE
+
+def _preload_history(store):
+    """后台线程：从启动快照读取最近样本和聚合（不含本次运行的数据），切回主线程合并"""
+    started = time.perf_counter()
+    loaded_rollups = RollupTable()
+    try:
+        recent = store.load_startup(HISTORY_PRELOAD_PER_DEVICE, loaded_rollups)
+    except Exception:
+        logger.exception("预加载历史数据失败")
+        return
+    STARTUP.mark("历史预加载", time.perf_counter() - started)
+    Clock.schedule_once(lambda dt: _apply_preload(recent, loaded_rollups))
+
+def _apply_preload(recent, loaded_rollups):
+    """主线程：合并预加载结果（都比本次运行收到的数据旧）"""
+    ROLLUP_TABLE.merge_loaded(loaded_rollups)
+    for device_id, rows in recent.items():
+        state = DEVICE_TABLE.find(device_id)
+        if state is None:
+            for ts, do_value, ph_value, temp_value in rows:
+                DEVICE_TABLE.record(device_id, ts, do_value, ph_value, temp_value)
+        else:
+            # 已经收到实时数据：只把旧样本插到缓冲区前面，不覆盖最新数值
+            state.history.merge(rows)
+    if SELECTED_DEVICE_ID not in DEVICE_TABLE and len(DEVICE_TABLE) > 0:
+        select_device(DEVICE_TABLE.device_ids()[0])
+    if recent:
+        for cb in HISTORY_UPDATE_CALLBACKS:
+            cb({device_id: len(rows) for device_id, rows in recent.items()})
+
+def get_selected_device():
+    return SELECTED_DEVICE_ID
+
+def select_device(device_id):
+    """切换界面展示的设备，并通知已注册的页面"""
+    global SELECTED_DEVICE_ID
+    if device_id == SELECTED_DEVICE_ID:
+        return
+    SELECTED_DEVICE_ID = device_id
+    for cb in DEVICE_SELECT_CALLBACKS:
+        cb(device_id)
+
+def register_device_select_callback(callback):
+    """注册设备切换回调"""
+    if callback not in DEVICE_SELECT_CALLBACKS:
+        DEVICE_SELECT_CALLBACKS.append(callback)
+
+def unregister_device_select_callback(callback):
+    """注销设备切换回调（避免内存泄漏）"""
+    if callback in DEVICE_SELECT_CALLBACKS:
+        DEVICE_SELECT_CALLBACKS.remove(callback)
 
 def register_history_callback(callback):
     """注册历史数据更新回调"""
@@ -30,14 +110,50 @@ def unregister_history_callback(callback):
     if callback in HISTORY_UPDATE_CALLBACKS:
         HISTORY_UPDATE_CALLBACKS.remove(callback)
 
-def update_history_data(new_record):
-    """统一更新历史数据，并触发UI刷新"""
-    GLOBAL_HISTORY_DATA.insert(0, new_record)
-    if len(GLOBAL_HISTORY_DATA) > 20:
-        GLOBAL_HISTORY_DATA.pop()
+def update_history_data(ts, do_value, ph_value, temp_value, device_id=DEFAULT_DEVICE_ID, device_ts=None):
+    """统一更新历史数据（内存缓冲区 + 持久化存储），并触发UI刷新；未上传的字段传None"""
+    update_history_batch([(device_id, ts, do_value, ph_value, temp_value, device_ts)])
+
+def update_history_batch(samples):
+    """
+    批量记录样本[(设备编号, 接收时间戳, 溶解氧, PH, 温度, 设备时间戳), ...]，所有样本写完后只触发一次UI刷新
+    设备时间戳为消息中的ts字段（没有时为None），只记入数据库作为补传游标
+    回调参数为{设备编号: 新增样本数}，页面只需关心当前展示的设备
+    数值在死区内的样本只更新最新值、聚合和报警规则，不写入历史（没有新增样本时不触发回调）
+    """
+    if not samples:
+        return
+    new_counts = record_samples(samples, DEVICE_TABLE, ROLLUP_TABLE, CHANGE_FILTER, ALARM_ENGINE, HISTORY_STORE)
+    if not new_counts:
+        return
     # 触发所有注册的回调（更新UI）
     for cb in HISTORY_UPDATE_CALLBACKS:
-        cb()
+        cb(new_counts)
+
+def merge_backfill_samples(device_id, rows):
+    """
+    主线程：把设备补传的历史样本（已去重并写入数据库）按时间顺序合并到内存缓冲区和聚合
+    补传样本比实时数据旧：不更新最新数值、不经过死区过滤和报警规则
+    :param rows: [(ts, do, ph, temp), ...]，按时间正序
+    """
+    DEVICE_TABLE.get(device_id).history.merge(rows)
+    for ts, do_value, ph_value, temp_value in rows:
+        ROLLUP_TABLE.add(device_id, ts, do_value, ph_value, temp_value)
+    for cb in HISTORY_UPDATE_CALLBACKS:
+        cb({device_id: len(rows)})
+
+def set_do_threshold_rule(max_do, min_do):
+    """
+    用户修改溶解氧阈值后更新本地规则，并在内存中的历史样本上重算报警状态
+    :return: 重算后仍在报警的事件列表
+    :raises ValueError: 阈值区间无效（最高值低于最低值）
+    """
+    rule = do_threshold_rule(max_do, min_do)
+    devices = [DEVICE_TABLE.find(device_id) for device_id in DEVICE_TABLE.device_ids()]
+    histories = {device.device_id: device.history for device in devices}
+    latest = {device.device_id: (device.last_seen, device.do_value, device.ph_value, device.temp_value)
+              for device in devices if device.last_seen is not None}
+    return ALARM_ENGINE.set_rules(replace_rule(ALARM_ENGINE.rules, rule), histories, latest)
 
 # ======================== 首页构建 ========================
 def create_home_page(app_instance):
@@ -49,13 +165,27 @@ def create_home_page(app_instance):
     )
     home_layout.bind(minimum_height=home_layout.setter('height'))
     
-    # 仅注册一次MQTT回调（核心修复：避免重复注册）
-    def register_mqtt_callback(dt):
+    # 仅注册一次MQTT回调（核心修复：避免重复注册）；在页面构建完成后调用
+    def register_mqtt_callback():
         if app_instance and hasattr(app_instance, 'mqtt_client') and app_instance.mqtt_client:
             app_instance.mqtt_client.set_parsed_data_callback(update_sensor_ui_and_record_history)
+            # 指令状态可能在网络线程变化（PUBACK），切回主线程刷新
+            app_instance.mqtt_client.set_command_status_callback(
+                lambda: Clock.schedule_once(refresh_command_status))
+            refresh_command_status()
+        else:
+            logger.warning("MQTT客户端未初始化，回调注册失败")
+
+    def on_alarm(event):
+        """本地报警通知（已去抖）：写入运行日志，进入报警时额外弹出提示"""
+        if event.kind == EVENT_RAISED:
+            logger.warning(event.message)
+            toast(event.message)
         else:
-            print("⚠️ MQTT客户端未初始化，回调注册失败")
-    Clock.schedule_once(register_mqtt_callback, 0.5)
+            logger.info(event.message)
+        if app_instance:
+            app_instance._update_recv_data(event.message)
+    ALARM_ENGINE.notifier = on_alarm
 
     # ========== 顶部栏：溶解氧 + 手动开关 ==========
     top_bar = MDBoxLayout(
@@ -90,33 +220,128 @@ def create_home_page(app_instance):
         text_color=(0, 0, 1, 1)
     )
 
-    def update_sensor_ui_and_record_history(parsed_data):
-        """更新UI标签 + 记录历史数据（移除内部回调注册）"""
-        try:
-            # 1. 更新溶解氧/PH/温度UI
-            if "do" in parsed_data and parsed_data["do"] is not None:
-                do_value = round(float(parsed_data["do"]), 2)
-                do_label.text = f"溶解氧: {do_value}mg/L"
-            if "ph" in parsed_data and parsed_data["ph"] is not None:
-                ph_value = round(float(parsed_data["ph"]), 1)
-                ph_label.text = f"PH值: {ph_value}"
-            if "temp" in parsed_data and parsed_data["temp"] is not None:
-                temp_value = round(float(parsed_data["temp"]), 1)
-                temp_label.text = f"温度: {temp_value}℃"
-
-            # 2. 记录历史数据
-            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            do_val = do_label.text.replace("溶解氧: ", "").replace("mg/L", "")
-            ph_val = ph_label.text.replace("PH值: ", "")
-            temp_val = temp_label.text.replace("温度: ", "").replace("℃", "")
-            history_record = f"{current_time}: 溶解氧{do_val}mg/L | PH{ph_val} | 温度{temp_val}℃"
-            
-            update_history_data(history_record)
+    shown_values = DisplayCache()  # 标签上当前显示的数值（四舍五入后不变就不重新设置文字）
+
+    def show_device_values(state):
+        """用设备的最新数值刷新三个标签（切换设备时调用）"""
+        shown_values.clear()
+        do_label.text = "溶解氧: --mg/L" if state is None or state.do_value is None else f"溶解氧: {round(state.do_value, 2)}mg/L"
+        ph_label.text = "PH值: --" if state is None or state.ph_value is None else f"PH值: {round(state.ph_value, 1)}"
+        temp_label.text = "温度: --℃" if state is None or state.temp_value is None else f"温度: {round(state.temp_value, 1)}℃"
+
+    def update_sensor_ui_and_record_history(batch):
+        """
+        一帧内收到的全部样本：每条都按设备记录历史，标签只按当前设备的最终值更新一次
+        :param batch: [(接收时间戳, 设备编号, 数据字典), ...]（按到达顺序）
+        """
+        # 当前选中的设备从未上报过数据时，自动切换到第一个上报的设备
+        if get_selected_device() not in DEVICE_TABLE and batch:
+            select_device(batch[0][1])
+            device_label.text = f"当前设备: {get_selected_device()}"
+        # 首页隐藏时只记录历史，不格式化/更新标签（重新显示时由on_show同步最新值）
+        selected = get_selected_device() if visible else None
+        latest = {}  # 当前设备本帧最后的数值
+        samples = []
+        # 数据已在网络线程校验：异常字段已被剔除（并写入运行日志），其余字段照常显示和记录
+        for ts, device_id, parsed_data in batch:
+            do_value, ph_value, temp_value = sensor_values(parsed_data)
+            samples.append((device_id, ts, do_value, ph_value, temp_value, parsed_data.get("ts")))
+            # 其他设备只记录，不渲染
+            if device_id != selected:
+                continue
+            for metric, value in (("do", do_value), ("ph", ph_value), ("temp", temp_value)):
+                if value is not None:
+                    latest[metric] = value
+
+        # 1. 更新溶解氧/PH/温度UI（每帧最多一次，且只在显示精度下数值变化时才重新设置文字）
+        for metric, value in latest.items():
+            rounded = shown_values.changed(metric, value)
+            if rounded is None:
+                continue
+            if metric == "do":
+                do_label.text = f"溶解氧: {rounded}mg/L"
+            elif metric == "ph":
+                ph_label.text = f"PH值: {rounded}"
+            else:
+                temp_label.text = f"温度: {rounded}℃"
+
+        # 2. 记录历史数据
+        update_history_batch(samples)
+
+    visible = True
+
+    def on_device_selected(device_id):
+        """其他地方切换了设备（启动预加载完成后自动选中第一个设备）"""
+        device_label.text = f"当前设备: {device_id}"
+        show_device_values(DEVICE_TABLE.find(device_id))
+
+    def on_show():
+        nonlocal visible
+        visible = True
+        register_device_select_callback(on_device_selected)
+        on_device_selected(get_selected_device())
+        refresh_command_status()
+
+    def on_hide():
+        nonlocal visible
+        visible = False
+        unregister_device_select_callback(on_device_selected)
+
+    # ========== 设备切换栏 ==========
+    device_bar = MDBoxLayout(
+        orientation="horizontal",
+        spacing=dp(20),
+        size_hint_y=None,
+        height=dp(30)
+    )
+    device_label = MDLabel(
+        text=f"当前设备: {get_selected_device()}",
+        font_size=dp(16),
+        font_name="CustomChinese",
+        halign="left",
+        valign="middle"
+    )
+    device_btn = NoBorderButton(
+        text="切换设备",
+        size_hint_x=None,
+        width=dp(90),
+        size_hint_y=None,
+        height=dp(30)
+    )
+    device_menu = None  # 下拉菜单在第一次点击时才创建（菜单模块较大，不放在启动路径上）
 
-        except (ValueError, TypeError):
-            do_label.text = "溶解氧: 数据异常mg/L"
-            ph_label.text = "PH值: 数据异常"
-            temp_label.text = "温度: 数据异常℃"
+    def on_device_chosen(device_id):
+        device_menu.dismiss()
+        select_device(device_id)
+        device_label.text = f"当前设备: {device_id}"
+        show_device_values(DEVICE_TABLE.find(device_id))
+
+    def on_device_btn_click(instance):
+        nonlocal device_menu
+        device_ids = DEVICE_TABLE.device_ids()
+        if not device_ids:
+            toast("暂无设备上报数据")
+            return
+        if device_menu is None:
+            from kivymd.uix.menu import MDDropdownMenu
+            device_menu = MDDropdownMenu(caller=device_btn, width_mult=3)
+        # 菜单项在打开时按当前设备列表生成
+        device_menu.items = [
+            {
+                "viewclass": "OneLineListItem",
+                "text": device_id,
+                "on_release": lambda x=device_id: on_device_chosen(x),
+            }
+            for device_id in device_ids
+        ]
+        device_menu.open()
+
+    device_btn.bind(on_press=on_device_btn_click)
+    device_bar.add_widget(device_label)
+    device_bar.add_widget(device_btn)
+    home_layout.add_widget(device_bar)
+    if get_selected_device() in DEVICE_TABLE:
+        show_device_values(DEVICE_TABLE.find(get_selected_device()))
 
     switch_label = MDLabel(
         text="手动开关",
@@ -159,14 +384,16 @@ def create_home_page(app_instance):
             send_topic = "esp32/switch"
             send_result = mqtt_client.publish_command(send_topic, send_data)
             
-            if send_result:
-                toast(f"设备{cmd_desc}成功")
+            if not send_result:
+                raise Exception("指令写入队列失败")
+            if mqtt_client.connected:
+                toast(f"设备{cmd_desc}指令已发送")
             else:
-                raise Exception("MQTT未连接，数据发送失败")
+                toast(f"网络未连接，{cmd_desc}指令已加入待发送队列")
         
         except Exception as e:
             error_msg = f"❌ 开关操作失败：{str(e)}"
-            print(error_msg)
+            logger.error(error_msg)
             toast(error_msg)
 
     switch_btn.bind(on_press=toggle_switch)
@@ -250,13 +477,12 @@ def create_home_page(app_instance):
         max_val = max_textfield.text.strip()
         min_val = min_textfield.text.strip()
         
-        # 校验输入是否为数字
+        # 校验输入是否为数字，并更新本地报警规则（立即在已缓存的历史样本上重算）
         try:
-            float(max_val)
-            float(min_val)
+            set_do_threshold_rule(*validate_threshold(max_val, min_val))
         except ValueError:
-            error_msg = f"❌ 阈值输入无效：请输入数字（当前最高={max_val}，最低={min_val}）"
-            print(error_msg)
+            error_msg = f"❌ 阈值输入无效：请输入数字，且最高值不低于最低值（当前最高={max_val}，最低={min_val}）"
+            logger.error(error_msg)
             if hasattr(instance, 'app_instance') and instance.app_instance:
                 instance.app_instance._update_recv_data(error_msg)
             Clock.schedule_once(lambda x: instance.reset_button_state(), 2)
@@ -264,14 +490,10 @@ def create_home_page(app_instance):
         
         # 构造JSON数据
         try:
-            threshold_data = json.dumps({
-                "max_do": max_val,
-                "min_do": min_val,
-                "timestamp": str(datetime.datetime.now())
-            }, ensure_ascii=False)
+            threshold_data = build_threshold_payload(max_val, min_val)
         except Exception as e:
             error_msg = f"❌ 构造JSON数据失败：{str(e)}"
-            print(error_msg)
+            logger.error(error_msg)
             if hasattr(instance, 'app_instance') and instance.app_instance:
                 instance.app_instance._update_recv_data(error_msg)
             Clock.schedule_once(lambda x: instance.reset_button_state(), 2)
@@ -286,17 +508,19 @@ def create_home_page(app_instance):
             if not mqtt_client:
                 raise Exception("MQTT客户端未初始化")
             
-            send_result = mqtt_client.publish_command("esp32/threshold", threshold_data)
-            if send_result:
+            send_result = mqtt_client.publish_command(THRESHOLD_TOPIC, threshold_data)
+            if not send_result:
+                raise Exception("指令写入队列失败")
+            if mqtt_client.connected:
                 success_msg = f"✅ 阈值已发送：最高{max_val} | 最低{min_val}"
-                print(success_msg)
-                instance.app_instance._update_recv_data(success_msg)
             else:
-                raise Exception("MQTT未连接，发送失败")
+                success_msg = f"⚠️ 网络未连接，阈值已加入待发送队列：最高{max_val} | 最低{min_val}"
+            logger.info(success_msg)
+            instance.app_instance._update_recv_data(success_msg)
         
         except Exception as e:
             error_msg = f"❌ 发送阈值失败：{str(e)}"
-            print(error_msg)
+            logger.error(error_msg)
             if hasattr(instance, 'app_instance') and instance.app_instance:
                 instance.app_instance._update_recv_data(error_msg)
         
@@ -317,8 +541,7 @@ def create_home_page(app_instance):
     def on_history_click(instance):
         instance.is_pressed = True
         instance.update_button_colors()
-        print("准备切换到历史数据页面")
-        from ui_utils import switch_page
+        logger.debug("准备切换到历史数据页面")
         switch_page(app_instance, "history")
         Clock.schedule_once(lambda x: instance.reset_button_state(), 2)
     history_btn.bind(on_press=on_history_click)
@@ -329,6 +552,31 @@ def create_home_page(app_instance):
     middle_layout.add_widget(button_container)
     home_layout.add_widget(middle_layout)
 
+    # ========== 指令队列状态（待发送/等待确认/最近一条） ==========
+    command_status_label = MDLabel(
+        text="指令队列：无待发送指令",
+        font_size=dp(14),
+        font_name="CustomChinese",
+        size_hint_y=None,
+        height=dp(20),
+        theme_text_color="Custom",
+        text_color=(0.4, 0.4, 0.4, 1)
+    )
+
+    def refresh_command_status(*args):
+        mqtt_client = getattr(app_instance, 'mqtt_client', None)
+        if not mqtt_client or not visible:
+            return
+        queue = mqtt_client.command_queue
+        counts = queue.counts()
+        text = f"指令队列：待发送{counts[STATUS_PENDING]}条 | 等待确认{counts[STATUS_SENT]}条"
+        if queue.last_status:
+            topic, payload, status = queue.last_status
+            text += f" | 最近：{payload}（{STATUS_NAMES[status]}）"
+        command_status_label.text = text
+
+    home_layout.add_widget(command_status_label)
+
     # ========== 底部：PH值 + 温度展示 ==========
     sensor_layout = MDBoxLayout(
         orientation="horizontal",
@@ -347,7 +595,8 @@ def create_home_page(app_instance):
         height=dp(230),
         pos_hint={"center_x": 0.55}
     )
-    ph_table_image = Image(
+    # 图片在后台线程解码，不阻塞首帧
+    ph_table_image = AsyncImage(
         source="ph_safe_table.jpg",
         size_hint=(None, None),
         size=(dp(280), dp(280)),
@@ -372,181 +621,32 @@ def create_home_page(app_instance):
     ph_note_layout.add_widget(ph_note_label)
     home_layout.add_widget(ph_note_layout)
 
+    # MQTT客户端在构建界面之前就已启动，这里直接注册回调（不再固定延迟0.5秒）
+    # 首页常驻缓存，只构建/注册一次
+    register_mqtt_callback()
+    set_page_hooks(home_layout, on_show=on_show, on_hide=on_hide)
     return home_layout
 
-# ======================== 历史数据页面 ========================
-def create_history_page(app_instance):
-    history_layout = MDBoxLayout(
-        orientation="vertical",
-        padding=dp(20),
-        spacing=dp(10),
-        size_hint=(1, 1),
-    )
-
-    history_title = MDLabel(
-        text="设备历史数据",
-        font_size=dp(22),
-        font_name="CustomChinese",
-        halign="center",
-        bold=True,
-        size_hint_y=None,
-        height=dp(60)
-    )
-    history_layout.add_widget(history_title)
-
-    scroll_view = ScrollView(
-        size_hint=(1, 1),
-        do_scroll_x=False,
-        scroll_type=['content', 'bars'],
-        bar_width=dp(1),
-        bar_color=(0.3, 0.3, 0.3, 1),
-        bar_inactive_color=(0.8, 0.8, 0.8, 1),
-        always_overscroll=True,
-        scroll_wheel_distance=dp(20)
-    )
-
-    scroll_content = MDBoxLayout(
-        orientation="vertical",
-        spacing=dp(10),
-        size_hint=(1, None),
-        padding=dp(5)
-    )
-    scroll_content.bind(minimum_height=scroll_content.setter('height'))
-    
-    def refresh_history_ui():
-        scroll_content.clear_widgets()  # 清空原有数据
-        # 确定展示数据
-        display_data = GLOBAL_HISTORY_DATA if len(GLOBAL_HISTORY_DATA) > 0 else [
-            "暂无历史数据，请先等待设备上传数据...",
-            "2026-01-11 16:00: 溶解氧7.25mg/L | PH7.0 | 温度25.5℃"
-        ]
-        # 重新添加数据标签
-        for idx, data in enumerate(display_data):
-            data_label = MDLabel(
-                text=data,
-                font_size=dp(16),
-                font_name="CustomChinese",
-                halign="left",
-                size_hint_y=None,
-                height=dp(40),
-                theme_text_color="Custom",
-                text_color=(0.2, 0.2, 0.2, 1) if idx != 0 or len(GLOBAL_HISTORY_DATA) > 0 else (0.8, 0, 0, 1),
-                valign="middle",
-            )
-            scroll_content.add_widget(data_label)
-
-    # 初始化时先刷新一次
-    refresh_history_ui()
-    # 注册回调（切换页面时自动刷新）
-    register_history_callback(refresh_history_ui)
-
-    scroll_view.add_widget(scroll_content)
-    history_layout.add_widget(scroll_view)
-
-    # 页面销毁时注销回调（避免内存泄漏）
-    def on_remove(instance, parent):
-        unregister_history_callback(refresh_history_ui)
-    history_layout.bind(on_remove=on_remove)
-
-    return history_layout
-
-# ======================== 个人中心页面（唯一版本，删除重复定义） ========================
-def create_me_page(app_instance):
-    me_layout = MDBoxLayout(
-        orientation="vertical",
-        padding=dp(20),
-        spacing=dp(15),
-        size_hint_y=None,
-    )
-    me_layout.bind(minimum_height=me_layout.setter('height'))
-    me_layout.add_widget(MDLabel(
-        text="我的个人中心",
-        font_size=dp(20),
-        halign="center",
-        font_name="CustomChinese",
-        bold=True
-    ))
-    
-    # 显示MQTT连接状态
-    if hasattr(app_instance, 'mqtt_client') and app_instance.mqtt_client:
-        connect_status = "已连接" if app_instance.mqtt_client.connected else "未连接"
-        status_color = (0, 0.8, 0, 1) if app_instance.mqtt_client.connected else (0.8, 0, 0, 1)
-    else:
-        connect_status = "未初始化"
-        status_color = (0.5, 0.5, 0.5, 1)
-    
-    status_label = MDLabel(
-        text=f"服务器连接状态: {connect_status}",
-        font_size=dp(16),
-        font_name="CustomChinese",
-        theme_text_color="Custom",
-        text_color=status_color
-    )
-    me_layout.add_widget(status_label)
-    
-    # 设备信息
-    me_layout.add_widget(MDLabel(
-        text="设备编号：DEV-20260111",
-        font_size=dp(16),
-        font_name="CustomChinese"
-    ))
-    me_layout.add_widget(MDLabel(
-        text="当前在线：是",
-        font_size=dp(16),
-        font_name="CustomChinese"
-    ))
-
-    # ========== 添加日志显示区域（原全局的日志移到这里） ==========
-    me_layout.add_widget(MDLabel(
-        text="运行日志",
-        font_size=dp(18),
-        font_name="CustomChinese",
-        bold=True,
-        size_hint_y=None,
-        height=dp(40)
-    ))
-    # 日志滚动视图
-    log_scroll_view = ScrollView(
-        size_hint=(1, None),
-        height=dp(200),
-        do_scroll_x=False
-    )
-    # 日志标签（标记is_log_label用于main.py识别）
-    log_label = MDLabel(
-        text="", 
-        font_name="CustomChinese", 
-        size_hint_y=None,
-        valign="top",
-        halign="left"
-    )
-    log_label.is_log_label = True  # 标记为日志标签
-    log_label.bind(texture_size=log_label.setter('size'))
-    # 初始化日志内容
-    from main import recv_data_list
-    log_label.text = "\n".join(recv_data_list) + "\n"
-    log_scroll_view.add_widget(log_label)
-    me_layout.add_widget(log_scroll_view)
-
-    return me_layout
-
 # ======================== 整体UI构建 ========================
 def create_app_ui(app_instance):
     # 基础配置
     Window.orientation = 'portrait'
     screen_width, screen_height = Window.size
-    print(f"当前设备屏幕尺寸：{screen_width}×{screen_height}px")
+    logger.info("当前设备屏幕尺寸：%s×%spx", screen_width, screen_height)
     
     # 注册中文字体
     from ui_utils import register_chinese_font
-    register_chinese_font()
+    with STARTUP.phase("字体注册"):
+        register_chinese_font()
 
     # 主题配置
-    app_instance.theme_cls.primary_palette = "Blue"
-    app_instance.theme_cls.theme_style = "Light"
-    app_instance.theme_cls.font_styles.update({
-        "H5": [ "CustomChinese", 24, False, 0.15 ],
-        "Body1": [ "CustomChinese", 14, False, 0.15 ]
-    })
+    with STARTUP.phase("主题"):
+        app_instance.theme_cls.primary_palette = "Blue"
+        app_instance.theme_cls.theme_style = "Light"
+        app_instance.theme_cls.font_styles.update({
+            "H5": [ "CustomChinese", 24, False, 0.15 ],
+            "Body1": [ "CustomChinese", 14, False, 0.15 ]
+        })
 
     # 主容器
     main_container = MDBoxLayout(
@@ -563,8 +663,10 @@ def create_app_ui(app_instance):
         size_hint=(1, 1),
         pos_hint={"top": 1.0}
     )
-    app_instance.current_page = create_home_page(app_instance)
-    app_instance.page_container.add_widget(app_instance.current_page)
+    # 页面只构建一次，切换时挂载/卸载
+    app_instance.page_manager = PageManager(app_instance, app_instance.page_container)
+    with STARTUP.phase("首页构建"):
+        app_instance.page_manager.show("home")
     main_container.add_widget(app_instance.page_container)
 
     # 底部导航栏
@@ -599,7 +701,6 @@ def create_app_ui(app_instance):
         md_bg_color=(1, 1, 1, 0),
         text_color=(0, 0, 0, 1)
     )
-    from ui_utils import switch_page
     nav_item1_icon.bind(on_press=lambda x: switch_page(app_instance, "home"))
     nav_item1_text = MDLabel(
         text="首页",
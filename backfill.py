@@ -0,0 +1,367 @@
+# backfill.py：断线重连（或App重新打开）后向设备补传缺失时间段的历史数据
+#
+# 协议（JSON，沿用esp32/<设备编号>/...的主题层级）：
+#   App -> 设备  esp32/<设备编号>/backfill
+#                {"req": "3f2a9c1b", "seq": 0, "after": 1700000000.0, "until": 1700003600.0, "limit": 100}
+#                请求时间范围(after, until)内最早的limit条样本；after为游标（上一块最后一条样本的时间戳）
+#   设备 -> App  esp32/<设备编号>/backfill_data
+#                {"req": "3f2a9c1b", "seq": 0, "samples": [[ts, do, ph, temp], ...], "more": true}
+#                样本按时间正序，缺失的字段为null；more为false表示范围内没有更多样本
+#
+# 请求中的时间戳都是设备时钟：实时数据带ts字段时，缺失时间段为(断开前最后一条实时样本的ts, 重连后第一条实时样本的ts)，
+# 确定缺失时间段不受手机时钟偏差影响；设备时间游标持久化在devices表（历史写入线程与样本在同一事务中更新）
+# 历史数据库的ts列是手机接收时间：补传样本写入前按时钟偏差（重连后第一条实时样本的接收时间 - 设备时间戳）
+# 换算为接收时间，与实时样本按同一时钟排序；设备时间戳只记入devices表的device_ts游标
+# 实时数据不带ts的旧固件只能按接收时间确定缺失时间段（要求设备已NTP校时），样本时间戳直接写入
+#
+# 同一时间只有一个请求在途：处理完一块才请求下一块，请求编号或序号不符的响应（超时重发后迟到的、重复的）直接丢弃；
+# 超时后用同一游标重发（幂等），连续失败retries次后放弃该设备（不支持补传的旧固件也是这样）
+# 限流：两个请求至少间隔interval秒；实时数据队列积压时暂停补传，实时数据始终优先
+# 去重：换算后与已有样本时间戳相差不超过DEDUPE_TOLERANCE秒的视为同一样本（偏差估计含网络延迟，不能要求完全相等）；
+#       同一块的重复投递换算结果相同，由主键直接忽略
+# 补传的样本直接写入历史（含聚合），不经过死区过滤和报警规则（都是过去的数据）；本模块不依赖Kivy
+import json
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from threading import Thread, Event, Lock
+
+from app_logging import get_logger
+from metrics import BACKFILL_ROWS, QUEUE_DEPTH
+from mqtt_reconnect import STATE_CONNECTED
+from sensor_schema import SENSOR_SCHEMA, METRIC_FIELDS
+
+logger = get_logger("backfill")
+
+BACKFILL_REQUEST_TOPIC = "esp32/{}/backfill"
+BACKFILL_DATA_TOPIC = "esp32/{}/backfill_data"
+BACKFILL_DATA_WILDCARD = "esp32/+/backfill_data"
+
+DEFAULT_CHUNK_SIZE = 100      # 每块最多样本数（设备端一条MQTT消息约6KB）
+DEFAULT_INTERVAL = 0.5        # 两个请求的最小间隔（秒），即补传最多约200条/秒
+DEFAULT_TIMEOUT = 5.0         # 等待一块响应的秒数
+DEFAULT_RETRIES = 3
+DEFAULT_MAX_SPAN = 86400.0    # 最多补传最近多少秒
+MIN_GAP = 5.0                 # 缺失时间段短于该秒数时不补传
+BUSY_QUEUE_DEPTH = 1000       # 实时数据待处理样本数超过该值时暂停补传
+DEDUPE_TOLERANCE = 0.5        # 补传样本与已有样本的去重容差（秒）
+
+
+def device_id_from_backfill_topic(topic):
+    """
+    :return: 补传响应主题中的设备编号；不是补传响应主题时返回None
+    """
+    parts = topic.split("/")
+    if len(parts) == 3 and parts[0] == "esp32" and parts[2] == "backfill_data" and parts[1]:
+        return parts[1]
+    return None
+
+
+def build_request(request_id, seq, after, until, limit):
+    return json.dumps({"req": request_id, "seq": seq, "after": after, "until": until, "limit": limit})
+
+
+def parse_response(payload):
+    """
+    :return: 响应字典（已检查req/seq/samples字段）
+    :raises ValueError: 格式错误
+    """
+    response = json.loads(payload.decode("utf-8") if isinstance(payload, (bytes, bytearray)) else payload)
+    if (not isinstance(response, dict) or not isinstance(response.get("req"), str)
+            or type(response.get("seq")) is not int or not isinstance(response.get("samples"), list)):
+        raise ValueError("补传响应缺少req/seq/samples字段")
+    return response
+
+
+def validate_samples(samples, after, until):
+    """
+    逐条校验补传样本（与实时数据相同的字段规则），只保留时间范围(after, until)内至少有一个有效数值的样本
+    :return: ([(ts, do, ph, temp), ...]按时间正序, 无效条数)
+    """
+    rows, invalid = [], 0
+    for sample in samples:
+        if not isinstance(sample, list) or len(sample) != 4:
+            invalid += 1
+            continue
+        values, _ = SENSOR_SCHEMA.validate(dict(zip(("ts",) + METRIC_FIELDS, sample)))
+        ts = values.get("ts")
+        if ts is None or not after < ts < until or not any(name in values for name in METRIC_FIELDS):
+            invalid += 1
+            continue
+        rows.append((ts, values.get("do"), values.get("ph"), values.get("temp")))
+    rows.sort(key=lambda row: row[0])
+    return rows, invalid
+
+
+class BackfillManager:
+    """
+    在独立线程中逐个设备补传：连上后确定每个设备的缺失时间段，分块请求、校验、去重、写入历史数据库
+    网络线程只调用observe/on_response/连接状态监听（O(1)，不做IO）
+    """
+
+    def __init__(self, client, store, on_samples=None, chunk_size=DEFAULT_CHUNK_SIZE, interval=DEFAULT_INTERVAL,
+                 timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, max_span=DEFAULT_MAX_SPAN,
+                 busy_depth=BUSY_QUEUE_DEPTH):
+        """
+        :param client: Esp32MqttClient
+        :param store: SensorHistoryStore
+        :param on_samples: 每块写入数据库后调用on_samples(设备编号, [(ts, do, ph, temp), ...])（在补传线程执行，
+                           App在这里切回主线程合并到内存中的历史缓冲区和聚合）
+        :param chunk_size: 每块最多样本数
+        :param interval: 两个请求的最小间隔（秒）
+        :param timeout: 等待一块响应的秒数
+        :param retries: 同一块连续超时的重发次数
+        :param max_span: 最多补传最近多少秒
+        :param busy_depth: 实时数据待处理样本数超过该值时暂停补传
+        """
+        self.client = client
+        self.store = store
+        self.on_samples = on_samples
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.timeout = timeout
+        self.retries = retries
+        self.max_span = max_span
+        self.busy_depth = busy_depth
+        self.backfilled = 0   # 累计写入的补传样本数
+        self.duplicates = 0   # 与已有样本重复而丢弃的条数
+        self._lock = Lock()
+        self._wakeup = Event()
+        self._stopped = Event()
+        self._thread = None
+        self._connected = False
+        self._generation = 0         # 每次连上/断开加1，断开后进行中的补传作废
+        self._connected_at = None    # 最近一次连上的时间（time.time()），未连接时为None
+        self._last_live = {}         # 设备编号 -> 最近一条实时样本的(接收时间, 设备时间戳或None)
+        self._live_at_connect = {}   # 连上时的_last_live快照（之后到达的实时数据不影响缺失时间段）
+        self._first_live = {}        # 设备编号 -> 连上后第一条实时样本的(接收时间, 设备时间戳或None)
+        self._responses = deque()    # 网络线程收到的(设备编号, 原始负载)
+        self._unfinished = []        # 中断时尚未补传的[(设备编号, (游标, 截止时间, 时钟偏差)), ...]，下次连上后继续（只在补传线程访问）
+
+    def start(self):
+        self.client.backfill = self
+        self.client.add_state_listener(self._on_state)
+        self._thread = Thread(target=self._run, name="backfill", daemon=True)
+        self._thread.start()
+        self._on_state()  # 启动前可能已经连上
+
+    def stop(self, timeout=5.0):
+        self.client.remove_state_listener(self._on_state)
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ======================== 网络线程 ========================
+    def observe(self, device_id, device_ts=None):
+        """
+        收到一条实时样本（断线后从这里开始缺失）
+        :param device_ts: 消息中设备时钟的时间戳（没有时为None）
+        """
+        sample = (time.time(), device_ts)
+        self._last_live[device_id] = sample
+        if self._connected_at is not None and device_id not in self._first_live:
+            self._first_live[device_id] = sample  # 缺失时间段的终点
+
+    def on_response(self, device_id, payload):
+        self._responses.append((device_id, payload))
+        self._wakeup.set()
+
+    def _on_state(self):
+        # 状态监听在RTT更新时也会调用，只关心连上/断开
+        connected = self.client.state == STATE_CONNECTED
+        if connected == self._connected:
+            return
+        self._connected = connected
+        with self._lock:
+            self._generation += 1
+            if connected:
+                self._connected_at = time.time()
+                self._live_at_connect = dict(self._last_live)
+                self._first_live = {}
+            else:
+                self._connected_at = None
+        self._wakeup.set()
+
+    # ======================== 补传线程 ========================
+    def _current(self, generation):
+        return self._generation == generation and not self._stopped.is_set()
+
+    def _run(self):
+        handled = 0
+        while not self._stopped.is_set():
+            with self._lock:
+                generation, connected_at, live = self._generation, self._connected_at, self._live_at_connect
+            if connected_at is None or generation == handled:
+                # 先检查再等待：补传过程中发生的重连不会因为事件已被清除而漏掉
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            handled = generation
+            try:
+                self._backfill_all(generation, connected_at, live)
+            except Exception:
+                logger.exception("补传历史数据失败")
+
+    def _backfill_all(self, generation, connected_at, live):
+        """为每个已知设备补传(最后一条已知样本, 重连后第一条样本)之间的数据，先继续上次中断的时间段"""
+        self.store.flush()
+        cursors = self.store.device_cursors()
+        gaps, self._unfinished = self._unfinished, []
+        for device_id in sorted(set(cursors) | set(live)):
+            gaps.append((device_id, None))
+        for index, (device_id, gap) in enumerate(gaps):
+            if gap is None:
+                gap = self._gap(generation, device_id, cursors.get(device_id), live.get(device_id), connected_at)
+            if not self._current(generation):
+                self._unfinished.extend(gaps[index:])
+                return
+            if gap is not None:
+                self._backfill_device(generation, device_id, *gap)
+
+    def _gap(self, generation, device_id, stored, live, connected_at):
+        """
+        确定设备的缺失时间段
+        :param stored: 数据库中的(接收时间, 设备时间戳)
+        :param live: 连上前最后一条实时样本的(接收时间, 设备时间戳)
+        :return: (after, until, 时钟偏差)，时钟偏差为接收时间 - 设备时间，旧固件（按接收时间补传）为None；
+                 不需要补传时返回None
+        """
+        received, device_ts = stored or (0.0, None)
+        if live is not None:
+            received = max(received, live[0])
+            if live[1] is not None and (device_ts is None or live[1] > device_ts):
+                device_ts = live[1]
+        if device_ts is None:
+            # 旧固件：按接收时间
+            after, until, skew = received, connected_at, None
+        else:
+            first = self._first_live_sample(generation, device_id)
+            if first is not None and first[1] is not None:
+                skew = first[0] - first[1]
+                until = first[1]
+            else:
+                # 设备暂时没有发实时数据：按上次的时钟偏差估计连上时的设备时间
+                skew = received - device_ts
+                until = connected_at - skew
+            after = device_ts
+        after = max(after, until - self.max_span)
+        if until - after < MIN_GAP:
+            return None
+        return after, until, skew
+
+    def _first_live_sample(self, generation, device_id):
+        """等待连上后该设备的第一条实时样本（最多timeout秒）"""
+        deadline = time.monotonic() + self.timeout
+        while self._current(generation):
+            first = self._first_live.get(device_id)
+            if first is not None or time.monotonic() >= deadline:
+                return first
+            self._stopped.wait(0.05)
+        return None
+
+    def _backfill_device(self, generation, device_id, after, until, skew=None):
+        request_id = uuid.uuid4().hex[:8]
+        topic = BACKFILL_REQUEST_TOPIC.format(device_id)
+        seq, failures, written, cursor = 0, 0, 0, after
+        last_request = 0.0
+        logger.info("开始补传设备%s：%.0f秒", device_id, until - after)
+        while True:
+            last_request = self._pace(generation, last_request)
+            sent = last_request is not None and self.client.publish_transient(
+                topic, build_request(request_id, seq, cursor, until, self.chunk_size))
+            response = self._wait_response(generation, device_id, request_id, seq) if sent else None
+            if not self._current(generation) or not sent:
+                # 已断开/停止：已写入的部分保留，剩余的时间段下次连上后继续
+                logger.info("设备%s补传中断，已写入%d条", device_id, written)
+                self._unfinished.append((device_id, (cursor, until, skew)))
+                return
+            if response is None:
+                failures += 1
+                if failures > self.retries:
+                    logger.info("设备%s没有响应补传请求，已放弃（可能不支持补传）", device_id)
+                    break
+                continue
+            failures = 0
+            rows, invalid = validate_samples(response["samples"], cursor, until)
+            if invalid:
+                logger.warning("设备%s补传数据中有%d条无效样本", device_id, invalid)
+            written += self._merge(device_id, rows, skew)
+            seq += 1
+            if not rows or not response.get("more"):
+                break
+            cursor = rows[-1][0]
+        if written:
+            self.client.data_callback(f"✅ 已补传设备{device_id}离线期间的{written}条历史数据")
+
+    def _pace(self, generation, last_request):
+        """
+        限流：距上个请求不足interval秒时等待；实时数据积压时继续等待
+        :return: 本次请求的时间；等待期间断开/停止时返回None
+        """
+        delay = last_request + self.interval - time.monotonic()
+        if delay > 0 and self._stopped.wait(delay):
+            return None
+        while QUEUE_DEPTH.samples()[0][1] > self.busy_depth:
+            if self._stopped.wait(self.interval) or not self._current(generation):
+                return None
+        return time.monotonic() if self._current(generation) else None
+
+    def _wait_response(self, generation, device_id, request_id, seq):
+        """
+        等待与请求编号、序号都匹配的响应
+        :return: 响应字典；超时/断开时返回None
+        """
+        deadline = time.monotonic() + self.timeout
+        while self._current(generation):
+            while self._responses:
+                source, payload = self._responses.popleft()
+                try:
+                    response = parse_response(payload)
+                except ValueError as e:
+                    logger.warning("设备%s补传响应格式错误：%s", source, e)
+                    continue
+                if source == device_id and response["req"] == request_id and response["seq"] == seq:
+                    return response
+                logger.debug("丢弃过期的补传响应：%s %s #%s", source, response["req"], response["seq"])
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self._wakeup.wait(remaining)
+            self._wakeup.clear()
+        return None
+
+    def _merge(self, device_id, rows, skew=None):
+        """
+        样本时间戳换算为接收时间，去掉数据库中已有的样本（重复投递、断开前后的重叠部分），其余按时间顺序写入历史
+        :param rows: [(设备时间戳, do, ph, temp), ...]
+        :param skew: 时钟偏差（接收时间 - 设备时间）；None表示rows已是接收时间（旧固件）
+        """
+        if not rows:
+            return 0
+        if skew is not None:
+            rows = [(ts + skew, do_value, ph_value, temp_value, ts) for ts, do_value, ph_value, temp_value in rows]
+        else:
+            rows = [row + (None,) for row in rows]
+        self.store.flush()  # 刚收到的实时样本也参与去重
+        existing = [row[1] for row in self.store.query_range(rows[0][0] - DEDUPE_TOLERANCE,
+                                                             rows[-1][0] + DEDUPE_TOLERANCE + 1, device_id)]
+        fresh = [row for row in rows if not _has_near(existing, row[0])]
+        # 按设备时间补传时推进设备时间游标；按接收时间补传（旧固件）时设备时间戳不可作为游标
+        for ts, do_value, ph_value, temp_value, device_ts in fresh:
+            self.store.append(ts, do_value, ph_value, temp_value, device_id, device_ts=device_ts)
+        fresh = [row[:4] for row in fresh]
+        self.duplicates += len(rows) - len(fresh)
+        self.backfilled += len(fresh)
+        BACKFILL_ROWS.inc(len(fresh))
+        if fresh and self.on_samples is not None:
+            self.on_samples(device_id, fresh)
+        return len(fresh)
+
+
+def _has_near(sorted_ts, ts, tolerance=DEDUPE_TOLERANCE):
+    """有序时间戳列表中是否有与ts相差不超过tolerance的值"""
+    index = bisect_left(sorted_ts, ts - tolerance)
+    return index < len(sorted_ts) and sorted_ts[index] <= ts + tolerance
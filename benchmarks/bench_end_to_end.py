@@ -0,0 +1,432 @@
+# bench_end_to_end.py：端到端基准测试（模拟ESP32设备群 -> Broker -> Esp32MqttClient -> 首页更新路径）
+# 输出JSON结果（吞吐、p50/p99延迟、丢失条数、内存增长），可与基线对比发现性能回退
+#
+# 运行（默认启动进程内Broker替身，无界面模式，可在CI中运行；无界面模式的首页是替身，见HeadlessHomeSink）：
+#   python benchmarks/bench_end_to_end.py --devices 50 --rate 10 --duration 10 --output result.json
+#   python benchmarks/bench_end_to_end.py --payload bin1 --baseline result.json --tolerance 0.2
+# 驱动真实的Kivy首页（需要图形界面，Linux服务器上可用xvfb-run）：
+#   python benchmarks/bench_end_to_end.py --sink ui
+# 使用外部Broker（不带TLS）：--host 127.0.0.1 --port 1883
+#
+# 延迟 = 收到样本并完成首页更新的时间 - 设备发布时间：
+#   两种格式都借用ts字段携带毫秒时间（对2^32取模）：客户端只转发通过校验的字段，自定义字段不会到达首页
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import paho.mqtt.client as mqtt  # noqa: E402
+from mqtt_stub_broker import StubBroker  # noqa: E402
+from sensor_codec import encode_sensor_binary  # noqa: E402
+
+PAYLOAD_SHAPES = ("json", "json-partial", "bin1")
+FRAME_SECONDS = 1 / 60  # 无界面模式模拟的帧间隔（与Kivy默认帧率一致）
+
+
+# ======================== 模拟设备群（独立进程，避免和被测客户端争抢GIL） ========================
+def make_payload(shape, rng):
+    do_value = round(rng.uniform(5, 9), 2)
+    ph_value = round(rng.uniform(6.5, 8), 2)
+    temp_value = round(rng.uniform(20, 30), 1)
+    sent_ms = int(time.time() * 1000) & 0xFFFFFFFF
+    if shape == "bin1":
+        return encode_sensor_binary(do_value, ph_value, temp_value, ts=sent_ms)
+    if shape == "json-partial":
+        return json.dumps({"do": do_value, "ts": sent_ms})
+    return json.dumps({"do": do_value, "ph": ph_value, "temp": temp_value, "ts": sent_ms})
+
+
+def run_fleet(host, port, devices, rate, duration, shape, connections, result_queue):
+    """
+    devices台设备，每台每秒rate条，共用connections个MQTT连接（每台设备有自己的主题）
+    结束后把实际发出的条数放入result_queue
+    """
+    rng = random.Random(1)
+    clients = []
+    for index in range(connections):
+        client = mqtt.Client(client_id=f"bench-fleet-{index}")
+        client.connect(host, port, 60)
+        client.loop_start()
+        clients.append(client)
+    topics = [f"esp32/bench{index:04d}/sensor" for index in range(devices)]
+    total_rate = devices * rate
+    total = int(total_rate * duration)
+    sent = 0
+    started = time.perf_counter()
+    for seq in range(total):
+        delay = started + seq / total_rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        device = seq % devices
+        info = clients[device % connections].publish(topics[device], make_payload(shape, rng), qos=0)
+        if info.rc == mqtt.MQTT_ERR_SUCCESS:
+            sent += 1
+    time.sleep(0.5)  # 等待发送缓冲区清空
+    for client in clients:
+        client.loop_stop()
+        client.disconnect()
+    result_queue.put({"sent": sent, "publish_seconds": time.perf_counter() - started})
+
+
+# ======================== 接收端统计 ========================
+def latency_of(parsed_data, now):
+    """从样本中取出发布时间，返回延迟（秒）"""
+    return ((int(now * 1000) - int(parsed_data["ts"])) & 0xFFFFFFFF) / 1000
+
+
+class Recorder:
+    def __init__(self):
+        self.received = 0      # 客户端解析后交给分发器的条数
+        self.latencies = []    # 完成首页更新的样本的延迟
+        self.first = None
+        self.last = None
+        self._lock = threading.Lock()
+
+    def count_received(self):
+        with self._lock:
+            self.received += 1
+
+    def record_batch(self, batch):
+        now = time.time()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.latencies.extend(latency_of(parsed_data, now) for _, _, parsed_data in batch)
+
+
+class CountingDispatcher:
+    """包装真正的分发器：统计客户端交出的条数"""
+
+    def __init__(self, inner, recorder):
+        self.inner = inner
+        self.recorder = recorder
+
+    def push(self, device_id, parsed_data, ts=None):
+        self.recorder.count_received()
+        self.inner.push(device_id, parsed_data, ts)
+
+
+def rss_mb():
+    """当前进程常驻内存（MB）"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576
+    except OSError:
+        import resource  # 非Linux：只能取到峰值
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1048576 if sys.platform == "darwin" else peak / 1024
+
+
+class MemorySampler:
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+
+    def start(self):
+        self.samples.append(rss_mb())
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.samples.append(rss_mb())
+
+    def stop(self):
+        self._stop.set()
+        self.samples.append(rss_mb())
+
+
+# ======================== 无界面模式：不依赖Kivy，复现首页每帧的数据处理 ========================
+class HeadlessHomeSink:
+    """
+    无界面模式下首页路径的替身（不是真实的首页，真实首页用--sink ui）：
+    - 真实代码：接收队列（BoundedIngestQueue）、历史记录路径record_samples（死区过滤、设备状态、聚合、
+      历史数据库、报警规则，与App的update_history_batch相同）
+    - 模拟部分：Kivy Clock换成每1/60秒取一次队列的帧线程；标签只格式化文本，不创建控件
+    """
+
+    def __init__(self, recorder, db_path, queue_maxlen=10000):
+        from alarm_engine import AlarmEngine, default_rules
+        from deadband import ChangeFilter
+        from device_state import DeviceStateTable, sensor_values
+        from history_store import SensorHistoryStore
+        from ingest_queue import BoundedIngestQueue
+        from rollups import RollupTable
+        self._sensor_values = sensor_values
+        self.recorder = recorder
+        self.devices = DeviceStateTable(20000)
+        self.rollups = RollupTable()
+        self.change_filter = ChangeFilter()
+        self.alarms = AlarmEngine(default_rules())
+        self.store = SensorHistoryStore(db_path) if db_path else None
+        self._queue = BoundedIngestQueue(queue_maxlen)
+        self._stop = threading.Event()
+        self.label_texts = None
+
+    def start(self):
+        if self.store:
+            self.store.start()
+        threading.Thread(target=self._frame_loop, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        self._queue.close()
+        if self.store:
+            self.store.close()
+
+    def push(self, device_id, parsed_data, ts=None):
+        self._queue.put((time.time() if ts is None else ts, device_id, parsed_data))
+
+    def _frame_loop(self):
+        while not self._stop.wait(FRAME_SECONDS):
+            batch = self._queue.drain()
+            if batch:
+                self._update(batch)
+
+    def _update(self, batch):
+        from history_ingest import record_samples
+        texts = None
+        samples = []
+        for ts, device_id, parsed_data in batch:
+            do_value, ph_value, temp_value = self._sensor_values(parsed_data)
+            # 与首页相同：ts字段作为设备时间戳记入数据库（基准测试中是发送时间，只占位）
+            samples.append((device_id, ts, do_value, ph_value, temp_value, parsed_data.get("ts")))
+            if do_value is not None:
+                texts = f"溶解氧: {round(do_value, 2)}mg/L"
+        record_samples(samples, self.devices, self.rollups, self.change_filter, self.alarms, self.store)
+        self.label_texts = texts
+        self.recorder.record_batch(batch)
+
+
+def run_headless(args, host, port, fleet_start):
+    from esp32_mqtt_utils import Esp32MqttClient
+    recorder = Recorder()
+    connected = threading.Event()
+    db_dir = tempfile.mkdtemp(prefix="bench-e2e-")
+    sink = HeadlessHomeSink(recorder, None if args.no_store else os.path.join(db_dir, "history.db"))
+    sink.start()
+    client = Esp32MqttClient(host, port, None, None,
+                             lambda content: connected.set() if "连接成功" in content else None,
+                             use_tls=False, dispatcher=CountingDispatcher(sink, recorder))
+    client.start_mqtt()
+    if not connected.wait(10):
+        raise SystemExit("无法连接Broker")
+    time.sleep(0.2)  # 等待订阅生效
+    memory = MemorySampler()
+    memory.start()
+    fleet_result = fleet_start()
+    wait_for_drain(recorder, args.drain_timeout)
+    memory.stop()
+    client.stop_mqtt()
+    sink.stop()
+    return recorder, memory, fleet_result
+
+
+# ======================== 界面模式：驱动真实的App和首页 ========================
+def run_ui(args, host, port, fleet_start):
+    from kivy.clock import Clock
+    from esp32_mqtt_utils import Esp32MqttClient
+    from command_queue import OutboundCommandQueue
+    from main import Esp32MobileApp
+
+    recorder = Recorder()
+    memory = MemorySampler()
+    data_dir = tempfile.mkdtemp(prefix="bench-e2e-ui-")
+    outcome = {}
+
+    class BenchApp(Esp32MobileApp):
+        @property
+        def user_data_dir(self):
+            return data_dir  # 使用临时目录，不污染真实的历史数据库
+
+        def _init_mqtt_client(self):
+            self.mqtt_client = Esp32MqttClient(host, port, None, None, self._update_recv_data,
+                                               command_queue=OutboundCommandQueue(), use_tls=False)
+            bridge = self.mqtt_client.sensor_bridge
+            self.mqtt_client.sensor_bridge = CountingDispatcher(bridge, recorder)
+            self.mqtt_client.start_mqtt()
+            # 首页在0.5秒后注册数据回调，之后再包装回调、启动设备群
+            Clock.schedule_once(self._attach_recorder, 1.0)
+
+        def _attach_recorder(self, dt):
+            home_callback = self.mqtt_client.parsed_data_callback
+            if home_callback is None:
+                self.stop()
+                raise SystemExit("首页未注册数据回调，无法测量")
+
+            def timed_callback(batch):
+                home_callback(batch)  # 更新首页标签并记录历史
+                recorder.record_batch(batch)
+            self.mqtt_client.parsed_data_callback = timed_callback
+            memory.start()
+            threading.Thread(target=self._drive_fleet, daemon=True).start()
+
+        def _drive_fleet(self):
+            outcome["fleet"] = fleet_start()
+            wait_for_drain(recorder, args.drain_timeout)
+            memory.stop()
+            Clock.schedule_once(lambda dt: self.stop())
+
+    BenchApp().run()
+    return recorder, memory, outcome.get("fleet", {"sent": 0, "publish_seconds": 0})
+
+
+def wait_for_drain(recorder, timeout):
+    """设备群发完后，等待接收端处理完积压（连续1秒没有新样本，或超时）"""
+    deadline = time.time() + timeout
+    last_count = -1
+    while time.time() < deadline:
+        count = len(recorder.latencies)
+        if count == last_count:
+            return
+        last_count = count
+        time.sleep(1)
+
+
+# ======================== 结果与基线对比 ========================
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def build_result(args, recorder, memory, fleet_result, broker):
+    latencies = sorted(recorder.latencies)
+    processed = len(latencies)
+    elapsed = (recorder.last - recorder.first) if processed > 1 else 0
+    sent = fleet_result["sent"]
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "benchmark": "end_to_end",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "sink": args.sink,
+            "devices": args.devices,
+            "rate_per_device": args.rate,
+            "duration": args.duration,
+            "payload": args.payload,
+            "connections": args.connections,
+            "history_store": not args.no_store,
+            "broker": "stub" if broker else f"{args.host}:{args.port}",
+        },
+        "results": {
+            "sent": sent,
+            "broker_routed": broker.routed if broker else None,  # 含客户端自身发布的格式声明
+            "received": recorder.received,
+            "processed": processed,
+            "dropped": sent - processed,
+            "drop_rate": round((sent - processed) / sent, 6) if sent else None,
+            "msgs_per_sec": round(processed / elapsed, 1) if elapsed else None,
+            "latency_ms": {
+                "p50": ms(percentile(latencies, 0.50)),
+                "p90": ms(percentile(latencies, 0.90)),
+                "p99": ms(percentile(latencies, 0.99)),
+                "max": ms(latencies[-1] if latencies else None),
+            },
+            "memory_mb": {
+                "start": round(memory.samples[0], 2),
+                "end": round(memory.samples[-1], 2),
+                "peak": round(max(memory.samples), 2),
+                "growth": round(memory.samples[-1] - memory.samples[0], 2),
+            },
+        },
+    }
+
+
+def compare_with_baseline(result, baseline, tolerance):
+    """
+    与基线对比，返回性能回退项列表
+    吞吐下降、p99延迟上升超过tolerance比例，或丢失率上升，都视为回退
+    """
+    current, base = result["results"], baseline["results"]
+    regressions = []
+    if base.get("msgs_per_sec") and current["msgs_per_sec"] is not None \
+            and current["msgs_per_sec"] < base["msgs_per_sec"] * (1 - tolerance):
+        regressions.append(f"吞吐下降：{current['msgs_per_sec']} < {base['msgs_per_sec']}")
+    base_p99, p99 = base["latency_ms"].get("p99"), current["latency_ms"]["p99"]
+    if base_p99 and p99 is not None and p99 > base_p99 * (1 + tolerance):
+        regressions.append(f"p99延迟上升：{p99}ms > {base_p99}ms")
+    if base.get("drop_rate") is not None and current["drop_rate"] is not None \
+            and current["drop_rate"] > base["drop_rate"] + 0.001:
+        regressions.append(f"丢失率上升：{current['drop_rate']} > {base['drop_rate']}")
+    if base["memory_mb"].get("growth") is not None \
+            and current["memory_mb"]["growth"] > max(base["memory_mb"]["growth"] * (1 + tolerance),
+                                                     base["memory_mb"]["growth"] + 5):
+        regressions.append(f"内存增长变大：{current['memory_mb']['growth']}MB > {base['memory_mb']['growth']}MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端性能基准（模拟ESP32设备群）")
+    parser.add_argument("--host", help="外部Broker地址（不指定则启动进程内Broker替身）")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--devices", type=int, default=50, help="模拟设备数")
+    parser.add_argument("--rate", type=float, default=10.0, help="每台设备每秒发送条数")
+    parser.add_argument("--duration", type=float, default=10.0, help="发送时长（秒）")
+    parser.add_argument("--payload", choices=PAYLOAD_SHAPES, default="json", help="数据格式")
+    parser.add_argument("--connections", type=int, default=8, help="设备群使用的MQTT连接数")
+    parser.add_argument("--sink", choices=("headless", "ui"), default="headless",
+                        help="headless：不依赖Kivy复现首页数据处理；ui：驱动真实App（需要图形界面）")
+    parser.add_argument("--no-store", action="store_true", help="不写历史数据库")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="发送结束后等待处理积压的最长时间（秒）")
+    parser.add_argument("--output", help="结果JSON文件路径（同时输出到标准输出）")
+    parser.add_argument("--baseline", help="基线结果JSON，有性能回退时退出码为1")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="与基线对比的容差比例")
+    args = parser.parse_args()
+    args.connections = max(1, min(args.connections, args.devices))
+
+    broker = None
+    host, port = args.host, args.port
+    if not host:
+        broker = StubBroker().start()
+        host, port = broker.host, broker.port
+
+    def fleet_start():
+        # spawn：设备群进程不继承被测进程的线程和Kivy状态
+        context = multiprocessing.get_context("spawn")
+        result_queue = context.Queue()
+        process = context.Process(target=run_fleet, args=(
+            host, port, args.devices, args.rate, args.duration, args.payload, args.connections, result_queue))
+        process.start()
+        fleet_result = result_queue.get()
+        process.join()
+        return fleet_result
+
+    if args.sink == "ui":
+        recorder, memory, fleet_result = run_ui(args, host, port, fleet_start)
+    else:
+        recorder, memory, fleet_result = run_headless(args, host, port, fleet_start)
+    if broker:
+        broker.stop()
+
+    result = build_result(args, recorder, memory, fleet_result, broker)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = compare_with_baseline(result, json.load(baseline_file), args.tolerance)
+        for item in regressions:
+            print(f"性能回退：{item}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# bench_mqtt_transport.py：对比MQTT两种传输模式（独立网络线程 / asyncio事件循环）的吞吐量和端到端延迟
+# 需要一个本地测试Broker（不带TLS），例如：mosquitto -p 1883
+# 运行：python benchmarks/bench_mqtt_transport.py --host 127.0.0.1 --port 1883 [--count 20000] [--ui-work-ms 2]
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import paho.mqtt.client as mqtt  # noqa: E402
+from esp32_mqtt_utils import Esp32MqttClient, TRANSPORT_THREAD, TRANSPORT_ASYNCIO  # noqa: E402
+
+TOPIC = "esp32/bench/sensor"
+
+
+class LatencyRecorder:
+    """替换客户端的sensor_bridge：直接记录每条消息的端到端延迟（不经过Kivy Clock）"""
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.latencies = []
+        self.first = None
+        self.last = None
+        self.done = threading.Event()
+
+    def push(self, device_id, parsed_data, ts=None):
+        now = time.time()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.latencies.append(now - parsed_data["sent"])
+        if len(self.latencies) >= self.expected:
+            self.done.set()
+
+
+def publish_all(args):
+    """独立的发布端（模拟设备），按最快速度发送count条消息"""
+    publisher = mqtt.Client()
+    publisher.connect(args.host, args.port, 60)
+    publisher.loop_start()
+    for i in range(args.count):
+        payload = json.dumps({"do": 7.25, "ph": 7.01, "temp": 25.5, "seq": i, "sent": time.time()})
+        publisher.publish(TOPIC, payload, qos=0)
+    time.sleep(0.5)
+    publisher.loop_stop()
+    publisher.disconnect()
+
+
+def make_client(args, transport, recorder, connected):
+    def status(message):
+        if "连接成功" in message:
+            connected.set()
+
+    client = Esp32MqttClient(args.host, args.port, None, None, status, use_tls=False, transport=transport)
+    client.sensor_bridge = recorder
+    return client
+
+
+def ui_tick(work_seconds):
+    """模拟UI线程每帧的计算量"""
+    end = time.perf_counter() + work_seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def run_thread_mode(args):
+    recorder = LatencyRecorder(args.count)
+    connected = threading.Event()
+    client = make_client(args, TRANSPORT_THREAD, recorder, connected)
+    client.start_mqtt()
+    if not connected.wait(10):
+        raise SystemExit("无法连接Broker")
+    time.sleep(0.2)  # 等待订阅生效
+    threading.Thread(target=publish_all, args=(args,), daemon=True).start()
+    # 主线程充当UI线程：每帧做一些计算
+    deadline = time.time() + args.timeout
+    while not recorder.done.is_set() and time.time() < deadline:
+        ui_tick(args.ui_work_ms / 1000)
+        time.sleep(1 / 60)
+    client.stop_mqtt()
+    return recorder
+
+
+async def _run_asyncio_mode(args):
+    recorder = LatencyRecorder(args.count)
+    connected = threading.Event()
+    client = make_client(args, TRANSPORT_ASYNCIO, recorder, connected)
+    client.start_mqtt()
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(None, connected.wait, 10):
+        raise SystemExit("无法连接Broker")
+    await asyncio.sleep(0.2)
+    threading.Thread(target=publish_all, args=(args,), daemon=True).start()
+    # 同一事件循环中的“UI”任务：每帧做一些计算
+    deadline = time.time() + args.timeout
+    while not recorder.done.is_set() and time.time() < deadline:
+        ui_tick(args.ui_work_ms / 1000)
+        await asyncio.sleep(1 / 60)
+    client.stop_mqtt()
+    await client.async_task
+    return recorder
+
+
+def run_asyncio_mode(args):
+    return asyncio.run(_run_asyncio_mode(args))
+
+
+def report(name, recorder):
+    received = len(recorder.latencies)
+    latencies = sorted(recorder.latencies)
+    elapsed = (recorder.last - recorder.first) if received > 1 else 0
+    rate = received / elapsed if elapsed else 0
+    p50 = latencies[received // 2] * 1000 if received else 0
+    p99 = latencies[min(received - 1, int(received * 0.99))] * 1000 if received else 0
+    print(f"{name:<10}{received:>10}{rate:>14.0f}{p50:>12.2f}{p99:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT传输模式基准测试")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--count", type=int, default=20000, help="发送消息条数")
+    parser.add_argument("--ui-work-ms", type=float, default=2.0, help="模拟UI每帧计算耗时（毫秒）")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个模式的最长运行时间（秒）")
+    parser.add_argument("--mode", choices=("both", TRANSPORT_THREAD, TRANSPORT_ASYNCIO), default="both")
+    args = parser.parse_args()
+
+    print(f"{'模式':<10}{'收到条数':>10}{'吞吐(条/秒)':>14}{'p50(ms)':>12}{'p99(ms)':>12}")
+    if args.mode in ("both", TRANSPORT_THREAD):
+        report(TRANSPORT_THREAD, run_thread_mode(args))
+    if args.mode in ("both", TRANSPORT_ASYNCIO):
+        report(TRANSPORT_ASYNCIO, run_asyncio_mode(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# bench_sensor_codec.py：对比JSON与二进制传感器数据的体积和解码耗时
+# 运行：python benchmarks/bench_sensor_codec.py [--number 200000]
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sensor_codec import decode_sensor_payload, encode_sensor_binary  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="传感器数据解码微基准")
+    parser.add_argument("--number", type=int, default=200000, help="每种格式的解码次数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复轮数（取最快一轮）")
+    args = parser.parse_args()
+
+    json_payload = json.dumps({"do": 7.25, "ph": 7.01, "temp": 25.53, "ts": 1768118400}).encode("utf-8")
+    binary_payload = encode_sensor_binary(7.25, 7.01, 25.53, ts=1768118400)
+
+    cases = [
+        # 旧路径：先转字符串再json.loads
+        ("json (decode+loads)", lambda: json.loads(json_payload.decode("utf-8")), json_payload),
+        ("json (decode_sensor_payload)", lambda: decode_sensor_payload(json_payload), json_payload),
+        ("binary v1 (decode_sensor_payload)", lambda: decode_sensor_payload(binary_payload), binary_payload),
+    ]
+    print(f"{'格式':<36}{'字节数':>8}{'每条耗时(us)':>16}")
+    for name, func, payload in cases:
+        best = min(timeit.repeat(func, number=args.number, repeat=args.repeat))
+        print(f"{name:<36}{len(payload):>8}{best / args.number * 1e6:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
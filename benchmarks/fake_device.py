@@ -0,0 +1,148 @@
+# fake_device.py：模拟一台支持历史补传的ESP32（本地测试补传协议，协议见backfill.py）
+# 设备在内存中保留最近的样本（与固件的环形缓冲区相同），按间隔发布实时数据，并响应App/网关的分块补传请求
+#
+# 运行（进程内Broker替身 + 预先生成1小时“离线期间”的历史，补传完成后退出）：
+#   python benchmarks/fake_device.py --history 3600 --duration 60
+#   另开终端：python gateway.py --host 127.0.0.1 --port <输出的端口> --no-tls --db /tmp/backfill.db
+# 使用外部Broker：--host 127.0.0.1 --port 1883
+# 模拟不可靠的网络：--lose-rate 0.2（随机丢弃20%的补传响应，App应超时重发）、--duplicate（每块响应发两次）
+# 设备时钟与手机不一致：--clock-skew -30（设备时钟慢30秒）；--no-live-ts：实时数据不带ts（旧固件，按接收时间补传）
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import paho.mqtt.client as mqtt  # noqa: E402
+from mqtt_stub_broker import StubBroker  # noqa: E402
+from backfill import BACKFILL_REQUEST_TOPIC, BACKFILL_DATA_TOPIC  # noqa: E402
+
+
+class FakeDevice:
+    def __init__(self, device_id, capacity=20000, chunk_max=200, lose_rate=0.0, duplicate=False, seed=1,
+                 clock_skew=0.0, live_ts=True):
+        """
+        :param capacity: 设备端保留的样本数
+        :param chunk_max: 设备端每块最多返回的样本数（请求的limit更大时按该值截断）
+        :param lose_rate: 随机丢弃补传响应的比例
+        :param duplicate: 每块响应重复发送两次
+        :param clock_skew: 设备时钟相对本机的偏差（秒）
+        :param live_ts: 实时数据是否带设备时间戳ts
+        """
+        self.device_id = device_id
+        self.chunk_max = chunk_max
+        self.lose_rate = lose_rate
+        self.duplicate = duplicate
+        self.clock_skew = clock_skew
+        self.live_ts = live_ts
+        self.samples = deque(maxlen=capacity)  # [ts, do, ph, temp]，按时间正序
+        self.requests = 0
+        self.sent_samples = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.client = mqtt.Client(client_id=f"fake-{device_id}")
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    def _reading(self, ts):
+        rng = self._rng
+        return [ts, round(7 + rng.uniform(-1, 1), 2), round(7.2 + rng.uniform(-0.2, 0.2), 2),
+                round(25 + rng.uniform(-0.5, 0.5), 1)]
+
+    def seed_history(self, seconds, interval):
+        """生成过去seconds秒内的样本（模拟App离线期间设备照常采集）"""
+        now = time.time() + self.clock_skew
+        count = int(seconds / interval)
+        with self._lock:
+            for index in range(count, 0, -1):
+                self.samples.append(self._reading(now - index * interval))
+
+    def connect(self, host, port):
+        self.client.connect(host, port, 60)
+        self.client.loop_start()
+
+    def stop(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+    def publish_live(self):
+        sample = self._reading(time.time() + self.clock_skew)
+        with self._lock:
+            self.samples.append(sample)
+        ts, do_value, ph_value, temp_value = sample
+        message = {"do": do_value, "ph": ph_value, "temp": temp_value}
+        if self.live_ts:
+            message["ts"] = ts
+        self.client.publish(f"esp32/{self.device_id}/sensor", json.dumps(message))
+
+    def _on_connect(self, client, userdata, flags, rc):
+        client.subscribe(BACKFILL_REQUEST_TOPIC.format(self.device_id))
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            request = json.loads(msg.payload)
+            after, until = float(request["after"]), float(request["until"])
+            limit = min(int(request["limit"]), self.chunk_max)
+        except (ValueError, KeyError, TypeError):
+            return
+        self.requests += 1
+        with self._lock:
+            matched = [sample for sample in self.samples if after < sample[0] < until]
+        chunk = matched[:limit]
+        if self._rng.random() < self.lose_rate:
+            return
+        payload = json.dumps({"req": request["req"], "seq": request["seq"], "samples": chunk,
+                              "more": len(matched) > limit})
+        topic = BACKFILL_DATA_TOPIC.format(self.device_id)
+        for _ in range(2 if self.duplicate else 1):
+            client.publish(topic, payload)
+        self.sent_samples += len(chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟支持历史补传的ESP32设备")
+    parser.add_argument("--host", help="外部Broker地址（不指定则启动进程内Broker替身）")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--device-id", default="fake01")
+    parser.add_argument("--interval", type=float, default=1.0, help="采样/发布间隔（秒）")
+    parser.add_argument("--history", type=float, default=3600, help="预先生成的历史秒数（离线期间的数据）")
+    parser.add_argument("--capacity", type=int, default=20000, help="设备端保留的样本数")
+    parser.add_argument("--chunk-max", type=int, default=200, help="设备端每块最多返回的样本数")
+    parser.add_argument("--lose-rate", type=float, default=0.0, help="随机丢弃补传响应的比例")
+    parser.add_argument("--duplicate", action="store_true", help="每块补传响应发送两次")
+    parser.add_argument("--clock-skew", type=float, default=0.0, help="设备时钟相对本机的偏差（秒）")
+    parser.add_argument("--no-live-ts", action="store_true", help="实时数据不带设备时间戳（旧固件）")
+    parser.add_argument("--duration", type=float, default=60.0, help="运行秒数")
+    args = parser.parse_args()
+
+    broker = None
+    host, port = args.host, args.port
+    if host is None:
+        broker = StubBroker(port=args.port).start()
+        host, port = broker.host, broker.port
+        print(f"Broker替身：{host}:{port}", flush=True)
+    device = FakeDevice(args.device_id, args.capacity, args.chunk_max, args.lose_rate, args.duplicate,
+                        clock_skew=args.clock_skew, live_ts=not args.no_live_ts)
+    device.seed_history(args.history, args.interval)
+    device.connect(host, port)
+    deadline = time.monotonic() + args.duration
+    try:
+        while time.monotonic() < deadline:
+            device.publish_live()
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    device.stop()
+    if broker:
+        broker.stop()
+    print(json.dumps({"device": args.device_id, "requests": device.requests,
+                      "backfill_samples_sent": device.sent_samples}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# mqtt_stub_broker.py：基准测试用的最小MQTT 3.1.1 Broker替身（仅标准库，进程内启动）
+# 支持：CONNECT / SUBSCRIBE（+、#通配符）/ UNSUBSCRIBE / PUBLISH（QoS 0/1/2收，统一按QoS 0转发）/ PING / DISCONNECT
+# 不支持：认证、保留消息、遗嘱、会话保持 —— 只用于测量App侧性能，不能替代真实Broker
+import socket
+import socketserver
+import struct
+import threading
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+
+def topic_matches(topic_filter, topic):
+    """MQTT主题过滤器匹配（+匹配一级，#匹配剩余所有级）"""
+    filter_parts = topic_filter.split("/")
+    topic_parts = topic.split("/")
+    for index, part in enumerate(filter_parts):
+        if part == "#":
+            return True
+        if index >= len(topic_parts):
+            return False
+        if part != "+" and part != topic_parts[index]:
+            return False
+    return len(filter_parts) == len(topic_parts)
+
+
+def _encode_length(length):
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+def _packet(packet_type, flags, body):
+    return bytes([(packet_type << 4) | flags]) + _encode_length(len(body)) + body
+
+
+def _read_exact(sock_file, size):
+    data = sock_file.read(size)
+    if len(data) < size:
+        raise ConnectionError("连接已关闭")
+    return data
+
+
+class _Session(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.filters = []
+        self.send_lock = threading.Lock()
+
+    def send(self, data):
+        with self.send_lock:
+            self.request.sendall(data)
+
+    def handle(self):
+        broker = self.server.broker
+        try:
+            while True:
+                header = _read_exact(self.rfile, 1)[0]
+                length, multiplier = 0, 1
+                while True:
+                    byte = _read_exact(self.rfile, 1)[0]
+                    length += (byte & 0x7F) * multiplier
+                    multiplier *= 128
+                    if not byte & 0x80:
+                        break
+                body = _read_exact(self.rfile, length) if length else b""
+                packet_type, flags = header >> 4, header & 0x0F
+                if packet_type == CONNECT:
+                    self.send(_packet(CONNACK, 0, b"\x00\x00"))
+                elif packet_type == PUBLISH:
+                    self._handle_publish(broker, flags, body)
+                elif packet_type == PUBREL:
+                    self.send(_packet(PUBCOMP, 0, body[:2]))
+                elif packet_type == SUBSCRIBE:
+                    self._handle_subscribe(broker, body)
+                elif packet_type == UNSUBSCRIBE:
+                    self._handle_unsubscribe(broker, body)
+                elif packet_type == PINGREQ:
+                    self.send(_packet(PINGRESP, 0, b""))
+                elif packet_type == DISCONNECT:
+                    return
+        except (ConnectionError, OSError):
+            return
+        finally:
+            broker._remove_session(self)
+
+    def _handle_publish(self, broker, flags, body):
+        qos = (flags >> 1) & 0x03
+        topic_length = struct.unpack_from("!H", body, 0)[0]
+        topic = body[2:2 + topic_length].decode("utf-8")
+        offset = 2 + topic_length
+        if qos:
+            packet_id = body[offset:offset + 2]
+            offset += 2
+            self.send(_packet(PUBACK if qos == 1 else PUBREC, 0, packet_id))
+        broker.route(topic, body[offset:])
+
+    def _handle_subscribe(self, broker, body):
+        packet_id, offset, granted = body[:2], 2, bytearray()
+        while offset < len(body):
+            length = struct.unpack_from("!H", body, offset)[0]
+            topic_filter = body[offset + 2:offset + 2 + length].decode("utf-8")
+            offset += 2 + length + 1
+            granted.append(0)
+            if topic_filter not in self.filters:
+                self.filters.append(topic_filter)
+        broker._add_subscriber(self)
+        self.send(_packet(SUBACK, 0, packet_id + bytes(granted)))
+
+    def _handle_unsubscribe(self, broker, body):
+        packet_id, offset = body[:2], 2
+        while offset < len(body):
+            length = struct.unpack_from("!H", body, offset)[0]
+            topic_filter = body[offset + 2:offset + 2 + length].decode("utf-8")
+            offset += 2 + length
+            if topic_filter in self.filters:
+                self.filters.remove(topic_filter)
+        self.send(_packet(UNSUBACK, 0, packet_id))
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StubBroker:
+    """进程内MQTT Broker替身：start()后在后台线程监听，port=0时自动分配端口"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._server = _Server((host, port), _Session)
+        self._server.broker = self
+        self.host, self.port = self._server.server_address
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.routed = 0  # 收到的PUBLISH条数
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="stub-broker", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _add_subscriber(self, session):
+        with self._lock:
+            if session not in self._subscribers:
+                self._subscribers = self._subscribers + [session]
+
+    def _remove_session(self, session):
+        with self._lock:
+            if session in self._subscribers:
+                self._subscribers = [s for s in self._subscribers if s is not session]
+
+    def route(self, topic, payload):
+        """按QoS 0转发给所有订阅了匹配主题的连接"""
+        with self._lock:
+            self.routed += 1
+        packet = None
+        for session in self._subscribers:  # 订阅者列表整体替换（写时复制），遍历无需加锁
+            if any(topic_matches(f, topic) for f in session.filters):
+                if packet is None:
+                    topic_bytes = topic.encode("utf-8")
+                    packet = _packet(PUBLISH, 0, struct.pack("!H", len(topic_bytes)) + topic_bytes + payload)
+                try:
+                    session.send(packet)
+                except OSError:
+                    pass
@@ -5,11 +5,15 @@ package.domain = org.test
 source.dir = .
 source.include_exts = py,png,jpg,kv,atlas
 #source.include_patterns = image/* 打包image目录下的文件 pack files in the image directory
+# 性能测试/调试脚本不打包进APK benchmark and tool scripts are not packaged
+source.exclude_dirs = benchmarks,tools,tests
+# 服务器端无界面网关不打包进APK the headless gateway runs on servers only
+source.exclude_patterns = gateway.py
 version = 0.0.1
 #fullscreen = 0
 #orientation = portrait
 # 【仅修改这一行】精简依赖：保留核心，移除多余的libiconv/libffi（p4a自动处理），补充pyjnius（KivyMD必需）
-requirements = python3,kivy,kivymd,pyjnius#依赖库，pyjnius为KivyMD运行必需，libiconv/libffi无需手动指定
+requirements = python3,kivy,kivymd,pyjnius,androidstorage4kivy#依赖库，pyjnius为KivyMD运行必需，libiconv/libffi无需手动指定
 #icon.filename = icon.png
 #presplash.filename = presplash.png
 entrypoint = main.py#主程序 main
@@ -28,7 +32,9 @@ android.ndk_api = 21
 p4a.gradle_dependencies = gradle:7.6.4
 p4a.bootstrap = sdl2
 p4a.gradle_options = -Dorg.gradle.java.home=/usr/lib/jvm/java-17-openjdk-amd64
-android.permissions = INTERNET#打包需要网络权限 network permission is required for packaging
+# ACCESS_NETWORK_STATE用于监听网络变化并立即重连 needed to reconnect on network changes
+# WRITE_EXTERNAL_STORAGE只在Android 9及以下需要（导出文件复制到Download；Android 10起经MediaStore写入，不需要权限）
+android.permissions = INTERNET,ACCESS_NETWORK_STATE,(name=android.permission.WRITE_EXTERNAL_STORAGE;maxSdkVersion=28)#打包需要网络权限 network permission is required for packaging
 
 #以下为release模式需要 following is required for release mode
 
@@ -0,0 +1,90 @@
+# chart_source.py：趋势图的数据源（按可见时间范围取数并抽稀，不依赖Kivy）
+# 趋势图只通过time_range()/series()取数，平移/缩放时只读取可见范围内的数据
+# 短时间范围画原始样本（LTTB抽稀），长时间范围或超出内存缓冲区时读取预先计算的聚合（rollups.py）
+from decimation import drop_missing, lttb, minmax
+
+CHART_METRICS = (("do", "do_value"), ("ph", "ph_value"), ("temp", "temp_value"))  # (指标, 缓冲区列名)
+DECIMATE_LTTB = "lttb"
+DECIMATE_MINMAX = "minmax"
+
+
+def decimate(xs, ys, max_points, method=DECIMATE_LTTB):
+    """去掉缺失值后抽稀到约max_points个点"""
+    xs, ys = drop_missing(xs, ys)
+    if method == DECIMATE_MINMAX:
+        return minmax(xs, ys, max(1, max_points // 2))
+    return lttb(xs, ys, max_points)
+
+
+class BufferChartSource:
+    """内存中环形缓冲区的数据源：二分查找可见范围，只复制和抽稀范围内的样本"""
+
+    def __init__(self, history_getter, method=DECIMATE_LTTB):
+        """
+        :param history_getter: 返回当前设备SampleRingBuffer的函数（没有数据时返回None）
+        :param method: 抽稀算法（lttb/minmax）
+        """
+        self.history_getter = history_getter
+        self.method = method
+
+    def time_range(self):
+        """(最旧时间戳, 最新时间戳)，无数据时返回None"""
+        history = self.history_getter()
+        return history.time_range() if history is not None else None
+
+    def series(self, start_ts, end_ts, max_points):
+        """
+        :return: {指标: (时间戳列表, 数值列表)}，每个指标最多约max_points个点
+        """
+        history = self.history_getter()
+        if history is None:
+            return {}
+        names = ("ts",) + tuple(column for _, column in CHART_METRICS)
+        columns = history.columns_between(start_ts, end_ts, names)
+        xs = columns[0]
+        return {metric: decimate(xs, ys, max_points, self.method)
+                for (metric, _), ys in zip(CHART_METRICS, columns[1:])}
+
+
+RAW_SPAN_LIMIT = 6 * 3600  # 可见范围超过6小时时改读聚合
+
+
+class HistoryChartSource(BufferChartSource):
+    """原始样本 + 聚合的数据源：聚合按可见范围选择分辨率，每个桶画出最小值和最大值（保留尖峰）"""
+
+    def __init__(self, history_getter, rollups_getter, method=DECIMATE_LTTB):
+        """
+        :param rollups_getter: 返回当前设备DeviceRollups的函数（没有数据时返回None）
+        """
+        super().__init__(history_getter, method)
+        self.rollups_getter = rollups_getter
+
+    def time_range(self):
+        buffered = super().time_range()
+        rollups = self.rollups_getter()
+        aggregated = rollups.time_range() if rollups is not None else None
+        if aggregated is None:
+            return buffered
+        if buffered is None:
+            return aggregated
+        return min(buffered[0], aggregated[0]), max(buffered[1], aggregated[1])
+
+    def series(self, start_ts, end_ts, max_points):
+        buffered = super().time_range()
+        rollups = self.rollups_getter()
+        if rollups is None or (buffered is not None and buffered[0] <= start_ts
+                               and end_ts - start_ts <= RAW_SPAN_LIMIT):
+            return super().series(start_ts, end_ts, max_points)
+        # 每个桶两个点，桶数不超过max_points的一半
+        rollup = rollups.choose(end_ts - start_ts, max(1, max_points // 2), start_ts)
+        half = rollup.seconds / 2
+        result = {}
+        for metric, _ in CHART_METRICS:
+            xs, ys = [], []
+            for bucket, min_value, max_value, _, _ in rollup.query(metric, start_ts, end_ts):
+                xs.append(bucket)
+                ys.append(min_value)
+                xs.append(bucket + half)
+                ys.append(max_value)
+            result[metric] = (xs, ys)
+        return result
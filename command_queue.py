@@ -0,0 +1,163 @@
+# command_queue.py：下行指令的持久化发送队列（断网时暂存，恢复连接后按顺序以QoS 1补发）
+import sqlite3
+import time
+from threading import Lock
+
+# 指令状态
+STATUS_PENDING = "pending"  # 已入队，等待发送
+STATUS_SENT = "sent"        # 已发出，等待Broker确认（PUBACK）
+STATUS_ACKED = "acked"      # Broker已确认
+STATUS_EXPIRED = "expired"  # 超过有效期仍未发出，已放弃
+
+STATUS_NAMES = {
+    STATUS_PENDING: "待发送",
+    STATUS_SENT: "等待确认",
+    STATUS_ACKED: "已确认",
+    STATUS_EXPIRED: "已过期",
+}
+
+# 各主题指令的有效期（秒）：开关类指令过时后再执行反而危险，阈值设置可以晚一些生效
+DEFAULT_TOPIC_TTL = {
+    "esp32/switch": 60,
+    "esp32/control": 60,
+    "esp32/threshold": 24 * 3600,
+}
+DEFAULT_TTL = 300
+
+# 已完成（确认/过期）的记录保留时长，超过后清理
+_FINISHED_RETENTION = 24 * 3600
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS commands (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_ts REAL NOT NULL,
+    expires_ts REAL NOT NULL,
+    status TEXT NOT NULL,
+    updated_ts REAL NOT NULL
+)"""
+
+
+class OutboundCommandQueue:
+    """
+    持久化指令队列
+    UI线程入队、网络线程发送/确认，所有数据库操作在同一把锁内完成（指令量很小，直接同步写盘）
+    """
+
+    def __init__(self, db_path=":memory:", topic_ttl=None, default_ttl=DEFAULT_TTL):
+        """
+        :param db_path: 数据库文件路径（默认内存数据库，不持久化）
+        :param topic_ttl: {主题: 有效期秒数}，未列出的主题使用default_ttl
+        :param default_ttl: 默认有效期（秒）
+        """
+        self.topic_ttl = dict(DEFAULT_TOPIC_TTL if topic_ttl is None else topic_ttl)
+        self.default_ttl = default_ttl
+        self._lock = Lock()
+        self._mid_to_id = {}  # MQTT消息编号 -> 指令编号（等待PUBACK）
+        self._early_acks = set()  # 发送窗口内、先于mark_sent到达的消息编号（窗口结束即清空）
+        self._sending = 0  # 正在调用publish的QoS 1指令数（begin_send/end_send之间）
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(_SCHEMA)
+            # 上次退出时已发出但未确认的指令，无法确定Broker是否收到，重新发送
+            self._conn.execute("UPDATE commands SET status = ? WHERE status = ?",
+                               (STATUS_PENDING, STATUS_SENT))
+        self.last_status = None  # 最近一条指令的(主题, 内容, 状态)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, topic, payload):
+        """写入一条待发送指令，返回指令编号"""
+        now = time.time()
+        ttl = self.topic_ttl.get(topic, self.default_ttl)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO commands (topic, payload, created_ts, expires_ts, status, updated_ts) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (topic, payload, now, now + ttl, STATUS_PENDING, now)
+            )
+            self.last_status = (topic, payload, STATUS_PENDING)
+            return cursor.lastrowid
+
+    def take_pending(self):
+        """
+        取出所有未过期的待发送指令（按入队顺序），过期的指令标记为已过期
+        :return: [(指令编号, 主题, 内容), ...]
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE commands SET status = ?, updated_ts = ? WHERE status = ? AND expires_ts < ?",
+                (STATUS_EXPIRED, now, STATUS_PENDING, now)
+            )
+            self._conn.execute(
+                "DELETE FROM commands WHERE status IN (?, ?) AND updated_ts < ?",
+                (STATUS_ACKED, STATUS_EXPIRED, now - _FINISHED_RETENTION)
+            )
+            return self._conn.execute(
+                "SELECT id, topic, payload FROM commands WHERE status = ? ORDER BY id",
+                (STATUS_PENDING,)
+            ).fetchall()
+
+    def _set_status(self, command_id, status):
+        with self._conn:
+            row = self._conn.execute("SELECT topic, payload FROM commands WHERE id = ?",
+                                     (command_id,)).fetchone()
+            self._conn.execute("UPDATE commands SET status = ?, updated_ts = ? WHERE id = ?",
+                               (status, time.time(), command_id))
+        if row:
+            self.last_status = (row[0], row[1], status)
+
+    def begin_send(self):
+        """
+        即将以QoS 1发送一条指令：此后到达的未登记确认暂存，直到end_send
+        QoS 0消息（RTT探测、补传请求等）也会触发PUBACK回调，只在发送窗口内暂存，
+        否则消息编号回绕（65535）后旧编号会把新指令误标为已确认
+        """
+        with self._lock:
+            self._sending += 1
+
+    def end_send(self):
+        """publish已返回（成功或失败）：丢弃窗口内暂存的未登记确认"""
+        with self._lock:
+            self._sending = max(0, self._sending - 1)
+            if not self._sending:
+                self._early_acks.clear()
+
+    def mark_sent(self, command_id, mid):
+        """已调用publish，记录MQTT消息编号，等待PUBACK"""
+        with self._lock:
+            if mid in self._early_acks:
+                # PUBACK可能在publish返回前就由网络线程处理完
+                self._early_acks.discard(mid)
+                self._set_status(command_id, STATUS_ACKED)
+                return
+            self._mid_to_id[mid] = command_id
+            self._set_status(command_id, STATUS_SENT)
+
+    def mark_acked(self, mid):
+        """
+        收到Broker确认
+        :return: 是否是已登记的队列指令（QoS 0的普通消息、或尚未登记的指令返回False）
+        """
+        with self._lock:
+            command_id = self._mid_to_id.pop(mid, None)
+            if command_id is None:
+                if self._sending:
+                    self._early_acks.add(mid)  # 可能是正在publish、还没来得及mark_sent的指令
+                return False
+            self._set_status(command_id, STATUS_ACKED)
+            return True
+
+    def counts(self):
+        """各状态的未完成指令数：{"pending": n, "sent": n}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM commands WHERE status IN (?, ?) GROUP BY status",
+                (STATUS_PENDING, STATUS_SENT)
+            ).fetchall()
+        counts = {STATUS_PENDING: 0, STATUS_SENT: 0}
+        counts.update(rows)
+        return counts
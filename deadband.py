@@ -0,0 +1,100 @@
+# deadband.py：死区/变化检测（数值稳定时不重复渲染标签、不重复写入历史）
+# 历史只记录“变化超过死区”的样本，另外每隔heartbeat秒强制记录一条心跳样本，证明设备仍在线
+# 报警规则和聚合仍然看到每一条样本（聚合的均值/样本数保持准确）；本模块不依赖Kivy
+METRICS = ("do", "ph", "temp")
+DISPLAY_DIGITS = {"do": 2, "ph": 1, "temp": 1}  # 界面显示精度（小数位）
+DEFAULT_DEADBANDS = {"do": 0.05, "ph": 0.05, "temp": 0.1}
+DEFAULT_HEARTBEAT = 300.0  # 秒
+
+
+def parse_deadbands(text):
+    """
+    解析命令行参数，如 "do=0.05,ph=0.05,temp=0.1"（未指定的指标用默认值）
+    :raises ValueError: 格式错误或指标不存在
+    """
+    deadbands = dict(DEFAULT_DEADBANDS)
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        metric, _, value = item.partition("=")
+        metric = metric.strip()
+        if metric not in deadbands:
+            raise ValueError(f"不支持的指标：{metric}")
+        deadbands[metric] = float(value)
+    return deadbands
+
+
+class DisplayCache:
+    """按显示精度四舍五入后的数值没有变化时，不重新格式化/设置标签文字"""
+
+    def __init__(self):
+        self._shown = {}  # 指标 -> 上次显示的四舍五入值
+
+    def changed(self, metric, value):
+        """
+        :return: 需要重新显示时返回四舍五入后的值，否则返回None
+        """
+        rounded = round(value, DISPLAY_DIGITS[metric])
+        if self._shown.get(metric) == rounded:
+            return None
+        self._shown[metric] = rounded
+        return rounded
+
+    def clear(self):
+        """标签被设置为其他文字（切换设备、数据异常）后调用"""
+        self._shown.clear()
+
+
+class ChangeFilter:
+    """
+    按设备的变化检测：与上一条“已记录”样本相比，任一指标变化超过死区才记录
+    （与已记录值比较而不是与上一条样本比较，缓慢漂移累计超过死区后也会被记录）
+    同一设备总在同一线程中判断，不加锁
+    """
+
+    def __init__(self, deadbands=None, heartbeat=DEFAULT_HEARTBEAT, enabled=True):
+        """
+        :param deadbands: {指标: 死区}，默认DEFAULT_DEADBANDS；死区为0表示任何变化都记录
+        :param heartbeat: 距上一条已记录样本超过该秒数时强制记录
+        :param enabled: 关闭时每条样本都记录
+        """
+        self.deadbands = tuple((deadbands or DEFAULT_DEADBANDS)[metric] for metric in METRICS)
+        self.heartbeat = heartbeat
+        self.enabled = enabled
+        self.accepted = 0
+        self.suppressed = 0
+        self._recorded = {}  # 设备编号 -> [最后记录时间, 溶解氧, PH, 温度]
+
+    def accept(self, device_id, ts, do_value, ph_value, temp_value):
+        """
+        :return: 该样本是否需要写入历史
+        """
+        values = (do_value, ph_value, temp_value)
+        recorded = self._recorded.get(device_id)
+        keep = (not self.enabled or recorded is None or ts - recorded[0] >= self.heartbeat
+                or self._changed(recorded, values))
+        if not keep:
+            self.suppressed += 1
+            return False
+        self.accepted += 1
+        if recorded is None:
+            recorded = self._recorded[device_id] = [ts, None, None, None]
+        recorded[0] = ts
+        for index, value in enumerate(values):
+            if value is not None:
+                recorded[index + 1] = value
+        return True
+
+    def _changed(self, recorded, values):
+        for index, value in enumerate(values):
+            if value is None:
+                continue  # 本条消息没有上传该字段
+            last = recorded[index + 1]
+            if last is None or abs(value - last) > self.deadbands[index]:
+                return True
+        return False
+
+    def forget(self, device_id=None):
+        """清除记录状态（下一条样本一定会被记录）"""
+        if device_id is None:
+            self._recorded.clear()
+        else:
+            self._recorded.pop(device_id, None)
@@ -0,0 +1,76 @@
+# decimation.py：曲线抽稀（一天/一周的样本只画出与屏幕像素数相当的点）
+# LTTB（Largest-Triangle-Three-Buckets）保留曲线形状，适合平滑数据；min/max抽稀保留每个区间的极值，适合找尖峰
+# 本模块不依赖Kivy，输入为按时间正序的序列（array/list均可）
+import math
+
+
+def drop_missing(xs, ys):
+    """去掉数值为NaN的点（本条消息未上传该字段）"""
+    if not any(math.isnan(y) for y in ys):
+        return xs, ys
+    kept = [(x, y) for x, y in zip(xs, ys) if not math.isnan(y)]
+    return [x for x, _ in kept], [y for _, y in kept]
+
+
+def lttb(xs, ys, threshold):
+    """
+    Largest-Triangle-Three-Buckets抽稀：首尾点保留，中间每个区间选与前一个选中点、下一区间均值点
+    构成三角形面积最大的点；O(n)
+    :param threshold: 输出点数（通常取绘图区域宽度的像素数）
+    :return: (xs, ys)列表
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(xs), list(ys)
+    out_x, out_y = [xs[0]], [ys[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0  # 上一个选中的点
+    for i in range(threshold - 2):
+        # 下一个区间的均值点
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+        # 当前区间内选三角形面积最大的点
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = xs[a], ys[a]
+        best_area, best = -1.0, start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area, best = area, j
+        out_x.append(xs[best])
+        out_y.append(ys[best])
+        a = best
+    out_x.append(xs[n - 1])
+    out_y.append(ys[n - 1])
+    return out_x, out_y
+
+
+def minmax(xs, ys, buckets):
+    """
+    min/max抽稀：按下标均分为buckets个区间，每个区间按时间顺序输出最小值点和最大值点（最多2*buckets个点）
+    :return: (xs, ys)列表
+    """
+    n = len(xs)
+    if n <= 2 * buckets or buckets < 1:
+        return list(xs), list(ys)
+    out_x, out_y = [], []
+    bucket_size = n / buckets
+    for i in range(buckets):
+        start = int(i * bucket_size)
+        end = min(int((i + 1) * bucket_size), n)
+        low = high = start
+        for j in range(start + 1, end):
+            if ys[j] < ys[low]:
+                low = j
+            elif ys[j] > ys[high]:
+                high = j
+        for j in sorted({low, high}):
+            out_x.append(xs[j])
+            out_y.append(ys[j])
+    return out_x, out_y
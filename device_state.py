@@ -0,0 +1,92 @@
+# device_state.py：多设备状态表（按设备编号索引最新数值和历史缓冲区）
+from history_store import DEFAULT_DEVICE_ID
+from sample_buffer import SampleRingBuffer
+
+# 主题格式：esp32/<设备编号>/sensor；旧版单设备主题esp32/sensor归为默认设备
+SENSOR_TOPIC = "esp32/sensor"
+SENSOR_TOPIC_WILDCARD = "esp32/+/sensor"
+
+
+def device_id_from_topic(topic):
+    """
+    从传感器主题中取出设备编号
+    :return: 设备编号；不是传感器主题时返回None
+    """
+    if topic == SENSOR_TOPIC:
+        return DEFAULT_DEVICE_ID
+    parts = topic.split("/")
+    if len(parts) == 3 and parts[0] == "esp32" and parts[2] == "sensor" and parts[1]:
+        return parts[1]
+    return None
+
+
+def sensor_values(parsed_data):
+    """
+    从校验后的数据字典中取出(溶解氧, PH, 温度)，未上传或未通过校验的字段为None
+    :param parsed_data: sensor_schema校验后的字典（网络线程已完成类型和范围检查，数值均为float）
+    """
+    return parsed_data.get("do"), parsed_data.get("ph"), parsed_data.get("temp")
+
+
+class DeviceState:
+    """单个设备的状态：最新数值（缺失字段沿用上一次的值）+ 历史样本"""
+    __slots__ = ("device_id", "do_value", "ph_value", "temp_value", "last_seen", "history")
+
+    def __init__(self, device_id, history_capacity):
+        self.device_id = device_id
+        self.do_value = None
+        self.ph_value = None
+        self.temp_value = None
+        self.last_seen = None
+        self.history = SampleRingBuffer(history_capacity)
+
+    def record(self, ts, do_value, ph_value, temp_value, keep_history=True):
+        """
+        :param keep_history: False表示只更新最新数值，不写入历史缓冲区（数值在死区内）
+        """
+        if do_value is not None:
+            self.do_value = do_value
+        if ph_value is not None:
+            self.ph_value = ph_value
+        if temp_value is not None:
+            self.temp_value = temp_value
+        self.last_seen = ts
+        if keep_history:
+            self.history.append(ts, do_value, ph_value, temp_value)
+
+
+class DeviceStateTable:
+    """设备编号 -> DeviceState 的索引表（只在Kivy主线程读写）"""
+
+    def __init__(self, history_capacity):
+        """
+        :param history_capacity: 每个设备在内存中保留的样本数
+        """
+        self.history_capacity = history_capacity
+        self._devices = {}
+
+    def __contains__(self, device_id):
+        return device_id in self._devices
+
+    def __len__(self):
+        return len(self._devices)
+
+    def find(self, device_id):
+        """取设备状态，不存在时返回None"""
+        return self._devices.get(device_id)
+
+    def get(self, device_id):
+        """取设备状态，不存在时创建"""
+        state = self._devices.get(device_id)
+        if state is None:
+            state = self._devices[device_id] = DeviceState(device_id, self.history_capacity)
+        return state
+
+    def device_ids(self):
+        return sorted(self._devices)
+
+    def record(self, device_id, ts, do_value, ph_value, temp_value, keep_history=True):
+        """把一个样本路由到对应设备，返回该设备的状态"""
+        state = self.get(device_id)
+        state.record(ts, do_value, ph_value, temp_value, keep_history)
+        return state
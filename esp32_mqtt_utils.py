@@ -1,12 +1,40 @@
 # esp32_mqtt_utils.py：工具类文件，封装MQTT自动接收功能
 import paho.mqtt.client as mqtt
-from threading import Thread
+from threading import Thread, Lock, Event
 import json
-from kivy.clock import Clock  # 确保UI更新线程安全
+import logging
+import time
+import asyncio
+import uuid
+from app_logging import get_logger, PAYLOAD_LOGGER_NAME
+from sensor_codec import decode_sensor_payload, is_binary_payload, SUPPORTED_FORMATS
+from device_state import device_id_from_topic, SENSOR_TOPIC, SENSOR_TOPIC_WILDCARD
+from command_queue import OutboundCommandQueue
+from mqtt_reconnect import (ReconnectBackoff, ConnectionStatus, STATE_IDLE, STATE_CONNECTING,
+                            STATE_CONNECTED, STATE_BACKOFF, STATE_FAILED, STATE_STOPPED)
+from mqtt_asyncio import AsyncioMqttTransport
+from thresholds import THRESHOLD_RESPONSE_TOPIC
+from sensor_schema import SENSOR_SCHEMA, METRIC_FIELDS, format_errors
+from metrics import MESSAGES, BYTES_RECEIVED, RECONNECTS, DECODE_SECONDS, INVALID_FIELDS
+from ingest_queue import POLICY_DROP_OLDEST, check_policy
+from backfill import BACKFILL_DATA_WILDCARD, device_id_from_backfill_topic
+
+# 网络传输模式
+TRANSPORT_THREAD = "thread"    # 独立网络线程（默认）
+TRANSPORT_ASYNCIO = "asyncio"  # 在asyncio事件循环上运行（需配合App.async_run）
+
+RTT_TOPIC_PREFIX = "esp32/app/rtt/"  # 往返延迟探测：向只有自己订阅的主题发一条空消息
+RTT_PING_INTERVAL = 30  # 探测间隔（秒）
+DROP_REPORT_INTERVAL = 5  # 队列丢弃提示的最小间隔（秒）
+
+logger = get_logger("mqtt")
+payload_logger = logging.getLogger(PAYLOAD_LOGGER_NAME)
 
 # 定义MQTT客户端类，封装所有通信相关功能
 class Esp32MqttClient:
-    def __init__(self, broker, port, username, password, data_callback):
+    def __init__(self, broker, port, username, password, data_callback, command_queue=None,
+                 use_tls=True, backoff=None, transport=TRANSPORT_THREAD, dispatcher=None,
+                 ingest_policy=POLICY_DROP_OLDEST):
         """
         初始化MQTT客户端
         :param broker: EMQX Broker地址
@@ -14,6 +42,15 @@ class Esp32MqttClient:
         :param username: 认证用户名
         :param password: 认证密码
         :param data_callback: 数据接收回调函数（用于传递数据到主文件UI）
+        :param command_queue: 下行指令队列（OutboundCommandQueue），不传则使用内存队列（不持久化）
+        :param use_tls: 是否启用TLS（连接本地测试Broker时可关闭）
+        :param backoff: 重连退避策略（ReconnectBackoff），不传使用默认参数
+        :param transport: 网络传输模式：TRANSPORT_THREAD / TRANSPORT_ASYNCIO
+        :param dispatcher: 样本分发器（需提供push(device_id, parsed_data, ts=None)），
+                           不传则使用Kivy的按帧投递（SensorFrameBridge）；无界面运行时传入sensor_dispatch中的分发器
+        :param ingest_policy: 按帧投递队列满时的策略（drop_oldest / keep_latest_per_device / block；
+                              asyncio模式不支持block）
+        :raises ValueError: 不支持的队列策略
         """
         self.broker = broker
         self.port = port
@@ -24,12 +61,72 @@ class Esp32MqttClient:
         self.mqtt_thread = None
         self.connected = False
         self.parsed_data_callback = None  # 解析后的数据回调
-        self.latest_data = {}  # 存储最新传感器数据
+        self.latest_data = {}  # 存储最新传感器数据（任意设备）
+        self.latest_by_device = {}  # 设备编号 -> 该设备最新传感器数据
+        if dispatcher is None:
+            # asyncio模式下网络收发与按帧消费在同一线程，block策略只会阻塞到超时（卡住界面），直接拒绝
+            check_policy(ingest_policy, same_thread=transport == TRANSPORT_ASYNCIO)
+            # 仅App模式才导入Kivy，无界面网关不依赖图形界面
+            from ui_bridge import SensorFrameBridge  # 按帧合并投递到UI主线程（线程安全）
+            dispatcher = SensorFrameBridge(self._deliver_parsed_batch, policy=ingest_policy,
+                                           on_drop=self._on_ingest_drop)
+        self.sensor_bridge = dispatcher
+        self.backfill = None  # 重连后的历史补传（BackfillManager.start()时设置）
+        self._pending_drops = 0  # 上次提示之后丢弃的样本数
+        self._last_drop_report = float("-inf")
+        self.command_queue = command_queue or OutboundCommandQueue()
+        self._flush_lock = Lock()  # 防止UI线程和网络线程同时补发同一条指令
+        self.command_status_callback = None  # 指令队列状态变化回调（在调用方线程执行）
+        self.use_tls = use_tls
+        self.transport = transport
+        self.async_transport = AsyncioMqttTransport(self) if transport == TRANSPORT_ASYNCIO else None
+        self.async_task = None
+        # 重连状态机
+        self.backoff = backoff or ReconnectBackoff()
+        self.state = STATE_IDLE
+        self._stop_event = Event()
+        self._wakeup = Event()  # 打断退避等待，立即重连（网络变化/App回到前台）
+        # 连接耗时统计
+        self.connect_attempts = 0          # 累计连接尝试次数
+        self.reconnect_count = 0           # 连接成功后又断开并重新连上的次数
+        self.last_connect_seconds = None   # 最近一次从开始连接到收到CONNACK的耗时
+        self.last_first_message_seconds = None  # 最近一次连上后到收到第一条消息的耗时
+        self._connect_started = None       # 本轮连接（含失败重试）开始时间，连上后清空
+        self._connected_at = None
+        self._waiting_first_message = False
+        self._ever_connected = False
+        # 可观察的连接状态（监听函数在网络线程/事件循环中调用，界面层需自行切回主线程）
+        self._state_listeners = []
+        self.rtt = None               # 最近一次经Broker往返的耗时（秒）
+        self.last_message_at = None   # 最近一次收到消息的时间（time.monotonic()）
+        self.retry_at = None          # 下次重连时间
+        self.last_error = None        # 最近一次连接失败原因
+        self._rtt_topic = RTT_TOPIC_PREFIX + uuid.uuid4().hex[:12]
+        self._ping_sent_at = None
+        self._next_ping_at = 0.0
 
     def set_parsed_data_callback(self, callback):
-        """设置解析后的数据回调（供UI层注册，关键：用于自动更新UI）"""
+        """
+        设置解析后的数据回调（供UI层注册，关键：用于自动更新UI）
+        回调在Kivy主线程每帧最多执行一次，参数为本帧收到的[(接收时间戳, 设备编号, 数据字典), ...]
+        """
         self.parsed_data_callback = callback
 
+    def _on_ingest_drop(self, count):
+        """主线程：队列满丢弃了样本（消息风暴），最多每5秒提示一次"""
+        self._pending_drops += count
+        now = time.monotonic()
+        if now - self._last_drop_report >= DROP_REPORT_INTERVAL:
+            self._last_drop_report = now
+            self.data_callback(f"⚠️ 数据到达过快，已丢弃{self._pending_drops}条"
+                               f"（累计{self.sensor_bridge.dropped}条）")
+            self._pending_drops = 0
+
+    def _deliver_parsed_batch(self, batch):
+        """主线程：把一帧内合并的样本交给UI层"""
+        if self.parsed_data_callback:
+            self.parsed_data_callback(batch)
+
     def init_mqtt_client(self):
         """初始化MQTT客户端配置，绑定回调函数"""
         # 创建MQTT客户端实例
@@ -37,113 +134,333 @@ class Esp32MqttClient:
         # 设置认证信息
         self.mqtt_client.username_pw_set(self.username, self.password)
         # 配置TLS加密（EMQX Serverless版本强制要求）
-        self.mqtt_client.tls_set()
+        if self.use_tls:
+            self.mqtt_client.tls_set()
         # 绑定MQTT内置回调函数
         self.mqtt_client.on_connect = self._on_connect
         self.mqtt_client.on_message = self._on_message
+        self.mqtt_client.on_publish = self._on_publish
+        self.mqtt_client.on_disconnect = self._on_disconnect
+        if self.async_transport:
+            self.async_transport.attach(self.mqtt_client)
 
     def start_mqtt(self):
-        """启动MQTT通信（独立线程，避免阻塞UI）"""
+        """
+        启动MQTT通信（避免阻塞UI）
+        线程模式：创建独立网络线程；asyncio模式：在当前运行的事件循环上创建任务
+        """
         self.init_mqtt_client()
+        self._stop_event.clear()
+        if self.async_transport:
+            self.async_task = asyncio.get_event_loop().create_task(self.async_transport.run())
+            return
         # 创建并启动MQTT线程
-        self.mqtt_thread = Thread(target=self._mqtt_loop, daemon=True).start()
+        self.mqtt_thread = Thread(target=self._mqtt_loop, daemon=True)
+        self.mqtt_thread.start()
+
+    def stop_mqtt(self):
+        """停止网络线程并断开连接"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self.async_transport:
+            self.async_transport.wakeup()
+        if self.mqtt_client:
+            self.mqtt_client.disconnect()
+
+    def request_reconnect(self):
+        """
+        网络恢复或App回到前台时调用（任意线程）：
+        清零退避次数，正在等待重连时立即重连
+        """
+        self.backoff.reset()
+        self._wakeup.set()
+        if self.async_transport:
+            self.async_transport.wakeup()
+
+    def _set_state(self, state):
+        self.state = state
+        self._notify_state()
+
+    def add_state_listener(self, listener):
+        """注册连接状态监听函数listener()：状态变化、RTT更新时调用（在网络线程执行）"""
+        if listener not in self._state_listeners:
+            self._state_listeners.append(listener)
+
+    def remove_state_listener(self, listener):
+        if listener in self._state_listeners:
+            self._state_listeners.remove(listener)
+
+    def _notify_state(self):
+        for listener in self._state_listeners:
+            listener()
+
+    def connection_status(self):
+        """当前连接状态快照（任意线程可调用）"""
+        return ConnectionStatus(self.state, self.backoff.attempts, self.retry_at, self.rtt,
+                                self.last_message_at, self.last_error)
+
+    def _maybe_ping(self):
+        """网络循环中定期调用：已连接时每隔RTT_PING_INTERVAL秒测一次往返延迟"""
+        if not self.connected:
+            return
+        now = time.monotonic()
+        if now < self._next_ping_at:
+            return
+        self._next_ping_at = now + RTT_PING_INTERVAL
+        self._ping_sent_at = now
+        self.mqtt_client.publish(self._rtt_topic, b"", qos=0)
 
     def _on_connect(self, client, userdata, flags, rc):
         """MQTT连接成功/失败回调（内部方法，不对外暴露）"""
         if rc == 0:
+            now = time.monotonic()
             self.connected = True
+            self.backoff.connected()
+            if self._ever_connected:
+                self.reconnect_count += 1
+            self._ever_connected = True
+            self.last_connect_seconds = now - self._connect_started
+            self._connect_started = None  # 下次断开后重新开始计时
+            self.retry_at = None
+            self.last_error = None
+            self._next_ping_at = 0.0  # 连上后立即测一次往返延迟
+            self._wakeup.clear()  # 连接期间的重连请求已无意义
+            self._connected_at = now
+            self._waiting_first_message = True
+            self._set_state(STATE_CONNECTED)
+            logger.info("MQTT连接成功，耗时%.2f秒（第%d次尝试）", self.last_connect_seconds, self.connect_attempts)
             self.data_callback("✅ MQTT连接成功，已开始自动接收数据")
             # 订阅需要自动接收的主题（关键：ESP32发送的消息必须对应该主题）
-            client.subscribe("esp32/sensor")  # 传感器数据主题（核心订阅）
-            client.subscribe("esp32/threshold_response")
+            client.subscribe(SENSOR_TOPIC)  # 传感器数据主题（旧版单设备）
+            client.subscribe(SENSOR_TOPIC_WILDCARD)  # 多设备：esp32/<设备编号>/sensor
+            client.subscribe(THRESHOLD_RESPONSE_TOPIC)
+            client.subscribe(BACKFILL_DATA_WILDCARD)  # 设备补传的历史数据：esp32/<设备编号>/backfill_data
+            client.subscribe(self._rtt_topic)
+            # 告知设备App支持的数据格式（保留消息，设备上线即可读到），设备可改用紧凑的二进制格式
+            client.publish("esp32/app/formats", json.dumps({"sensor": list(SUPPORTED_FORMATS)}), qos=0, retain=True)
+            # 补发断网期间积压的指令
+            self.flush_commands()
         else:
             self.connected = False
+            self.last_error = f"错误码{rc}"
             self.data_callback(f"❌ MQTT连接失败，无法自动接收数据（错误码：{rc}）")
 
+    def _on_disconnect(self, client, userdata, rc):
+        """连接断开：之后的指令先进入队列，重连后补发；重连由_mqtt_loop负责"""
+        self.connected = False
+        if rc != 0:
+            logger.warning("MQTT连接异常断开（错误码：%s）", rc)
+
+    def _on_publish(self, client, userdata, mid):
+        """Broker确认收到QoS 1消息（PUBACK）"""
+        if self.command_queue.mark_acked(mid):
+            self._notify_command_status()
+
+    def _notify_command_status(self):
+        if self.command_status_callback:
+            self.command_status_callback()
+
+    def set_command_status_callback(self, callback):
+        """设置指令队列状态变化回调（可能在网络线程执行，UI层需自行切回主线程）"""
+        self.command_status_callback = callback
+
+    def flush_commands(self):
+        """按入队顺序以QoS 1发送所有未过期的待发送指令"""
+        with self._flush_lock:
+            for command_id, topic, payload in self.command_queue.take_pending():
+                if not self.connected:
+                    break
+                # PUBACK可能在publish返回前就由网络线程处理：发送窗口内的未登记确认由队列暂存
+                # （paho在持有内部锁时回调on_publish，不能在队列锁内调用publish）
+                self.command_queue.begin_send()
+                try:
+                    info = self.mqtt_client.publish(topic, payload, qos=1)
+                    if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                        logger.warning("补发指令失败（错误码%s），等待下次连接：[%s] %s", info.rc, topic, payload)
+                        break
+                    self.command_queue.mark_sent(command_id, info.mid)
+                finally:
+                    self.command_queue.end_send()
+                logger.info("已发送：[%s] %s", topic, payload)
+        self._notify_command_status()
+
     def _on_message(self, client, userdata, msg):
         """
         消息到达自动触发（核心：自动接收数据的入口）
         无需手动调用，MQTT客户端收到订阅主题的消息后，自动执行该方法
         """
+        topic = msg.topic
+        raw_payload = msg.payload
+        now = time.monotonic()
+        MESSAGES.inc(1, topic)
+        BYTES_RECEIVED.inc(len(raw_payload))
+        if topic == self._rtt_topic:
+            if self._ping_sent_at is not None:
+                self.rtt = now - self._ping_sent_at
+                self._ping_sent_at = None
+                self._notify_state()
+            return
+        self.last_message_at = now
+        if self._waiting_first_message:
+            self._waiting_first_message = False
+            self.last_first_message_seconds = now - self._connected_at
+            logger.info("连接后收到第一条消息，耗时%.2f秒", self.last_first_message_seconds)
         try:
-            # 1. 解析原始消息
-            topic = msg.topic
-            payload = msg.payload.decode("utf-8")  # 二进制转字符串
-            self.data_callback(f"📥 收到消息：[{topic}] {payload}")  # 转发原始消息到日志
-
-            # 2. 只解析传感器主题的JSON数据（自动接收的核心数据）
-            if topic == "esp32/sensor":
-                # 解析为JSON字典（ESP32必须发送标准JSON，如：{"do":7.25, "ph":7.0, "temp":25.5}）
-                parsed_data = json.loads(payload)
-                self.latest_data = parsed_data  # 保存最新数据，供随时调用
-                print(f"类型：{type(parsed_data)}")  # 打印数据类型（应为dict）
-                print(f"完整数据：{parsed_data}")     # 打印完整字典
-                print(f"溶解氧(do)：{parsed_data.get('do', '未获取到')}")  # 打印单个字段
-                print(f"PH值(ph)：{parsed_data.get('ph', '未获取到')}")    # 打印单个字段
-                print(f"温度(temp)：{parsed_data.get('temp', '未获取到')}")# 打印单个字段
-
-                # 3. 自动转发解析后的数据到UI层（线程安全）
-                if self.parsed_data_callback:
-                    # Clock.schedule_once：确保UI更新在Kivy主线程执行，避免崩溃
-                    Clock.schedule_once(lambda dt: self.parsed_data_callback(parsed_data))
-
-        except json.JSONDecodeError:
-            self.data_callback(f"❌ 数据格式错误：非标准JSON（{payload}）")
-        except Exception as e:
-            self.data_callback(f"❌ 自动接收数据失败：{str(e)}")
+            # 1. 只解析传感器主题的数据（自动接收的核心数据），主题中带设备编号
+            device_id = device_id_from_topic(topic)
+            if device_id is None:
+                backfill_device = device_id_from_backfill_topic(topic)
+                if backfill_device is not None:
+                    # 补传数据量大，不逐条写日志；解析和入库在补传线程完成
+                    if self.backfill is not None:
+                        self.backfill.on_response(backfill_device, raw_payload)
+                    return
+                self.data_callback(f"📥 收到消息：[{topic}] {raw_payload.decode('utf-8', 'replace')}")  # 转发原始消息到日志
+                return
+            self._handle_sensor_message(topic, device_id, raw_payload)
+        except Exception:
+            # 数据格式问题已在_handle_sensor_message中逐项处理，这里只兜底程序错误，避免异常抛到网络循环导致断线重连
+            logger.exception("处理消息失败：[%s]", topic)
 
-    def _mqtt_loop(self):
-        """MQTT客户端循环（修复参数冲突+增加自动重连+超时）"""
-        reconnect_interval = 5  # 重连间隔5秒
-        max_reconnect_attempts = 10  # 最大重连次数
-        reconnect_count = 0
+    def _handle_sensor_message(self, topic, device_id, raw_payload):
+        """网络线程：解码 + 逐字段校验，只把通过校验的字段交给UI/分发器"""
+        with DECODE_SECONDS.time():
+            # 自动识别格式：二进制（魔数开头）直接按结构体解析，否则按JSON解析
+            # JSON示例：{"do":7.25, "ph":7.0, "temp":25.5}
+            try:
+                parsed_data = decode_sensor_payload(raw_payload)
+            except json.JSONDecodeError:
+                self.data_callback(f"❌ 数据格式错误：非标准JSON（{raw_payload!r}）")
+                return
+            except ValueError as e:  # 二进制长度/版本错误、非UTF-8文本
+                self.data_callback(f"❌ 数据格式错误：{str(e)}")
+                return
+            values, errors = SENSOR_SCHEMA.validate(parsed_data)
+        if is_binary_payload(raw_payload):
+            self.data_callback(f"📥 收到消息：[{topic}] (二进制{len(raw_payload)}字节) {parsed_data}")
+        else:
+            self.data_callback(f"📥 收到消息：[{topic}] {raw_payload.decode('utf-8')}")  # 转发原始消息到日志
+        if errors:
+            for name in errors:
+                INVALID_FIELDS.inc(1, name)
+            self.data_callback(f"⚠️ 设备{device_id}数据异常（已忽略）：{format_errors(errors)}")
+        # 调试输出默认关闭；关闭时连格式化参数都不会构造
+        if payload_logger.isEnabledFor(logging.DEBUG):
+            payload_logger.debug("类型：%s 完整数据：%s 溶解氧(do)：%s PH值(ph)：%s 温度(temp)：%s",
+                                 type(parsed_data).__name__, parsed_data,
+                                 parsed_data.get('do', '未获取到'),
+                                 parsed_data.get('ph', '未获取到'),
+                                 parsed_data.get('temp', '未获取到'))
+        if not any(name in values for name in METRIC_FIELDS):
+            return  # 没有可用的传感器数值，不占用UI主线程
+        self.latest_data = values  # 保存最新数据（只含通过校验的字段），供随时调用
+        self.latest_by_device[device_id] = values
+        # 2. 自动转发校验后的数据到UI层（线程安全，同一帧内的消息合并投递）
+        self.sensor_bridge.push(device_id, values)
+        if self.backfill is not None:
+            self.backfill.observe(device_id, values.get("ts"))
+
+    # ======================== 重连状态机（线程模式和asyncio模式共用） ========================
+    def _begin_connect_attempt(self):
+        self.last_error = None
+        self._set_state(STATE_CONNECTING)
+        if self._connect_started is None:
+            self._connect_started = time.monotonic()
+        self.connect_attempts += 1
+
+    def _handle_connection_lost(self, error_text):
+        """
+        连接失败或断开后调用
+        :return: 下次重连前应等待的秒数
+        """
+        was_connected = self.state == STATE_CONNECTED
+        self.connected = False
+        delay = self.backoff.next_delay()
+        self.retry_at = time.monotonic() + delay
+        if self.last_error is None:  # Broker拒绝连接时保留CONNACK错误码
+            self.last_error = error_text
+        self.rtt = None
+        self._set_state(STATE_BACKOFF if was_connected else STATE_FAILED)
+        if was_connected:
+            RECONNECTS.inc()
+            error_msg = f"⚠️ MQTT连接异常断开，{delay:.1f}秒后重连"
+        else:
+            error_msg = f"❌ MQTT连接失败（连续第{self.backoff.attempts}次），{delay:.1f}秒后重连：{error_text}"
+        logger.warning("MQTT连接失败/断开（连续第%d次），%.1f秒后重连：%s", self.backoff.attempts, delay, error_text)
+        self.data_callback(error_msg)
+        return delay
 
-        while reconnect_count < max_reconnect_attempts:
+    def _handle_stopped(self):
+        self.connected = False
+        self._set_state(STATE_STOPPED)
+
+    def _mqtt_loop(self):
+        """
+        MQTT网络线程：重连状态机
+        connecting -> connected -> (断开) -> backoff -> connecting ...
+        connecting -> (失败) -> failed -> connecting ...
+        失败后按指数退避+抖动等待，不设次数上限；request_reconnect()可打断等待
+        """
+        while not self._stop_event.is_set():
+            self._begin_connect_attempt()
             try:
                 # 修复核心问题：删除重复的keepalive参数，仅保留位置参数60
                 self.mqtt_client.connect(self.broker, self.port, 60)
-                self.connected = True
-                self.data_callback("✅ MQTT连接成功，已开始自动接收数据")
-                # 连接成功后持续监听
-                self.mqtt_client.loop_forever()
-                break  # 正常退出循环
+                # 驱动网络收发，直到连接断开或主动停止（连接成功由_on_connect报告）
+                while not self._stop_event.is_set():
+                    rc = self.mqtt_client.loop(timeout=1.0)
+                    if rc != mqtt.MQTT_ERR_SUCCESS:
+                        break
+                    self._maybe_ping()
+                error_text = "连接已断开"
             except Exception as e:
-                reconnect_count += 1
-                self.connected = False
-                error_msg = f"❌ 连接失败（第{reconnect_count}/{max_reconnect_attempts}次重连）：{str(e)}"
-                print(error_msg)
-                self.data_callback(error_msg)
-                # 达到最大次数则停止重连
-                if reconnect_count >= max_reconnect_attempts:
-                    self.data_callback("❌ 已达到最大重连次数，停止尝试")
-                    break
-                # 等待后重试
-                import time
-                time.sleep(reconnect_interval)
-        # 重连失败后标记状态
-        if reconnect_count >= max_reconnect_attempts:
-            self.connected = False
+                error_text = str(e)
+            if self._stop_event.is_set():
+                break
+            delay = self._handle_connection_lost(error_text)
+            # 等待退避时间；网络变化/App回到前台时会被提前唤醒
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+        self._handle_stopped()
+
+    def publish_transient(self, topic, payload):
+        """
+        以QoS 0直接发送，不进入指令队列（补传请求等断线后就失去意义的消息）
+        :return: 是否已发送（未连接时返回False）
+        """
+        if not self.connected:
+            return False
+        return self.mqtt_client.publish(topic, payload, qos=0).rc == mqtt.MQTT_ERR_SUCCESS
 
     def publish_command(self, topic, command):
         """
         对外暴露：发布指令到ESP32
+        指令先写入持久化队列，已连接时立即以QoS 1发送；未连接时暂存，重连后按顺序补发（超过有效期则丢弃）
         :param topic: 发布主题（如esp32/control）
         :param command: 指令内容（如pause/resume）
-        :return: 发送结果（布尔值）
+        :return: 指令是否已被接收（发送或入队）
         """
-        if not self.connected:
-            message = "❌ MQTT未连接，无法发送指令"
-            print(message)
+        try:
+            self.command_queue.enqueue(topic, command)
+        except Exception as e:
+            message = f"❌ 发送失败：{str(e)}"
+            logger.error("指令入队失败：[%s] %s", topic, e)
             self.data_callback(message)
             return False
+        if not self.connected:
+            message = f"⚠️ MQTT未连接，指令已加入待发送队列：{command}"
+            logger.warning("MQTT未连接，指令已入队：[%s] %s", topic, command)
+            self.data_callback(message)
+            self._notify_command_status()
+            return True
         try:
-            self.mqtt_client.publish(topic, command, qos=0)
+            self.flush_commands()
             message = f"📤  已发送：{command}"
-            print(message)
             self.data_callback(message)
             return True
         except Exception as e:
-            message = f"❌ 发送失败：{str(e)}"
-            print(message)
+            # 发送异常的指令仍在队列中，重连后补发
+            message = f"❌ 发送失败，将在重连后重试：{str(e)}"
+            logger.error("发送失败：[%s] %s", topic, e)
             self.data_callback(message)
-            return False
\ No newline at end of file
+            return True
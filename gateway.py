@@ -0,0 +1,218 @@
+# gateway.py：无界面网关（在Linux服务器上汇聚多台ESP32的数据，不依赖Kivy）
+# 与App共用MQTT客户端、数据解析、历史数据库和阈值逻辑；样本按设备分片到工作线程批量入库
+# 运行：python gateway.py --host <broker> --port 8883 --username esp32 --password *** --db sensor_history.db
+#      可选：--workers 8 --transport asyncio --max-do 9 --min-do 5（启动时向设备下发阈值）
+#            --deadband do=0.05,ph=0.05,temp=0.1 --heartbeat 300（只记录变化的数据），--record-all（记录每条样本）
+#            --metrics-dump metrics.prom（每个统计周期写出运行指标，.prom为Prometheus文本，其他扩展名为JSON）
+#            --ingest-policy keep_latest_per_device --queue-size 10000（工作线程处理不过来时的队列策略）
+#            --no-backfill（重连后不向设备补传离线期间的历史数据）
+import argparse
+import asyncio
+import logging
+import signal
+import time
+from threading import Event
+
+from alarm_engine import AlarmEngine, EVENT_RAISED, default_rules, do_threshold_rule
+from app_logging import get_logger, setup_logging, shutdown_logging
+from backfill import BackfillManager
+from command_queue import OutboundCommandQueue
+from deadband import ChangeFilter, DEFAULT_HEARTBEAT, parse_deadbands
+from device_state import DeviceStateTable, sensor_values
+from esp32_mqtt_utils import Esp32MqttClient, TRANSPORT_THREAD, TRANSPORT_ASYNCIO
+from history_store import SensorHistoryStore
+from ingest_queue import POLICIES, POLICY_DROP_OLDEST
+from metrics import REGISTRY, INVALID_FIELDS, BACKFILL_ROWS
+from sensor_dispatch import WorkerPoolDispatcher
+from thresholds import THRESHOLD_TOPIC, validate_threshold, build_threshold_payload
+
+logger = get_logger("gateway")
+
+GATEWAY_HISTORY_CAPACITY = 1000  # 网关内存中每个设备只保留少量样本，完整历史在数据库中
+
+
+class GatewayIngest:
+    """
+    工作线程的批处理函数：取出数值（网络线程已校验）、更新设备状态、写入历史数据库、判断报警规则
+    同一设备只会由同一个工作线程处理（WorkerPoolDispatcher按设备分片），设备状态和报警状态无需加锁
+    """
+
+    def __init__(self, store, max_do=None, min_do=None, change_filter=None):
+        """
+        :param change_filter: ChangeFilter，数值在死区内的样本只计入聚合，不写入历史（None表示记录每条样本）
+        """
+        self.store = store
+        self.devices = DeviceStateTable(GATEWAY_HISTORY_CAPACITY)
+        self.change_filter = change_filter or ChangeFilter(enabled=False)
+        self.alarms = AlarmEngine(default_rules(max_do, min_do), notifier=log_alarm)
+
+    def consume(self, batch):
+        for ts, device_id, parsed_data in batch:
+            do_value, ph_value, temp_value = sensor_values(parsed_data)  # 网络线程已校验
+            keep = self.change_filter.accept(device_id, ts, do_value, ph_value, temp_value)
+            self.devices.record(device_id, ts, do_value, ph_value, temp_value, keep)
+            self.store.append(ts, do_value, ph_value, temp_value, device_id, keep, parsed_data.get("ts"))
+            self.alarms.evaluate(device_id, ts, do_value, ph_value, temp_value)
+
+
+def log_alarm(event):
+    """报警进入/解除各记录一次（已去抖），避免每条样本都刷日志"""
+    if event.kind == EVENT_RAISED:
+        logger.warning(event.message)
+    else:
+        logger.info(event.message)
+
+
+def log_client_message(content):
+    """客户端状态/消息回调：逐条收到的消息只在调试模式输出（服务器上消息量很大）"""
+    if content.startswith("📥"):
+        logger.debug(content)
+    else:
+        logger.info(content)
+
+
+def build_gateway(args):
+    store = SensorHistoryStore(args.db, retention_days=args.retention_days)
+    store.start()
+    max_do = min_do = None
+    if args.max_do is not None:
+        max_do, min_do = validate_threshold(args.max_do, args.min_do)
+    change_filter = ChangeFilter(parse_deadbands(args.deadband), args.heartbeat, enabled=not args.record_all)
+    ingest = GatewayIngest(store, max_do, min_do, change_filter)
+    dispatcher = WorkerPoolDispatcher(ingest.consume, workers=args.workers, maxlen=args.queue_size,
+                                      policy=args.ingest_policy)
+    dispatcher.start()
+    client = Esp32MqttClient(
+        broker=args.host,
+        port=args.port,
+        username=args.username,
+        password=args.password,
+        data_callback=log_client_message,
+        command_queue=OutboundCommandQueue(args.command_db),
+        use_tls=not args.no_tls,
+        transport=args.transport,
+        dispatcher=dispatcher,
+    )
+    if max_do is not None:
+        client.publish_command(THRESHOLD_TOPIC, build_threshold_payload(max_do, min_do))
+    if not args.no_backfill:
+        # 补传样本直接写入数据库；网关内存中的设备历史只用于报警，不合并补传数据
+        BackfillManager(client, store).start()
+    return store, ingest, dispatcher, client
+
+
+def log_stats(ingest, dispatcher, client):
+    logger.info("状态：%s | 设备%d台 | 已处理%d条 | 丢弃%d条 | 补传%d条 | 异常字段%d个 | 未变化%d条 | 报警中%d项",
+                client.state, len(ingest.devices), dispatcher.processed, dispatcher.dropped, BACKFILL_ROWS.value, INVALID_FIELDS.total(),
+                ingest.change_filter.suppressed, len(ingest.alarms.active_alarms()))
+
+
+def dump_metrics(args):
+    if args.metrics_dump:
+        try:
+            REGISTRY.dump(args.metrics_dump)
+        except OSError as e:
+            logger.warning("运行指标写出失败：%s", e)
+
+
+def shutdown_gateway(store, dispatcher, client):
+    if client.backfill:
+        client.backfill.stop()
+    client.stop_mqtt()
+    dispatcher.stop()
+    store.close()
+    client.command_queue.close()
+
+
+def run_threaded(args):
+    store, ingest, dispatcher, client = build_gateway(args)
+    stop = Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    client.start_mqtt()
+    deadline = time.monotonic() + args.duration if args.duration else None
+    while not stop.wait(args.stats_interval):
+        log_stats(ingest, dispatcher, client)
+        dump_metrics(args)
+        if deadline and time.monotonic() >= deadline:
+            break
+    shutdown_gateway(store, dispatcher, client)
+    log_stats(ingest, dispatcher, client)
+    dump_metrics(args)
+
+
+async def run_asyncio(args):
+    store, ingest, dispatcher, client = build_gateway(args)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGINT, stop.set)
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    client.start_mqtt()
+    deadline = time.monotonic() + args.duration if args.duration else None
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), args.stats_interval)
+        except asyncio.TimeoutError:
+            pass
+        log_stats(ingest, dispatcher, client)
+        dump_metrics(args)
+        if deadline and time.monotonic() >= deadline:
+            break
+    shutdown_gateway(store, dispatcher, client)
+    await client.async_task
+    log_stats(ingest, dispatcher, client)
+    dump_metrics(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ESP32传感器数据无界面网关")
+    parser.add_argument("--host", required=True, help="MQTT Broker地址")
+    parser.add_argument("--port", type=int, default=8883)
+    parser.add_argument("--username", default="")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--no-tls", action="store_true", help="不使用TLS（本地测试Broker）")
+    parser.add_argument("--db", default="sensor_history.db", help="历史数据库路径")
+    parser.add_argument("--command-db", default="outbound_commands.db", help="下行指令队列数据库路径")
+    parser.add_argument("--retention-days", type=int, default=30, help="历史数据保留天数")
+    parser.add_argument("--workers", type=int, default=4, help="入库工作线程数")
+    parser.add_argument("--queue-size", type=int, default=10000, help="每个工作线程的队列上限")
+    parser.add_argument("--ingest-policy", choices=POLICIES, default=POLICY_DROP_OLDEST,
+                        help="队列满时的策略：丢弃最旧/每个设备只保留最新/阻塞网络线程")
+    parser.add_argument("--transport", choices=(TRANSPORT_THREAD, TRANSPORT_ASYNCIO), default=TRANSPORT_THREAD)
+    parser.add_argument("--max-do", help="溶解氧阈值上限（与--min-do同时指定，启动时下发给设备）")
+    parser.add_argument("--min-do", help="溶解氧阈值下限")
+    parser.add_argument("--deadband", default="", help="各指标死区，如do=0.05,ph=0.05,temp=0.1（未指定的用默认值）")
+    parser.add_argument("--heartbeat", type=float, default=DEFAULT_HEARTBEAT, help="数值不变时的心跳记录间隔（秒）")
+    parser.add_argument("--record-all", action="store_true", help="记录每条样本（不做变化检测）")
+    parser.add_argument("--no-backfill", action="store_true", help="重连后不向设备补传离线期间的历史数据")
+    parser.add_argument("--metrics-dump", help="运行指标输出文件（.prom为Prometheus文本，其他为JSON）")
+    parser.add_argument("--stats-interval", type=float, default=30.0, help="统计日志间隔（秒）")
+    parser.add_argument("--duration", type=float, default=0, help="运行秒数，0表示一直运行")
+    parser.add_argument("--debug", action="store_true", help="输出调试日志")
+    args = parser.parse_args()
+    if (args.max_do is None) != (args.min_do is None):
+        parser.error("--max-do和--min-do需要同时指定")
+    if args.max_do is not None:
+        try:
+            do_threshold_rule(*validate_threshold(args.max_do, args.min_do))
+        except ValueError:
+            parser.error(f"阈值无效：请输入数字，且最高值不低于最低值（最高={args.max_do}，最低={args.min_do}）")
+    try:
+        parse_deadbands(args.deadband)
+    except ValueError as e:
+        parser.error(f"死区参数无效：{e}")
+
+    setup_logging(logging.DEBUG if args.debug else logging.INFO)
+    if args.metrics_dump:
+        REGISTRY.acquire()  # 有人读取指标时才记录计时类指标
+    try:
+        if args.transport == TRANSPORT_ASYNCIO:
+            asyncio.run(run_asyncio(args))
+        else:
+            run_threaded(args)
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
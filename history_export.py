@@ -0,0 +1,186 @@
+# history_export.py：历史数据导出（CSV / 压缩列式文件），按块流式读写，内存占用与导出范围无关
+# 数据库分块读取（生成器）-> 逐块转换 -> 逐块写入临时文件，完成后再改名，导出中断不会留下半个文件
+# 本模块不依赖Kivy：App在后台线程调用，网关/桌面工具可直接调用
+#
+# 列式文件格式（.ecol）：
+#   文件头  b"ESPCOL1\n" + uint32(头部JSON长度) + 头部JSON {"source": ..., "columns": [[列名, 类型], ...]}
+#   行组    uint32(行数) + 每列 uint32(压缩后长度) + zlib压缩的列数据，一个数据库分块对应一个行组
+#           f8列为小端double数组（缺失值为NaN），i8列为小端int64数组，str列为UTF-8文本以换行分隔
+#   结尾    uint32(0)
+import csv
+import datetime
+import json
+import math
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+FORMAT_CSV = "csv"
+FORMAT_COLUMNAR = "ecol"
+FORMATS = (FORMAT_CSV, FORMAT_COLUMNAR)
+
+SOURCE_SAMPLES = "samples"  # 原始样本；其余取值为聚合分辨率（minute/hour/day）
+
+COLUMNAR_MAGIC = b"ESPCOL1\n"
+DEFAULT_CHUNK_SIZE = 5000
+NAN = float("nan")
+
+# 各数据源的列：(列名, 类型)
+SAMPLE_COLUMNS = (("ts", "f8"), ("device_id", "str"), ("do_value", "f8"), ("ph_value", "f8"),
+                  ("temp_value", "f8"))
+ROLLUP_COLUMNS = (("bucket", "f8"), ("device_id", "str"), ("metric", "str"), ("min_value", "f8"),
+                  ("max_value", "f8"), ("mean_value", "f8"), ("count", "i8"))
+
+
+class ExportCancelled(Exception):
+    """用户取消导出"""
+
+
+def export_filename(source, fmt, device_id=None, now=None):
+    """导出文件名，如 esp32_samples_default_20260111_160000.csv"""
+    stamp = (now or datetime.datetime.now()).strftime("%Y%m%d_%H%M%S")
+    return f"esp32_{source}_{device_id or 'all'}_{stamp}.{fmt}"
+
+
+def _rollup_rows(chunks):
+    """聚合行：总和/样本数换算为均值"""
+    for chunk in chunks:
+        yield [(bucket, device_id, metric, min_value, max_value, total / count, count)
+               for bucket, device_id, metric, min_value, max_value, total, count in chunk]
+
+
+def open_source(store, source, start_ts=None, end_ts=None, device_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    :param source: samples 或 聚合分辨率
+    :return: (列定义, 总行数, 分块生成器)
+    """
+    if source == SOURCE_SAMPLES:
+        return (SAMPLE_COLUMNS, store.count_range(start_ts, end_ts, device_id),
+                store.iter_range(start_ts, end_ts, device_id, chunk_size))
+    return (ROLLUP_COLUMNS, store.count_rollups(source, start_ts, end_ts, device_id),
+            _rollup_rows(store.iter_rollups(source, start_ts, end_ts, device_id, chunk_size)))
+
+
+# ======================== CSV ========================
+def _write_csv(output, columns, chunks):
+    writer = csv.writer(output)
+    # 第一列为时间戳，前面额外输出一列可读时间
+    writer.writerow(["time"] + [name for name, _ in columns])
+    for chunk in chunks:
+        writer.writerows(
+            [datetime.datetime.fromtimestamp(row[0]).strftime("%Y-%m-%d %H:%M:%S")] +
+            ["" if value is None else value for value in row]
+            for row in chunk)
+        yield len(chunk)
+
+
+# ======================== 列式 ========================
+def _encode_column(kind, values):
+    if kind == "str":
+        data = "\n".join(values).encode("utf-8")
+    else:
+        column = array("q" if kind == "i8" else "d",
+                       values if kind == "i8" else (NAN if value is None else value for value in values))
+        if sys.byteorder != "little":
+            column.byteswap()
+        data = column.tobytes()
+    return zlib.compress(data, 6)
+
+
+def _decode_column(kind, data, rows):
+    data = zlib.decompress(data)
+    if kind == "str":
+        return data.decode("utf-8").split("\n") if rows else []
+    column = array("q" if kind == "i8" else "d")
+    column.frombytes(data)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column
+
+
+def _write_columnar(output, columns, chunks, source):
+    header = json.dumps({"source": source, "columns": [list(column) for column in columns]}).encode("utf-8")
+    output.write(COLUMNAR_MAGIC + struct.pack("<I", len(header)) + header)
+    for chunk in chunks:
+        output.write(struct.pack("<I", len(chunk)))
+        for index, (_, kind) in enumerate(columns):
+            data = _encode_column(kind, [row[index] for row in chunk])
+            output.write(struct.pack("<I", len(data)) + data)
+        yield len(chunk)
+    output.write(struct.pack("<I", 0))
+
+
+def read_columnar(path):
+    """
+    逐个行组读取列式文件（供桌面端分析工具使用）
+    :return: 生成器，每次产出{列名: 数值序列}；f8列中的NaN表示缺失值
+    """
+    with open(path, "rb") as source:
+        if source.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError("不是列式导出文件")
+        header_length, = struct.unpack("<I", source.read(4))
+        columns = json.loads(source.read(header_length))["columns"]
+        while True:
+            rows, = struct.unpack("<I", source.read(4))
+            if not rows:
+                return
+            group = {}
+            for name, kind in columns:
+                length, = struct.unpack("<I", source.read(4))
+                group[name] = _decode_column(kind, source.read(length), rows)
+            yield group
+
+
+# ======================== 导出入口 ========================
+def export_history(store, path, fmt=FORMAT_CSV, source=SOURCE_SAMPLES, start_ts=None, end_ts=None,
+                   device_id=None, progress=None, cancel=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    流式导出历史数据（在后台线程调用）
+    :param store: SensorHistoryStore
+    :param path: 导出文件路径（先写入path.part，完成后改名）
+    :param fmt: csv / ecol
+    :param source: samples（原始样本）或 minute/hour/day（聚合，长时间范围导出更快、文件更小）
+    :param start_ts/end_ts: 时间范围[start_ts, end_ts)，None表示不限
+    :param device_id: 只导出一个设备，None表示全部设备
+    :param progress: 进度回调progress(已写行数, 总行数)，每写完一块调用一次（在调用线程中）
+    :param cancel: threading.Event，置位后在下一块之前停止并删除临时文件
+    :return: 写入的行数
+    :raises ExportCancelled: 已取消
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式：{fmt}")
+    columns, total, chunks = open_source(store, source, start_ts, end_ts, device_id, chunk_size)
+    temp_path = path + ".part"
+    done = 0
+    try:
+        if fmt == FORMAT_CSV:
+            with open(temp_path, "w", encoding="utf-8-sig", newline="") as output:
+                for count in _write_csv(output, columns, chunks):
+                    done = _advance(done, count, total, progress, cancel)
+        else:
+            with open(temp_path, "wb") as output:
+                for count in _write_columnar(output, columns, chunks, source):
+                    done = _advance(done, count, total, progress, cancel)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return done
+
+
+def _advance(done, count, total, progress, cancel):
+    done += count
+    if progress is not None:
+        progress(done, max(total, done))
+    if cancel is not None and cancel.is_set():
+        raise ExportCancelled()
+    return done
+
+
+def format_progress(done, total):
+    """进度文字，如 导出中 12000/50000（24%）"""
+    percent = math.floor(done * 100 / total) if total else 100
+    return f"导出中 {done}/{total}（{percent}%）"
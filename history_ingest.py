@@ -0,0 +1,26 @@
+# history_ingest.py：样本记录的公共路径（死区过滤 → 设备状态/历史缓冲区 → 聚合 → 持久化 → 报警规则）
+# App首页的update_history_batch和端到端基准测试的无界面模式共用；本模块不依赖Kivy
+
+
+def record_samples(samples, devices, rollups, change_filter, alarms, store=None):
+    """
+    记录一批样本
+    :param samples: [(设备编号, 接收时间戳, 溶解氧, PH, 温度, 设备时间戳), ...]，未上传的字段为None
+    :param devices: DeviceStateTable
+    :param rollups: RollupTable
+    :param change_filter: ChangeFilter（数值在死区内的样本只更新最新值、聚合和报警规则，不写入历史）
+    :param alarms: AlarmEngine
+    :param store: SensorHistoryStore（None表示不持久化）
+    :return: {设备编号: 新增历史样本数}
+    """
+    new_counts = {}
+    for device_id, ts, do_value, ph_value, temp_value, device_ts in samples:
+        keep = change_filter.accept(device_id, ts, do_value, ph_value, temp_value)
+        devices.record(device_id, ts, do_value, ph_value, temp_value, keep)
+        rollups.add(device_id, ts, do_value, ph_value, temp_value)
+        if store is not None:
+            store.append(ts, do_value, ph_value, temp_value, device_id, keep, device_ts)
+        alarms.evaluate(device_id, ts, do_value, ph_value, temp_value)
+        if keep:
+            new_counts[device_id] = new_counts.get(device_id, 0) + 1
+    return new_counts
@@ -0,0 +1,422 @@
+# history_store.py：传感器历史数据持久化存储（SQLite WAL + 后台批量写入）
+import os
+import sqlite3
+import time
+from collections import deque
+from threading import Thread, Event, Lock
+from app_logging import get_logger
+from rollups import RESOLUTIONS, aggregate_batch
+from metrics import HISTORY_WRITE_SECONDS, HISTORY_ROWS
+
+logger = get_logger("history")
+
+# 建表语句（auto_vacuum必须在建表前设置，才能在压缩时增量回收空间）
+_SCHEMA = (
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    """CREATE TABLE IF NOT EXISTS samples (
+        device_id TEXT NOT NULL,
+        ts REAL NOT NULL,
+        do_value REAL,
+        ph_value REAL,
+        temp_value REAL,
+        PRIMARY KEY (device_id, ts)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_samples_ts ON samples (ts)",
+    # 每分钟/每小时/每天的聚合（与样本在同一事务中更新，长时间范围查询只读这张表）
+    """CREATE TABLE IF NOT EXISTS rollups (
+        device_id TEXT NOT NULL,
+        resolution TEXT NOT NULL,
+        bucket REAL NOT NULL,
+        metric TEXT NOT NULL,
+        min_value REAL NOT NULL,
+        max_value REAL NOT NULL,
+        total REAL NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (device_id, resolution, bucket, metric)
+    ) WITHOUT ROWID""",
+    # 每个设备最后收到的样本（含只计入聚合的死区样本），与样本在同一事务中更新；补传从这里确定缺失起点
+    # last_ts为接收时间，device_ts为设备时钟的时间戳（实时数据不带ts的旧固件为NULL）
+    """CREATE TABLE IF NOT EXISTS devices (
+        device_id TEXT PRIMARY KEY,
+        last_ts REAL NOT NULL,
+        device_ts REAL
+    ) WITHOUT ROWID""",
+)
+
+# 已有的桶与本批次的增量合并
+_UPSERT_ROLLUP = """INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (device_id, resolution, bucket, metric) DO UPDATE SET
+        min_value = min(min_value, excluded.min_value),
+        max_value = max(max_value, excluded.max_value),
+        total = total + excluded.total,
+        count = count + excluded.count"""
+
+# 时间戳只前进不后退（补传的旧样本不会把游标拉回去）；SQLite多参数max()遇到NULL返回NULL
+_UPSERT_DEVICE = """INSERT INTO devices VALUES (?, ?, ?)
+    ON CONFLICT (device_id) DO UPDATE SET
+        last_ts = max(last_ts, excluded.last_ts),
+        device_ts = coalesce(max(device_ts, excluded.device_ts), device_ts, excluded.device_ts)"""
+
+_ROLLUPS_SQL = ("SELECT device_id, bucket, metric, min_value, max_value, total, count FROM rollups "
+                "WHERE resolution = ? AND bucket >= ? AND bucket < ?")
+
+DEFAULT_DEVICE_ID = "default"
+
+
+class SensorHistoryStore:
+    """
+    传感器历史数据存储
+    - 写入：UI线程只把样本放入内存队列，后台线程按批次提交事务（不阻塞UI）
+    - 读取：独立只读连接，WAL模式下读写互不阻塞
+    - 聚合：每批样本写入时同时更新rollups表（每分钟/每小时/每天），聚合数据保留时间比原始样本长
+    - 保留策略：定期删除超过保留天数的数据，并增量回收磁盘空间
+    """
+
+    def __init__(self, db_path, retention_days=30, batch_size=200,
+                 flush_interval=1.0, compact_interval=3600):
+        """
+        :param db_path: 数据库文件路径（Android上放在App的user_data_dir下）
+        :param retention_days: 数据保留天数，超过的样本在压缩时删除
+        :param batch_size: 单个事务最多写入的样本数
+        :param flush_interval: 后台线程最长攒批时间（秒）
+        :param compact_interval: 执行保留策略/压缩的间隔（秒）
+        """
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self._pending = deque()  # 待写入样本（deque的append/popleft线程安全）
+        self._wakeup = Event()
+        self._stopped = Event()
+        self._flushed = Event()
+        self._writer_thread = None
+        self._read_conn = None
+        self._read_lock = Lock()
+        self._ready = Event()          # 写入线程已完成建表后的补算，开始写入本次运行的样本
+        self._startup_conn = None      # 启动快照的只读连接（load_startup用完即关闭）
+
+    # ======================== 连接管理 ========================
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        # WAL模式下NORMAL已能保证一致性，只在断电时可能丢失最后一个事务
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def start(self, startup_snapshot=False):
+        """
+        建表并启动后台写入线程
+        :param startup_snapshot: 为load_startup保留一个启动时的读快照（不含本次运行写入的样本）
+        """
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        with conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        conn.close()
+        if startup_snapshot:
+            self._startup_conn = self._connect()
+        self._writer_thread = Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+
+    def close(self):
+        """停止后台线程（会先写完队列里剩余的样本）"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._writer_thread:
+            self._writer_thread.join(timeout=5)
+            self._writer_thread = None
+        if self._startup_conn is not None:
+            self._startup_conn.close()
+            self._startup_conn = None
+        with self._read_lock:
+            if self._read_conn:
+                self._read_conn.close()
+                self._read_conn = None
+
+    # ======================== 写入 ========================
+    def append(self, ts, do_value, ph_value, temp_value, device_id=DEFAULT_DEVICE_ID, keep_sample=True,
+               device_ts=None):
+        """
+        追加一个样本（O(1)，只入队，不做任何IO）
+        :param keep_sample: False表示数值没有变化（死区内），只计入聚合，不写入samples表
+        :param device_ts: 消息中设备时钟的时间戳（没有时为None），记入devices表作为补传游标
+        """
+        self._pending.append((device_id, ts, do_value, ph_value, temp_value, keep_sample, device_ts))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self, timeout=5):
+        """请求立即落盘并等待完成（用于App暂停/退出）"""
+        if not self._writer_thread:
+            return
+        self._flushed.clear()
+        self._wakeup.set()
+        self._flushed.wait(timeout)
+
+    def _writer_loop(self):
+        conn = self._connect()
+        last_compact = 0
+        try:
+            self._build_missing_devices(conn)
+            self._build_missing_rollups(conn)
+            if self._startup_conn is not None:
+                # WAL下读事务的快照在第一次读取时确定：在写入第一批样本之前建立
+                self._startup_conn.execute("BEGIN")
+                self._startup_conn.execute("SELECT 1 FROM devices LIMIT 1").fetchall()
+            self._ready.set()
+            while True:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self._write_pending(conn)
+                self._flushed.set()
+                if self._stopped.is_set():
+                    break
+                now = time.time()
+                # 启动快照未读完时不压缩（截断WAL要等所有读事务结束）
+                if now - last_compact >= self.compact_interval and self._startup_conn is None:
+                    self._compact(conn, now)
+                    last_compact = now
+        except Exception:
+            logger.exception("历史数据写入线程异常")
+        finally:
+            self._ready.set()
+            conn.close()
+
+    def _write_pending(self, conn):
+        while self._pending:
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.popleft())
+            new_samples = []
+            inserted = 0
+            devices = {}  # 设备编号 -> [最新接收时间, 最新设备时间戳]
+            with HISTORY_WRITE_SECONDS.time(), conn:
+                for row in batch:
+                    sample = row[:5]
+                    device_id, ts, device_ts = row[0], row[1], row[6]
+                    latest = devices.get(device_id)
+                    if latest is None:
+                        devices[device_id] = [ts, device_ts]
+                    else:
+                        if ts > latest[0]:
+                            latest[0] = ts
+                        if device_ts is not None and (latest[1] is None or device_ts > latest[1]):
+                            latest[1] = device_ts
+                    if not row[5]:
+                        new_samples.append(sample)  # 死区内的样本只计入聚合
+                        continue
+                    # 同一设备同一时间戳的样本只保留第一条；重复投递（补传、QoS 1重发）不重复计入聚合
+                    if conn.execute("INSERT OR IGNORE INTO samples VALUES (?, ?, ?, ?, ?)", sample).rowcount:
+                        new_samples.append(sample)
+                        inserted += 1
+                conn.executemany(_UPSERT_ROLLUP, aggregate_batch(new_samples))
+                conn.executemany(_UPSERT_DEVICE, [(device_id, last_ts, device_ts)
+                                                  for device_id, (last_ts, device_ts) in devices.items()])
+            HISTORY_ROWS.inc(inserted)
+
+    def _build_missing_devices(self, conn):
+        """旧版本数据库没有devices表：按主键取每个设备的最新样本补上（只执行一次）"""
+        if conn.execute("SELECT 1 FROM devices LIMIT 1").fetchone():
+            return
+        with conn:
+            conn.execute("INSERT INTO devices SELECT device_id, MAX(ts), NULL FROM samples GROUP BY device_id")
+
+    def _build_missing_rollups(self, conn):
+        """旧版本数据库只有原始样本：在后台线程中分批补算聚合（只执行一次）"""
+        if conn.execute("SELECT 1 FROM rollups LIMIT 1").fetchone():
+            return
+        cursor = conn.execute("SELECT device_id, ts, do_value, ph_value, temp_value FROM samples")
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            with conn:
+                conn.executemany(_UPSERT_ROLLUP, aggregate_batch(rows))
+
+    def _compact(self, conn, now):
+        """保留策略：删除过期数据，回收空闲页并截断WAL文件"""
+        cutoff = now - self.retention_days * 86400
+        with conn:
+            conn.execute("DELETE FROM samples WHERE ts < ?", (cutoff,))
+            for name, _, _, keep_seconds in RESOLUTIONS:
+                conn.execute("DELETE FROM rollups WHERE resolution = ? AND bucket < ?", (name, now - keep_seconds))
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # ======================== 读取 ========================
+    def _reader(self):
+        if self._read_conn is None:
+            self._read_conn = self._connect()
+        return self._read_conn
+
+    def load_recent(self, limit, device_id=None):
+        """
+        读取最近的样本（按时间倒序，走ts索引，启动时不需要扫描全表）
+        :return: [(device_id, ts, do, ph, temp), ...]
+        """
+        sql = "SELECT device_id, ts, do_value, ph_value, temp_value FROM samples"
+        params = []
+        if device_id is not None:
+            sql += " WHERE device_id = ?"
+            params.append(device_id)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        params.append(limit)
+        with self._read_lock:
+            return self._reader().execute(sql, params).fetchall()
+
+    def device_ids(self):
+        """所有有历史数据的设备编号（读devices表，不扫描样本）"""
+        with self._read_lock:
+            return [row[0] for row in self._reader().execute("SELECT device_id FROM devices ORDER BY device_id")]
+
+    def device_cursors(self):
+        """
+        每个设备最后收到的样本（补传时确定缺失起点）
+        :return: {设备编号: (接收时间, 设备时间戳或None)}
+        """
+        with self._read_lock:
+            return {device_id: (last_ts, device_ts) for device_id, last_ts, device_ts in
+                    self._reader().execute("SELECT device_id, last_ts, device_ts FROM devices")}
+
+    def load_startup(self, limit, rollup_table):
+        """
+        后台线程（App启动时）：从启动快照读取每个设备最近的样本，并用聚合填充rollup_table
+        快照不含本次运行写入的数据，读取期间到达的实时样本不会与结果重复；需以start(startup_snapshot=True)启动
+        :param limit: 每个设备最多读取的样本数
+        :return: {设备编号: [(ts, do, ph, temp), ...]按时间正序}
+        """
+        self._ready.wait()
+        conn = self._startup_conn
+        if conn is None:
+            return {}
+        try:
+            now = time.time()
+            for name, seconds, capacity, _ in RESOLUTIONS:
+                for device_id, bucket, metric, min_value, max_value, total, count in conn.execute(
+                        _ROLLUPS_SQL + " ORDER BY bucket", (name, now - seconds * capacity, now + seconds)):
+                    rollup_table.get(device_id).series[name].merge(bucket, metric, min_value, max_value,
+                                                                   total, count)
+            recent = {}
+            for (device_id,) in conn.execute("SELECT device_id FROM devices").fetchall():
+                # 按主键(device_id, ts)倒序取最近的limit条，不扫描其他设备的样本
+                rows = conn.execute("SELECT ts, do_value, ph_value, temp_value FROM samples "
+                                    "WHERE device_id = ? ORDER BY ts DESC LIMIT ?", (device_id, limit)).fetchall()
+                if rows:
+                    rows.reverse()
+                    recent[device_id] = rows
+            return recent
+        finally:
+            self._startup_conn = None
+            conn.close()
+
+    def query_range(self, start_ts, end_ts, device_id=None):
+        """按时间范围读取样本（按时间正序）"""
+        sql = ("SELECT device_id, ts, do_value, ph_value, temp_value FROM samples "
+               "WHERE ts >= ? AND ts < ?")
+        params = [start_ts, end_ts]
+        if device_id is not None:
+            sql += " AND device_id = ?"
+            params.append(device_id)
+        sql += " ORDER BY ts"
+        with self._read_lock:
+            return self._reader().execute(sql, params).fetchall()
+
+    def query_rollups(self, resolution, start_ts, end_ts, device_id=None):
+        """
+        按时间范围读取聚合（按时间正序）
+        :return: [(device_id, 桶起点, 指标, 最小值, 最大值, 总和, 样本数), ...]
+        """
+        sql = _ROLLUPS_SQL
+        params = [resolution, start_ts, end_ts]
+        if device_id is not None:
+            sql += " AND device_id = ?"
+            params.append(device_id)
+        sql += " ORDER BY bucket"
+        with self._read_lock:
+            return self._reader().execute(sql, params).fetchall()
+
+    def load_rollups(self, rollup_table, since=None):
+        """
+        用数据库中的聚合填充内存中的RollupTable（App启动时）
+        :param since: 只加载该时间之后的桶（默认按各分辨率在内存中保留的桶数）
+        """
+        now = time.time()
+        for name, seconds, capacity, _ in RESOLUTIONS:
+            start = since if since is not None else now - seconds * capacity
+            for device_id, bucket, metric, min_value, max_value, total, count in \
+                    self.query_rollups(name, start, now + seconds):
+                rollup_table.get(device_id).series[name].merge(bucket, metric, min_value, max_value, total, count)
+
+    # ======================== 分块读取（导出用） ========================
+    def _iter_chunks(self, sql, params, key_columns, key_size, chunk_size):
+        """
+        键集分页：每次按排序键取下一块，只在取数时持有读锁（导出期间UI仍可查询）
+        :param sql: 带{after}占位的查询（{after}放在其余过滤条件之后，替换为“ AND 排序键大于上一块末尾”，
+                    与参数顺序params + 上一块末尾的键一致），最后一个参数为LIMIT
+        :param key_columns: 排序键列名，对应结果行的前key_size列
+        """
+        last = None
+        while True:
+            if last is None:
+                query, query_params = sql.format(after=""), params
+            else:
+                query = sql.format(after=f" AND ({key_columns}) > ({', '.join('?' * key_size)})")
+                query_params = params + list(last)
+            with self._read_lock:
+                rows = self._reader().execute(query, query_params + [chunk_size]).fetchall()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1][:key_size]
+
+    @staticmethod
+    def _range_filter(column, start_ts, end_ts, device_id):
+        conditions, params = [], []
+        if start_ts is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(start_ts)
+        if end_ts is not None:
+            conditions.append(f"{column} < ?")
+            params.append(end_ts)
+        if device_id is not None:
+            conditions.append("device_id = ?")
+            params.append(device_id)
+        return "".join(f" AND {condition}" for condition in conditions), params
+
+    def count_range(self, start_ts=None, end_ts=None, device_id=None):
+        """时间范围内的样本数（用于导出进度）"""
+        where, params = self._range_filter("ts", start_ts, end_ts, device_id)
+        with self._read_lock:
+            return self._reader().execute(f"SELECT COUNT(*) FROM samples WHERE 1{where}", params).fetchone()[0]
+
+    def iter_range(self, start_ts=None, end_ts=None, device_id=None, chunk_size=5000):
+        """
+        分块读取样本（按时间正序），内存占用与时间范围无关
+        :return: 生成器，每次产出[(ts, device_id, do, ph, temp), ...]
+        """
+        where, params = self._range_filter("ts", start_ts, end_ts, device_id)
+        sql = ("SELECT ts, device_id, do_value, ph_value, temp_value FROM samples "
+               f"WHERE 1{where}{{after}} ORDER BY ts, device_id LIMIT ?")
+        return self._iter_chunks(sql, params, "ts, device_id", 2, chunk_size)
+
+    def count_rollups(self, resolution, start_ts=None, end_ts=None, device_id=None):
+        where, params = self._range_filter("bucket", start_ts, end_ts, device_id)
+        with self._read_lock:
+            return self._reader().execute(f"SELECT COUNT(*) FROM rollups WHERE resolution = ?{where}",
+                                          [resolution] + params).fetchone()[0]
+
+    def iter_rollups(self, resolution, start_ts=None, end_ts=None, device_id=None, chunk_size=5000):
+        """
+        分块读取聚合（按桶起点正序）
+        :return: 生成器，每次产出[(桶起点, device_id, 指标, 最小值, 最大值, 总和, 样本数), ...]
+        """
+        where, params = self._range_filter("bucket", start_ts, end_ts, device_id)
+        sql = ("SELECT bucket, device_id, metric, min_value, max_value, total, count FROM rollups "
+               f"WHERE resolution = ?{where}{{after}} ORDER BY bucket, device_id, metric LIMIT ?")
+        return self._iter_chunks(sql, [resolution] + params, "bucket, device_id, metric", 3, chunk_size)
@@ -0,0 +1,113 @@
+# ingest_queue.py：网络线程 → 消费线程之间的有界样本队列（明确的背压/丢弃策略）
+# 设备异常刷屏时队列不会无限增长，也不会卡死界面：按策略丢弃或阻塞网络循环，并统计丢弃条数
+# 本模块不依赖Kivy；App的SensorFrameBridge和网关的WorkerPoolDispatcher共用
+from collections import deque
+from threading import Condition
+
+from metrics import INGEST_DROPPED
+
+POLICY_DROP_OLDEST = "drop_oldest"  # 丢弃最旧的样本（默认）
+POLICY_KEEP_LATEST = "keep_latest_per_device"  # 队列满时每个设备只保留最新一条（多设备刷屏时每台设备仍能更新）
+POLICY_BLOCK = "block"  # 阻塞网络线程直到有空间（TCP背压到Broker，不丢数据）
+POLICIES = (POLICY_DROP_OLDEST, POLICY_KEEP_LATEST, POLICY_BLOCK)
+
+DEFAULT_BLOCK_TIMEOUT = 5.0  # 阻塞超过该秒数仍没有空间时按丢弃最旧处理（消费方卡死时网络线程不至于永久阻塞）
+
+
+def check_policy(policy, same_thread=False):
+    """
+    检查队列策略
+    :param same_thread: 生产方和消费方是否在同一线程（asyncio传输 + 按帧投递）：此时block会阻塞消费方自己
+    :raises ValueError: 不支持的策略
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"不支持的队列策略：{policy}（可选：{' / '.join(POLICIES)}）")
+    if same_thread and policy == POLICY_BLOCK:
+        raise ValueError("网络收发与消费在同一线程时不能使用block策略（阻塞时队列不会被取出，只会卡到超时）")
+
+
+class BoundedIngestQueue:
+    """
+    元素为(接收时间戳, 设备编号, 数据字典)；put由网络线程调用，drain由消费线程调用
+    所有操作在一把锁内完成（每条样本一次加锁，开销远小于解析和入库）
+    """
+
+    def __init__(self, maxlen=10000, policy=POLICY_DROP_OLDEST, block_timeout=DEFAULT_BLOCK_TIMEOUT):
+        """
+        :param maxlen: 队列上限
+        :param policy: drop_oldest / keep_latest_per_device / block
+        :param block_timeout: block策略下最长等待秒数
+        """
+        check_policy(policy)
+        self.maxlen = maxlen
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0  # 累计丢弃（或合并掉）的样本数
+        self._items = deque()
+        self._cond = Condition()
+        self._closed = False
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        """
+        入队；队列满时按策略处理
+        :return: 本次丢弃的样本数
+        """
+        with self._cond:
+            dropped = 0
+            if len(self._items) >= self.maxlen:
+                if self.policy == POLICY_BLOCK and not self._closed:
+                    self._cond.wait_for(lambda: len(self._items) < self.maxlen or self._closed,
+                                        self.block_timeout)
+                elif self.policy == POLICY_KEEP_LATEST:
+                    dropped = self._keep_latest(item[1])
+                    # 设备数接近上限时压缩腾不出空间：再丢弃最旧的到3/4，避免之后每条样本都压缩一次
+                    while len(self._items) > self.maxlen - self.maxlen // 4:
+                        self._items.popleft()
+                        dropped += 1
+                # 仍然是满的（阻塞超时、设备数超过上限）：丢弃最旧的
+                while len(self._items) >= self.maxlen:
+                    self._items.popleft()
+                    dropped += 1
+            self._items.append(item)
+            if dropped:
+                self.dropped += dropped
+                INGEST_DROPPED.inc(dropped, self.policy)
+            return dropped
+
+    def _keep_latest(self, device_id):
+        """
+        压缩队列：每个设备只保留最新一条（新样本所属设备的旧样本也丢弃，由新样本代替）
+        O(n)，每次压缩后至少腾出1/4的空间，均摊到每条样本仍是O(1)
+        """
+        items = list(self._items)
+        latest = {}
+        for index, queued in enumerate(items):
+            latest[queued[1]] = index
+        latest.pop(device_id, None)
+        self._items = deque(items[index] for index in sorted(latest.values()))
+        return len(items) - len(self._items)
+
+    def drain(self, limit=None):
+        """
+        取出队列中的样本（按到达顺序）
+        :param limit: 最多取出的条数，None表示全部
+        """
+        with self._cond:
+            items = self._items
+            if limit is None or limit >= len(items):
+                batch = list(items)
+                items.clear()
+            else:
+                batch = [items.popleft() for _ in range(limit)]
+            if batch and self.policy == POLICY_BLOCK:
+                self._cond.notify_all()
+            return batch
+
+    def close(self):
+        """停止时唤醒被阻塞的网络线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
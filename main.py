@@ -1,22 +1,50 @@
 # main.py：主运行文件，程序入口，整合UI、MQTT和业务逻辑
+# 启动耗时统计需最先导入（ESP32_STARTUP_PROFILE=1时输出各阶段耗时）
+from startup_profile import STARTUP
 from kivy.config import Config
 
-# 全局变量：存储接收的数据（用于UI展示）
-recv_data_list = []
-
 # 配置模拟窗口尺寸（手机竖屏：宽360px，高640px）
 Config.set('graphics', 'width', '360')
 Config.set('graphics', 'height', '640')
 # 禁止窗口缩放，保持手机比例
 Config.set('graphics', 'resizable', False)
-from kivymd.app import MDApp
-# 导入MQTT工具类
-from esp32_mqtt_utils import Esp32MqttClient
-# 核心修改：从合并后的app_ui_pages.py导入UI构建方法
-from app_ui_pages import create_app_ui
-from kivymd.uix.label import MDLabel
-from kivy.uix.scrollview import ScrollView
-from kivy.clock import Clock
+with STARTUP.phase("导入KivyMD"):
+    from kivymd.app import MDApp
+    from kivy.clock import Clock
+with STARTUP.phase("导入MQTT"):
+    # 导入MQTT工具类
+    from esp32_mqtt_utils import Esp32MqttClient, TRANSPORT_THREAD, TRANSPORT_ASYNCIO
+    from mqtt_reconnect import STATE_CONNECTED, STATE_FAILED
+    from ui_bridge import ConnectionStateBridge
+    from command_queue import OutboundCommandQueue
+    from ingest_queue import POLICY_DROP_OLDEST, check_policy
+    from backfill import BackfillManager
+with STARTUP.phase("导入首页"):
+    # 核心修改：从合并后的app_ui_pages.py导入UI构建方法（历史/个人中心页面在首次打开时才导入）
+    from app_ui_pages import create_app_ui, init_history_store, merge_backfill_samples
+from run_log import RUN_LOG
+from app_logging import get_logger, setup_logging, shutdown_logging
+import os
+
+logger = get_logger("main")
+
+
+def _env_choice(name, choices, default):
+    """读取只有几个可选值的环境变量，取值不对时在启动前就给出明确的错误"""
+    value = os.environ.get(name, default)
+    if value not in choices:
+        raise SystemExit(f"环境变量{name}={value!r}无效，可选：{' / '.join(choices)}")
+    return value
+
+
+def _env_ingest_policy(transport):
+    """ESP32_INGEST_POLICY：接收队列策略（asyncio模式下网络与界面同一线程，不能用block）"""
+    policy = os.environ.get("ESP32_INGEST_POLICY", POLICY_DROP_OLDEST)
+    try:
+        check_policy(policy, same_thread=transport == TRANSPORT_ASYNCIO)
+    except ValueError as e:
+        raise SystemExit(f"环境变量ESP32_INGEST_POLICY={policy!r}无效：{e}")
+    return policy
 
 
 class Esp32MobileApp(MDApp):
@@ -27,24 +55,91 @@ class Esp32MobileApp(MDApp):
             "broker": "iaa16ebf.ala.cn-hangzhou.emqxsl.cn",
             "port": 8883,
             "username": "esp32",
-            "password": "123456"
+            "password": "123456",
+            # 网络传输模式：thread（独立网络线程）/ asyncio（与UI共用事件循环）
+            "transport": _env_choice("ESP32_MQTT_TRANSPORT", (TRANSPORT_THREAD, TRANSPORT_ASYNCIO), TRANSPORT_THREAD),
         }
+        # 消息风暴时接收队列的策略：drop_oldest / keep_latest_per_device / block（仅thread模式）
+        self.mqtt_config["ingest_policy"] = _env_ingest_policy(self.mqtt_config["transport"])
         # 2. 初始化属性（UI控件、MQTT客户端）
         self.mqtt_client = None
-        self.scroll_view = None  # 初始化为None
-        self.recv_label = None   # 初始化为None
+        self.connection_state = None  # MQTT连接状态（Kivy属性，界面直接绑定）
+        self.log_view = None     # 个人中心的日志视图（页面创建后赋值）
         self.cmd_input = None    # 初始化为None
         self.page_container = None  # 页面容器
         self.current_page = None    # 当前页面
+        self.page_manager = None    # 页面缓存与切换（create_app_ui中创建）
+        self.history_store = None   # 历史数据持久化存储
+        self.backfill = None        # 重连后向设备补传离线期间的历史数据
+        self._network_receiver = None  # Android网络变化广播接收器
+        self._first_frame_done = False
+        self._mqtt_result_done = False
+        # 日志刷新触发器：同一帧内的多条日志只刷新一次日志视图
+        self._log_refresh_trigger = Clock.create_trigger(self._refresh_log_view)
 
     def build(self):
-        """程序构建入口：先创建UI，再延迟启动MQTT"""
-        # 1. 先构建UI并获取控件引用
-        main_layout = create_app_ui(self)
-        # 2. 延迟0.5秒启动MQTT（确保UI完全初始化）
-        Clock.schedule_once(lambda dt: self._init_mqtt_client(), 0.5)
+        """程序构建入口：先在后台开始连接MQTT，连接过程中构建UI"""
+        # 分级日志：输出在后台线程完成，网络线程不再同步print
+        setup_logging()
+        # 0. 启动MQTT（网络线程中建立TLS连接，与下面的数据库加载、界面构建并行）
+        #    收到的数据在下一帧才交给首页，此时首页已经构建完成
+        with STARTUP.phase("MQTT启动"):
+            self._init_mqtt_client()
+        # 1. 打开历史数据库（放在App私有目录，重启后历史不丢失）
+        with STARTUP.phase("历史数据库"):
+            self.history_store = init_history_store(os.path.join(self.user_data_dir, "sensor_history.db"))
+        # 1.1 连上后补传缺失的时间段（App关闭期间/断网期间）；补传线程低速分块请求，不影响实时数据
+        self.backfill = BackfillManager(self.mqtt_client, self.history_store, on_samples=self._on_backfill_samples)
+        self.backfill.start()
+        # 2. 构建UI并获取控件引用
+        with STARTUP.phase("界面构建"):
+            main_layout = create_app_ui(self)
+        Clock.schedule_once(self._on_first_frame)
         return main_layout
 
+    def _on_first_frame(self, dt):
+        STARTUP.mark("首帧")
+        self._first_frame_done = True
+        self._report_startup()
+
+    def _report_startup(self):
+        """首帧已显示、MQTT已连上（或失败）后输出启动耗时"""
+        if self._first_frame_done and self._mqtt_result_done:
+            STARTUP.report(logger)
+            STARTUP.dump(os.path.join(self.user_data_dir, "startup_profile.json"))
+
+    def on_pause(self):
+        """切到后台时把未写入的历史数据落盘（Android可能直接杀掉后台进程）"""
+        if self.history_store:
+            self.history_store.flush()
+        return True
+
+    def on_resume(self):
+        """回到前台：连接可能已在后台断开，立即重连而不是等待退避时间"""
+        if self.mqtt_client:
+            self.mqtt_client.request_reconnect()
+
+    def on_stop(self):
+        """退出时断开MQTT并关闭历史数据库"""
+        if self._network_receiver:
+            self._network_receiver.stop()
+        if self.connection_state:
+            self.connection_state.stop()
+        if self.backfill:
+            self.backfill.stop()
+        if self.mqtt_client:
+            self.mqtt_client.sensor_bridge.close()  # 唤醒阻塞在满队列上的网络线程
+            self.mqtt_client.stop_mqtt()
+        if self.history_store:
+            self.history_store.close()
+        if self.mqtt_client:
+            self.mqtt_client.command_queue.close()
+        shutdown_logging()
+
+    def _on_backfill_samples(self, device_id, rows):
+        """补传线程：一块补传数据已写入数据库，切回主线程合并到内存中的历史"""
+        Clock.schedule_once(lambda dt: merge_backfill_samples(device_id, rows))
+
     def _init_mqtt_client(self):
         """初始化MQTT客户端"""
         self.mqtt_client = Esp32MqttClient(
@@ -52,31 +147,55 @@ class Esp32MobileApp(MDApp):
             port=self.mqtt_config["port"],
             username=self.mqtt_config["username"],
             password=self.mqtt_config["password"],
-            data_callback=self._update_recv_data  # 绑定数据更新回调
+            data_callback=self._update_recv_data,  # 绑定数据更新回调
+            # 下行指令持久化队列：断网期间的操作重连后补发
+            command_queue=OutboundCommandQueue(os.path.join(self.user_data_dir, "outbound_commands.db")),
+            transport=self.mqtt_config["transport"],
+            ingest_policy=self.mqtt_config["ingest_policy"]
         )
+        # 连接状态同步为Kivy属性（个人中心的状态标签直接绑定）
+        self.connection_state = ConnectionStateBridge(self.mqtt_client)
+        self.connection_state.bind(state=self._on_connection_state)
         # 启动MQTT通信
         self.mqtt_client.start_mqtt()
+        self._start_network_monitor()
 
-    def _update_recv_data(self, content):
-        """更新UI数据（修复：仅判断recv_label，确保日志能显示）"""
-        if not self.recv_label:
-            print(f"UI未就绪，暂存消息：{content}")
+    def _on_connection_state(self, instance, state):
+        """启动耗时统计：记录第一次连上（或失败）的时间"""
+        if self._mqtt_result_done or state not in (STATE_CONNECTED, STATE_FAILED):
             return
+        self._mqtt_result_done = True
+        if state == STATE_CONNECTED:
+            STARTUP.mark("MQTT连接", self.mqtt_client.last_connect_seconds or 0.0)
+        else:
+            STARTUP.mark("MQTT连接失败")
+        self._report_startup()
 
-        global recv_data_list
-        recv_data_list.append(content)
-        # 限制数据条数，避免内存溢出
-        if len(recv_data_list) > 20:
-            recv_data_list = recv_data_list[-20:]
-        # 更新UI文本
-        self.recv_label.text = "\n".join(recv_data_list) + "\n"
-        # 自动滚动到最新数据
-        if self.scroll_view:
-            self.scroll_view.scroll_y = 0
-    
-        # 新增：如果是连接状态相关消息，更新个人中心
-        if "MQTT连接成功" in content or "MQTT连接失败" in content or "连接异常" in content:
-            self.update_me_page_status()
+    def _start_network_monitor(self):
+        """Android：网络切换（WiFi/移动数据）时立即重连"""
+        try:
+            from android.broadcast import BroadcastReceiver
+        except ImportError:
+            return  # 桌面端没有网络变化广播
+        self._network_receiver = BroadcastReceiver(
+            lambda context, intent: self.mqtt_client.request_reconnect(),
+            actions=["android.net.conn.CONNECTIVITY_CHANGE"]
+        )
+        self._network_receiver.start()
+
+    def _update_recv_data(self, content, level=None):
+        """
+        记录一条运行日志（可在网络线程调用：只写入环形缓冲区，UI在下一帧增量刷新）
+        :param content: 日志文本
+        :param level: 日志级别（run_log.LEVEL_*），不传则根据图标前缀推断
+        """
+        RUN_LOG.append(content, level)
+        self._log_refresh_trigger()
+
+    def _refresh_log_view(self, dt):
+        """主线程：把新日志增量追加到日志视图"""
+        if self.log_view:
+            self.log_view.refresh()
 
     def _on_send_cmd_click(self, instance):
         """发送按钮点击事件"""
@@ -93,18 +212,12 @@ class Esp32MobileApp(MDApp):
         # 3. 清空输入框
         self.cmd_input.text = ""
     
-    def update_me_page_status(self):
-        """更新个人中心的连接状态（如果当前页面是个人中心）"""
-        if hasattr(self, 'current_page') and self.current_page:
-            # 检查是否是个人中心页面
-            page_texts = [child.text for child in self.current_page.children if isinstance(child, MDLabel)]
-            if "我的个人中心" in page_texts:
-                # 重新构建个人中心页面（触发状态刷新）
-                from app_ui_pages import create_me_page
-                self.page_container.clear_widgets()
-                self.current_page = create_me_page(self)
-                self.page_container.add_widget(self.current_page)
-
 if __name__ == "__main__":
     """程序入口：启动APP主循环"""
-    Esp32MobileApp().run()
\ No newline at end of file
+    app = Esp32MobileApp()
+    if app.mqtt_config["transport"] == TRANSPORT_ASYNCIO:
+        # Kivy主循环运行在asyncio事件循环上，MQTT收发作为同一循环中的任务
+        import asyncio
+        asyncio.run(app.async_run(async_lib="asyncio"))
+    else:
+        app.run()
\ No newline at end of file
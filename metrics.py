@@ -0,0 +1,265 @@
+# metrics.py：数据通路的运行指标（计数器/直方图/按需读取的仪表），可导出为JSON或Prometheus文本
+# 计数器只是一次整数加法，始终记录；直方图需要计时（perf_counter），只在有人查看时记录：
+# 个人中心页面显示期间、网关开启--metrics-dump时 REGISTRY.enabled 为True，其余时间observe()直接返回
+# 每个指标只由一个线程写入（网络线程/主线程/数据库写入线程各写各的），不加锁；读取方容忍轻微不一致
+# 本模块只依赖标准库
+import json
+import math
+import os
+import time
+from bisect import bisect_left
+
+# 默认直方图桶（秒）：100微秒 ~ 10秒
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    items = ",".join('{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                     for name, value in labels)
+    return "{" + items + "}"
+
+
+class Counter:
+    """单调递增计数器；带标签时每个标签值一个计数（如按主题统计消息数）"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, label=None):
+        """
+        :param label: 标签名（如"topic"），None表示不带标签
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.value = 0
+        self.values = {}  # 标签值 -> 计数
+
+    def inc(self, amount=1, label_value=None):
+        if self.label is None:
+            self.value += amount
+        else:
+            self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def samples(self):
+        """[(标签元组, 数值), ...]"""
+        if self.label is None:
+            return [((), self.value)]
+        return [(((self.label, key),), value) for key, value in list(self.values.items())]
+
+    def total(self):
+        return self.value if self.label is None else sum(list(self.values.values()))
+
+
+class Gauge:
+    """仪表：读取时才调用函数取当前值（如队列长度），写入方没有任何开销"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, read=None):
+        self.name = name
+        self.help_text = help_text
+        self.read = read or (lambda: 0)
+
+    def samples(self):
+        try:
+            return [((), self.read())]
+        except Exception:
+            return [((), math.nan)]
+
+
+class Histogram:
+    """固定桶直方图：observe为一次二分查找 + 两次加法；REGISTRY未启用时直接返回"""
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个为+Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        if not self.registry.enabled:
+            return
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def time(self):
+        """计时上下文：with HISTOGRAM.time(): ..."""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """按桶线性插值估算分位数（没有数据时返回None）"""
+        counts = list(self.counts)
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def samples(self):
+        cumulative, result = 0, []
+        for bound, count in zip(self.buckets + (math.inf,), list(self.counts)):
+            cumulative += count
+            result.append(((("le", "+Inf" if bound == math.inf else repr(bound)),), cumulative))
+        return result
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.started = None
+
+    def __enter__(self):
+        if self.histogram.registry.enabled:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.started is not None:
+            self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self, prefix="esp32_"):
+        self.prefix = prefix
+        self.enabled = False
+        self._metrics = {}
+        self._readers = 0
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing  # 模块重复导入/多个客户端实例共用同一个指标
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, label=None):
+        return self._register(Counter(name, help_text, label))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, help_text, buckets))
+
+    def gauge(self, name, help_text, read=None):
+        """注册（或替换读取函数）一个仪表"""
+        gauge = self._register(Gauge(name, help_text, read))
+        if read is not None:
+            gauge.read = read
+        return gauge
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def acquire(self):
+        """开始查看指标（页面显示时），开启直方图记录"""
+        self._readers += 1
+        self.enabled = True
+
+    def release(self):
+        """结束查看；没有查看者时关闭直方图记录"""
+        self._readers = max(0, self._readers - 1)
+        self.enabled = self._readers > 0
+
+    # ======================== 导出 ========================
+    def to_dict(self):
+        """JSON友好的字典：计数器/仪表为数值（带标签时为字典），直方图为计数、总和和分位数"""
+        result = {}
+        for name, metric in list(self._metrics.items()):
+            if metric.kind == "histogram":
+                result[name] = {
+                    "count": metric.count,
+                    "sum": metric.sum,
+                    "p50": metric.quantile(0.5),
+                    "p90": metric.quantile(0.9),
+                    "p99": metric.quantile(0.99),
+                }
+            elif metric.kind == "counter" and metric.label is not None:
+                result[name] = dict(list(metric.values.items()))
+            else:
+                result[name] = metric.samples()[0][1]
+        return result
+
+    def to_json(self):
+        return json.dumps({"timestamp": time.time(), "enabled": self.enabled, "metrics": self.to_dict()},
+                          ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Prometheus文本格式（0.0.4）"""
+        lines = []
+        for name, metric in list(self._metrics.items()):
+            full_name = self.prefix + name
+            lines.append(f"# HELP {full_name} {metric.help_text}")
+            lines.append(f"# TYPE {full_name} {metric.kind}")
+            if metric.kind == "histogram":
+                for labels, value in metric.samples():
+                    lines.append(f"{full_name}_bucket{_label_text(labels)} {value}")
+                lines.append(f"{full_name}_sum {metric.sum}")
+                lines.append(f"{full_name}_count {metric.count}")
+            else:
+                for labels, value in metric.samples():
+                    lines.append(f"{full_name}{_label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """写入文件：扩展名为.prom时为Prometheus文本（可供node_exporter的textfile收集），否则为JSON"""
+        text = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as output:
+            output.write(text)
+        os.replace(temp_path, path)
+
+
+class RateMeter:
+    """按读取间隔计算计数器的每秒速率（读取方调用，写入方无开销）"""
+
+    def __init__(self, counter):
+        self.counter = counter
+        self._last = None
+        self._last_at = None
+
+    def rates(self):
+        """
+        :return: {标签值: 每秒速率}（不带标签的计数器键为None）；第一次调用返回空字典
+        """
+        now = time.monotonic()
+        current = dict(self.counter.values) if self.counter.label is not None else {None: self.counter.value}
+        last, last_at = self._last, self._last_at
+        self._last, self._last_at = current, now
+        if last is None or now <= last_at:
+            return {}
+        elapsed = now - last_at
+        return {key: (value - last.get(key, 0)) / elapsed for key, value in current.items()}
+
+
+REGISTRY = MetricsRegistry()
+
+# ======================== 数据通路指标 ========================
+MESSAGES = REGISTRY.counter("mqtt_messages_total", "收到的MQTT消息数（按主题）", label="topic")
+BYTES_RECEIVED = REGISTRY.counter("mqtt_received_bytes_total", "收到的MQTT消息负载字节数")
+RECONNECTS = REGISTRY.counter("mqtt_reconnects_total", "连接断开后重连的次数")
+DECODE_SECONDS = REGISTRY.histogram("mqtt_decode_seconds", "传感器消息解码+校验耗时（网络线程）")
+INVALID_FIELDS = REGISTRY.counter("sensor_invalid_fields_total", "未通过校验而被忽略的传感器字段数（按字段）", label="field")
+CLOCK_LAG_SECONDS = REGISTRY.histogram("ui_clock_lag_seconds", "网络线程入队到主线程取出的延迟")
+FRAME_SECONDS = REGISTRY.histogram("ui_frame_seconds", "UI帧间隔")
+HISTORY_WRITE_SECONDS = REGISTRY.histogram("history_write_seconds", "历史数据库每个写入事务的耗时")
+HISTORY_ROWS = REGISTRY.counter("history_rows_written_total", "写入历史数据库的样本数")
+INGEST_DROPPED = REGISTRY.counter("ingest_dropped_total", "队列满时丢弃（或合并）的样本数（按策略）", label="policy")
+BACKFILL_ROWS = REGISTRY.counter("backfill_rows_total", "重连后从设备补传并写入历史的样本数")
+QUEUE_DEPTH = REGISTRY.gauge("ingest_queue_depth", "网络线程到主线程（或工作线程）的待处理样本数")
@@ -0,0 +1,114 @@
+# mqtt_asyncio.py：在asyncio事件循环上驱动paho客户端（替代独立网络线程）
+#
+# paho的socket读写交给事件循环的add_reader/add_writer，保活由loop_misc定时任务负责；
+# 与Kivy的async_run(async_lib="asyncio")共用同一个事件循环时，消息回调直接在UI线程执行，
+# 不再跨线程，也不和UI线程争抢GIL；多个客户端可以共用同一个事件循环
+import asyncio
+import paho.mqtt.client as mqtt
+
+
+class AsyncioMqttTransport:
+    """Esp32MqttClient的asyncio传输层（重连状态机与线程模式共用同一套步骤）"""
+
+    def __init__(self, owner):
+        """
+        :param owner: Esp32MqttClient实例
+        """
+        self.owner = owner
+        self.loop = None
+        self._misc_task = None
+        self._disconnected = None  # 连接断开事件（asyncio.Event）
+        self._wakeup = None        # 打断退避等待（asyncio.Event）
+
+    def attach(self, client):
+        """绑定paho的socket回调"""
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def _call_in_loop(self, func, *args):
+        """建立连接在线程池中执行，此时触发的socket回调需要切回事件循环线程"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            func(*args)
+        else:
+            self.loop.call_soon_threadsafe(func, *args)
+
+    # ======================== paho socket回调 ========================
+    def _on_socket_open(self, client, userdata, sock):
+        self._call_in_loop(self._watch_socket, client, sock)
+
+    def _watch_socket(self, client, sock):
+        self.loop.add_reader(sock, self._read_ready, client, sock)
+        self._misc_task = self.loop.create_task(self._misc_loop(client))
+
+    @staticmethod
+    def _read_ready(client, sock):
+        """
+        socket可读：loop_read每次只处理一个报文；TLS连接上SSL层已经解密缓存的记录
+        不会再让socket变为可读（线程模式下loop()同样检查pending()），需要在这里读完
+        """
+        pending = getattr(sock, "pending", None)  # 只有ssl.SSLSocket有pending()
+        rc = client.loop_read()
+        while rc == mqtt.MQTT_ERR_SUCCESS and pending is not None and pending():
+            rc = client.loop_read()
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._call_in_loop(self._unwatch_socket, sock)
+
+    def _unwatch_socket(self, sock):
+        self.loop.remove_reader(sock)
+        self.loop.remove_writer(sock)
+        if self._misc_task:
+            self._misc_task.cancel()
+            self._misc_task = None
+        self._disconnected.set()
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._call_in_loop(self.loop.add_writer, sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._call_in_loop(self.loop.remove_writer, sock)
+
+    async def _misc_loop(self, client):
+        """保活心跳、超时重发（相当于线程模式下loop()里的loop_misc）"""
+        while client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            self.owner._maybe_ping()
+            await asyncio.sleep(1)
+
+    # ======================== 重连状态机 ========================
+    def wakeup(self):
+        """任意线程调用：打断退避等待"""
+        if self.loop and self._wakeup:
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self):
+        """连接 -> 等待断开 -> 退避 -> 重连，直到owner.stop_mqtt()"""
+        owner = self.owner
+        client = owner.mqtt_client
+        self.loop = asyncio.get_running_loop()
+        self._disconnected = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        while not owner._stop_event.is_set():
+            owner._begin_connect_attempt()
+            self._disconnected.clear()
+            try:
+                # TCP/TLS握手是阻塞调用，放到线程池里，避免卡住UI
+                await self.loop.run_in_executor(None, client.connect, owner.broker, owner.port, 60)
+                await self._disconnected.wait()
+                error_text = "连接已断开"
+            except Exception as e:
+                error_text = str(e)
+            if owner._stop_event.is_set():
+                break
+            delay = owner._handle_connection_lost(error_text)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+        owner._handle_stopped()
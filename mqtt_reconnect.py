@@ -0,0 +1,73 @@
+# mqtt_reconnect.py：MQTT重连策略（指数退避 + 随机抖动，不设重连次数上限）
+import random
+import time
+
+# 连接状态
+STATE_IDLE = "idle"              # 尚未启动
+STATE_CONNECTING = "connecting"  # 正在建立连接
+STATE_CONNECTED = "connected"    # 已连接（收到CONNACK）
+STATE_BACKOFF = "backoff"        # 已建立的连接断开，等待下次重连
+STATE_FAILED = "failed"          # 连接失败（本轮尚未连上），等待下次重连
+STATE_STOPPED = "stopped"        # 已主动停止
+
+
+class ConnectionStatus:
+    """连接状态快照（供界面/日志读取；时间均为time.monotonic()）"""
+    __slots__ = ("state", "attempts", "retry_at", "rtt", "last_message_at", "last_error")
+
+    def __init__(self, state, attempts, retry_at, rtt, last_message_at, last_error):
+        self.state = state
+        self.attempts = attempts                # 连续失败次数
+        self.retry_at = retry_at                # 下次重连时间（backoff/failed时有效）
+        self.rtt = rtt                          # 最近一次经Broker往返的耗时（秒），未测量时为None
+        self.last_message_at = last_message_at  # 最近一次收到消息的时间，未收到时为None
+        self.last_error = last_error            # 最近一次失败原因
+
+    def last_message_age(self, now):
+        return None if self.last_message_at is None else now - self.last_message_at
+
+    def retry_in(self, now):
+        return None if self.retry_at is None else max(0.0, self.retry_at - now)
+
+
+class ReconnectBackoff:
+    """
+    指数退避：第n次失败后等待 min(max_delay, base_delay * 2^n)，
+    实际等待时间在[一半, 全部]之间随机（避免大量手机在Broker恢复后同时重连）；
+    连接保持stable_after秒以上才清零失败次数（Broker接受连接后立即断开时退避仍然增长，不会每秒重连一次）
+    """
+
+    def __init__(self, base_delay=1.0, max_delay=120.0, rng=None, stable_after=30.0, clock=time.monotonic):
+        """
+        :param base_delay: 首次重连等待时间（秒）
+        :param max_delay: 等待时间上限（秒）
+        :param rng: 随机数生成器（测试时可传入固定种子的random.Random）
+        :param stable_after: 连接保持多久（秒）才视为稳定、清零失败次数
+        :param clock: 单调时钟（测试时可传入假时钟）
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stable_after = stable_after
+        self.attempts = 0  # 连续失败次数（连接稳定后清零）
+        self._rng = rng or random.Random()
+        self._clock = clock
+        self._connected_at = None  # 本次连接成功的时间，未连接时为None
+
+    def reset(self):
+        """立即清零（网络切换等主动重连时使用）"""
+        self.attempts = 0
+        self._connected_at = None
+
+    def connected(self):
+        """记录一次连接成功（此时不清零，断开时按连接持续时间判断）"""
+        self._connected_at = self._clock()
+
+    def next_delay(self):
+        """记录一次失败/断开，返回本次应等待的秒数"""
+        if self._connected_at is not None:
+            if self._clock() - self._connected_at >= self.stable_after:
+                self.attempts = 0
+            self._connected_at = None
+        ceiling = min(self.max_delay, self.base_delay * (2 ** min(self.attempts, 30)))
+        self.attempts += 1
+        return ceiling / 2 + self._rng.uniform(0, ceiling / 2)
@@ -0,0 +1,242 @@
+# rollups.py：多分辨率聚合（每分钟/每小时/每天的最小值、最大值、均值、样本数）
+# 每个样本只更新三个分辨率各一个时间桶，O(1)；长时间范围的趋势图、导出读取聚合结果，不再扫描原始样本
+# 本模块不依赖Kivy；持久化见history_store.py（rollups表）
+import math
+from array import array
+from bisect import bisect_left
+
+ROLLUP_METRICS = ("do", "ph", "temp")
+
+# (分辨率, 时间桶秒数, 内存中每个设备保留的桶数, 数据库保留秒数)
+RESOLUTIONS = (
+    ("minute", 60, 2 * 1440, 7 * 86400),
+    ("hour", 3600, 90 * 24, 365 * 86400),
+    ("day", 86400, 5 * 365, 10 * 365 * 86400),
+)
+RESOLUTION_SECONDS = {name: seconds for name, seconds, _, _ in RESOLUTIONS}
+
+NAN = float("nan")
+
+
+def bucket_start(ts, seconds):
+    """时间戳所在时间桶的起点（按UTC对齐）"""
+    return ts - ts % seconds
+
+
+class RollupSeries:
+    """
+    单个设备、单个分辨率的聚合：时间桶起点递增的列式数组
+    新样本通常落在最后一个桶或新桶（O(1)）；迟到的样本二分查找所在的桶（补传数据时）
+    """
+
+    def __init__(self, seconds, capacity):
+        """
+        :param seconds: 时间桶长度
+        :param capacity: 最多保留的桶数（超出后删除最旧的桶）
+        """
+        self.seconds = seconds
+        self.capacity = capacity
+        self.start = array("d")
+        # 每个指标四列：最小值、最大值、总和、样本数（样本数为0时最小/最大值为NaN）
+        self.min = [array("d") for _ in ROLLUP_METRICS]
+        self.max = [array("d") for _ in ROLLUP_METRICS]
+        self.sum = [array("d") for _ in ROLLUP_METRICS]
+        self.count = [array("q") for _ in ROLLUP_METRICS]
+
+    def __len__(self):
+        return len(self.start)
+
+    def _columns(self):
+        return [self.start] + self.min + self.max + self.sum + self.count
+
+    def _row(self, bucket):
+        """取时间桶所在的行，不存在时插入空行"""
+        if self.start and bucket == self.start[-1]:
+            return len(self.start) - 1
+        if not self.start or bucket > self.start[-1]:
+            index = len(self.start)
+        else:
+            index = bisect_left(self.start, bucket)
+            if self.start[index] == bucket:
+                return index
+        self.start.insert(index, bucket)
+        for i in range(len(ROLLUP_METRICS)):
+            self.min[i].insert(index, NAN)
+            self.max[i].insert(index, NAN)
+            self.sum[i].insert(index, 0.0)
+            self.count[i].insert(index, 0)
+        # 超出容量25%时一次性删除最旧的桶（均摊O(1)）
+        if len(self.start) > self.capacity + self.capacity // 4:
+            drop = len(self.start) - self.capacity
+            for column in self._columns():
+                del column[:drop]
+            index -= drop
+        return index
+
+    def add(self, ts, values):
+        """
+        :param values: 与ROLLUP_METRICS对应的数值元组（缺失为None）
+        """
+        row = self._row(bucket_start(ts, self.seconds))
+        if row < 0:
+            return  # 比保留范围还旧的样本
+        for i, value in enumerate(values):
+            if value is None or math.isnan(value):
+                continue
+            if self.count[i][row]:
+                if value < self.min[i][row]:
+                    self.min[i][row] = value
+                if value > self.max[i][row]:
+                    self.max[i][row] = value
+            else:
+                self.min[i][row] = self.max[i][row] = value
+            self.sum[i][row] += value
+            self.count[i][row] += 1
+
+    def merge(self, bucket, metric, min_value, max_value, total, count):
+        """合并一个已聚合的桶（从数据库加载时）"""
+        row = self._row(bucket)
+        if row < 0 or not count:
+            return
+        i = ROLLUP_METRICS.index(metric)
+        if self.count[i][row]:
+            self.min[i][row] = min(self.min[i][row], min_value)
+            self.max[i][row] = max(self.max[i][row], max_value)
+        else:
+            self.min[i][row], self.max[i][row] = min_value, max_value
+        self.sum[i][row] += total
+        self.count[i][row] += count
+
+    def time_range(self):
+        """(最旧桶起点, 最新桶结束)，无数据时返回None"""
+        if not self.start:
+            return None
+        return self.start[0], self.start[-1] + self.seconds
+
+    def covers(self, ts, coarser=None):
+        """
+        是否包含ts之后的全部数据：最旧的桶不晚于ts，或者更粗的分辨率也没有更早的数据（设备刚接入）
+        :param coarser: 下一级更粗的分辨率（判断本分辨率是否因容量被截断）
+        """
+        has_coarser = coarser is not None and len(coarser)
+        if not self.start:
+            return not has_coarser
+        if self.start[0] <= ts:
+            return True
+        return bool(has_coarser) and bucket_start(self.start[0], coarser.seconds) <= coarser.start[0]
+
+    def query(self, metric, start_ts, end_ts):
+        """
+        二分查找时间范围内的桶（只返回该指标有样本的桶）
+        :return: [(桶起点, 最小值, 最大值, 均值, 样本数), ...]
+        """
+        i = ROLLUP_METRICS.index(metric)
+        first = bisect_left(self.start, bucket_start(start_ts, self.seconds))
+        last = bisect_left(self.start, end_ts)
+        counts = self.count[i]
+        return [(self.start[row], self.min[i][row], self.max[i][row], self.sum[i][row] / counts[row], counts[row])
+                for row in range(first, last) if counts[row]]
+
+
+class DeviceRollups:
+    """单个设备三个分辨率的聚合"""
+
+    def __init__(self):
+        self.series = {name: RollupSeries(seconds, capacity) for name, seconds, capacity, _ in RESOLUTIONS}
+
+    def add(self, ts, do_value, ph_value, temp_value):
+        values = (do_value, ph_value, temp_value)
+        for series in self.series.values():
+            series.add(ts, values)
+
+    def merge_from(self, other):
+        """合并另一份聚合的全部桶（启动时把预加载期间收到的少量实时数据并入从数据库加载的聚合）"""
+        for name, source in other.series.items():
+            target = self.series[name]
+            for row, bucket in enumerate(source.start):
+                for i, metric in enumerate(ROLLUP_METRICS):
+                    count = source.count[i][row]
+                    if count:
+                        target.merge(bucket, metric, source.min[i][row], source.max[i][row], source.sum[i][row],
+                                     count)
+
+    def time_range(self):
+        """有聚合数据的时间范围（取最粗分辨率，保留时间最长）"""
+        return self.series[RESOLUTIONS[-1][0]].time_range()
+
+    def choose(self, span, max_points, start_ts=None):
+        """
+        选择可见范围内桶数不超过max_points的最细分辨率；
+        细分辨率在内存中只保留最近的桶，不包含start_ts时改用更粗的分辨率（否则查询结果为空）
+        :param start_ts: 可见范围起点（None表示不检查）
+        :return: RollupSeries
+        """
+        candidates = [self.series[name] for name, seconds, _, _ in RESOLUTIONS if span / seconds <= max_points]
+        if not candidates:
+            return self.series[RESOLUTIONS[-1][0]]
+        if start_ts is None:
+            return candidates[0]
+        for series, coarser in zip(candidates, candidates[1:]):
+            if series.covers(start_ts, coarser):
+                return series
+        return candidates[-1]
+
+
+class RollupTable:
+    """设备编号 -> DeviceRollups（与DeviceStateTable一样只在一个线程中读写）"""
+
+    def __init__(self):
+        self._devices = {}
+
+    def __contains__(self, device_id):
+        return device_id in self._devices
+
+    def find(self, device_id):
+        return self._devices.get(device_id)
+
+    def get(self, device_id):
+        rollups = self._devices.get(device_id)
+        if rollups is None:
+            rollups = self._devices[device_id] = DeviceRollups()
+        return rollups
+
+    def add(self, device_id, ts, do_value, ph_value, temp_value):
+        self.get(device_id).add(ts, do_value, ph_value, temp_value)
+
+    def merge_loaded(self, loaded):
+        """
+        合并后台线程从数据库加载的RollupTable：加载结果直接接管，
+        加载期间已经收到实时数据的设备把这部分（很少的几个桶）并入加载结果
+        """
+        for device_id, rollups in loaded._devices.items():
+            current = self._devices.get(device_id)
+            if current is not None:
+                rollups.merge_from(current)
+            self._devices[device_id] = rollups
+
+
+def aggregate_batch(samples):
+    """
+    把一批样本聚合为各分辨率的增量（写数据库时用：一个事务内每个桶只更新一次）
+    :param samples: [(设备编号, 时间戳, 溶解氧, PH, 温度), ...]
+    :return: [(设备编号, 分辨率, 桶起点, 指标, 最小值, 最大值, 总和, 样本数), ...]
+    """
+    deltas = {}
+    for device_id, ts, *values in samples:
+        for name, seconds, _, _ in RESOLUTIONS:
+            bucket = bucket_start(ts, seconds)
+            for metric, value in zip(ROLLUP_METRICS, values):
+                if value is None or math.isnan(value):
+                    continue
+                key = (device_id, name, bucket, metric)
+                delta = deltas.get(key)
+                if delta is None:
+                    deltas[key] = [value, value, value, 1]
+                else:
+                    if value < delta[0]:
+                        delta[0] = value
+                    if value > delta[1]:
+                        delta[1] = value
+                    delta[2] += value
+                    delta[3] += 1
+    return [key + tuple(delta) for key, delta in deltas.items()]
@@ -0,0 +1,75 @@
+# run_log.py：运行日志（固定容量环形缓冲区 + 日志级别）
+import time
+from collections import deque
+
+# 日志级别
+LEVEL_DEBUG = 10
+LEVEL_INFO = 20
+LEVEL_WARNING = 30
+LEVEL_ERROR = 40
+
+LEVEL_NAMES = {
+    LEVEL_DEBUG: "DEBUG",
+    LEVEL_INFO: "INFO",
+    LEVEL_WARNING: "WARN",
+    LEVEL_ERROR: "ERROR",
+}
+
+# 日志界面中各级别的文字颜色
+LEVEL_COLORS = {
+    LEVEL_DEBUG: (0.5, 0.5, 0.5, 1),
+    LEVEL_INFO: (0.2, 0.2, 0.2, 1),
+    LEVEL_WARNING: (0.8, 0.5, 0, 1),
+    LEVEL_ERROR: (0.8, 0, 0, 1),
+}
+
+
+def guess_level(message):
+    """未指定级别时，根据消息前缀的图标推断级别（兼容原有的日志文本）"""
+    if message.startswith("❌"):
+        return LEVEL_ERROR
+    if message.startswith("⚠️"):
+        return LEVEL_WARNING
+    return LEVEL_INFO
+
+
+class RunLog:
+    """
+    运行日志缓冲区
+    写满后自动丢弃最旧的日志，追加为O(1)；deque的append线程安全，网络线程可以直接写入
+    """
+
+    def __init__(self, capacity=5000):
+        """
+        :param capacity: 最多保存的日志条数
+        """
+        self.capacity = capacity
+        self._entries = deque(maxlen=capacity)  # 元素：(时间戳, 级别, 文本)
+        self.total = 0  # 累计写入条数（只增不减，用作日志序号）
+
+    def __len__(self):
+        return len(self._entries)
+
+    def append(self, message, level=None):
+        if level is None:
+            level = guess_level(message)
+        self._entries.append((time.time(), level, message))
+        self.total += 1
+
+    def get(self, index):
+        """按时间正序取日志（index=0为最旧的一条）"""
+        return self._entries[index]
+
+    def seq(self, index):
+        """日志序号：最旧的日志被丢弃后，其余日志的序号保持不变"""
+        return self.total - len(self._entries) + index
+
+
+def format_entry(entry):
+    """把一条日志格式化为展示文本"""
+    ts, level, message = entry
+    return f"{time.strftime('%H:%M:%S', time.localtime(ts))} {message}"
+
+
+# 全局运行日志（网络线程和UI共用）
+RUN_LOG = RunLog()
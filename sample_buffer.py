@@ -0,0 +1,200 @@
+# sample_buffer.py：传感器样本的列式环形缓冲区（内存中只存数值，展示时才格式化）
+import datetime
+import math
+from array import array
+
+NAN = float("nan")
+
+
+class SensorSample:
+    """单个传感器样本（__slots__：不创建实例字典，节省内存）"""
+    __slots__ = ("ts", "do_value", "ph_value", "temp_value")
+
+    def __init__(self, ts, do_value, ph_value, temp_value):
+        self.ts = ts
+        self.do_value = do_value
+        self.ph_value = ph_value
+        self.temp_value = temp_value
+
+
+def _to_column(value):
+    """None（本条消息未上传该字段）在数组中记为NaN"""
+    return NAN if value is None else value
+
+
+def _from_column(value):
+    return None if math.isnan(value) else value
+
+
+class SampleRingBuffer:
+    """
+    固定容量的列式环形缓冲区
+    时间戳和三个指标各占一个array('d')，每个样本只占4个double；
+    数组随数据增长（多设备时空闲设备不占满容量），写满后覆盖最旧的样本，append为O(1)
+    """
+
+    COLUMNS = ("ts", "do_value", "ph_value", "temp_value")
+
+    def __init__(self, capacity):
+        """
+        :param capacity: 最多保存的样本数
+        """
+        self.capacity = capacity
+        self.ts = array("d")
+        self.do_value = array("d")
+        self.ph_value = array("d")
+        self.temp_value = array("d")
+        self._next = 0    # 下一个写入位置
+        self._count = 0   # 当前样本数
+        self.total = 0    # 累计写入的样本数（只增不减，可作为样本的序号）
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        for name in self.COLUMNS:
+            del getattr(self, name)[:]
+        self._next = 0
+        self._count = 0
+
+    def append(self, ts, do_value, ph_value, temp_value):
+        """追加一个样本（缺失字段传None）"""
+        i = self._next
+        if self._count < self.capacity:
+            # 未写满：数组尾部追加
+            self.ts.append(ts)
+            self.do_value.append(_to_column(do_value))
+            self.ph_value.append(_to_column(ph_value))
+            self.temp_value.append(_to_column(temp_value))
+        else:
+            # 已写满：覆盖最旧的样本
+            self.ts[i] = ts
+            self.do_value[i] = _to_column(do_value)
+            self.ph_value[i] = _to_column(ph_value)
+            self.temp_value[i] = _to_column(temp_value)
+        self._next = (i + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+        self.total += 1
+
+    def merge(self, rows):
+        """
+        按时间顺序插入一批较早的样本（重连后补传的数据），保持缓冲区时间戳递增
+        只重写插入位置之后的部分（补传的缺口通常紧挨着重连后的实时数据），超出容量时丢弃最旧的样本
+        :param rows: [(ts, do, ph, temp), ...]，按时间正序
+        """
+        if not rows:
+            return
+        if not self._count or rows[0][0] >= self._ts_at(self._count - 1):
+            for row in rows:
+                self.append(*row)
+            return
+        position = self._bisect_ts(rows[0][0])
+        columns = [self.column(name) for name in self.COLUMNS]
+        tail = list(zip(*(column[position:] for column in columns)))
+        merged = sorted(tail + [(ts, _to_column(do_value), _to_column(ph_value), _to_column(temp_value))
+                                for ts, do_value, ph_value, temp_value in rows], key=lambda row: row[0])
+        start = max(0, position + len(merged) - self.capacity)  # 超出容量的最旧样本
+        for index, name in enumerate(self.COLUMNS):
+            if start <= position:
+                data = columns[index][start:position]
+                data.extend(row[index] for row in merged)
+            else:
+                data = array("d", (row[index] for row in merged[start - position:]))
+            setattr(self, name, data)
+        self._count = len(self.ts)
+        self._next = self._count % self.capacity
+        self.total += len(rows)
+
+    def _slot(self, index):
+        """index=0表示最新样本，越大越旧"""
+        if index < 0 or index >= self._count:
+            raise IndexError("样本索引越界")
+        return (self._next - 1 - index) % self.capacity
+
+    def seq(self, index):
+        """样本序号：同一个样本无论新数据插入多少都保持不变（用于列表复用行）"""
+        return self.total - 1 - index
+
+    def get(self, index):
+        """按新旧顺序取样本（index=0为最新），只在需要时才创建SensorSample"""
+        i = self._slot(index)
+        return SensorSample(
+            self.ts[i],
+            _from_column(self.do_value[i]),
+            _from_column(self.ph_value[i]),
+            _from_column(self.temp_value[i]),
+        )
+
+    def latest(self):
+        return self.get(0) if self._count else None
+
+    def iter_newest(self, limit=None):
+        """从最新到最旧遍历样本"""
+        count = self._count if limit is None else min(limit, self._count)
+        for index in range(count):
+            yield self.get(index)
+
+    def column(self, name, limit=None):
+        """
+        取某一列的数值（按时间正序，便于画图/统计）
+        :param name: ts/do_value/ph_value/temp_value
+        :param limit: 只取最近的limit个样本
+        """
+        data = getattr(self, name)
+        count = self._count if limit is None else min(limit, self._count)
+        start = (self._next - count) % self.capacity
+        end = start + count
+        if end <= self.capacity:
+            return data[start:end]
+        return data[start:] + data[:end - self.capacity]
+
+    def _ts_at(self, position):
+        """按时间正序的第position个样本的时间戳（0为最旧）"""
+        return self.ts[(self._next - self._count + position) % self.capacity]
+
+    def _bisect_ts(self, ts):
+        """第一个时间戳不小于ts的样本位置（按时间正序；样本按到达顺序写入，时间戳递增）"""
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            if self._ts_at(mid) < ts:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def time_range(self):
+        """(最旧时间戳, 最新时间戳)，无数据时返回None"""
+        if not self._count:
+            return None
+        return self._ts_at(0), self._ts_at(self._count - 1)
+
+    def columns_between(self, start_ts, end_ts, names):
+        """
+        二分查找时间范围[start_ts, end_ts]，只复制范围内的样本（画图时平移/缩放不扫描整个缓冲区）
+        :param names: 列名元组，如("ts", "do_value")
+        :return: 与names对应的数组列表（按时间正序）
+        """
+        first = self._bisect_ts(start_ts)
+        last = self._bisect_ts(math.nextafter(end_ts, math.inf))
+        count = last - first
+        start = (self._next - self._count + first) % self.capacity
+        end = start + count
+        result = []
+        for name in names:
+            data = getattr(self, name)
+            if end <= self.capacity:
+                result.append(data[start:end])
+            else:
+                result.append(data[start:] + data[:end - self.capacity])
+        return result
+
+
+def format_sample(sample):
+    """把一个样本格式化为历史数据展示文本"""
+    current_time = datetime.datetime.fromtimestamp(sample.ts).strftime("%Y-%m-%d %H:%M:%S")
+    do_val = "--" if sample.do_value is None else round(sample.do_value, 2)
+    ph_val = "--" if sample.ph_value is None else round(sample.ph_value, 1)
+    temp_val = "--" if sample.temp_value is None else round(sample.temp_value, 1)
+    return f"{current_time}: 溶解氧{do_val}mg/L | PH{ph_val} | 温度{temp_val}℃"
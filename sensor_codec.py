@@ -0,0 +1,83 @@
+# sensor_codec.py：传感器数据编解码（紧凑二进制格式 + JSON兼容）
+#
+# 二进制格式 v1（小端，共20字节，ESP32端用同样的结构体打包）：
+#   偏移 0  uint8   魔数 0xE5（JSON消息不可能以该字节开头，据此自动识别格式）
+#   偏移 1  uint8   格式版本号（schema id），当前为1
+#   偏移 2  uint8   字段标志位：bit0=溶解氧 bit1=PH bit2=温度 bit3=设备时间戳
+#   偏移 3  uint8   保留
+#   偏移 4  uint32  设备时间戳（Unix秒，标志位bit3为0时忽略）
+#   偏移 8  float32 溶解氧(mg/L)
+#   偏移 12 float32 PH值
+#   偏移 16 float32 温度(℃)
+import json
+import struct
+
+BINARY_MAGIC = 0xE5
+SCHEMA_V1 = 1
+
+FLAG_DO = 0x01
+FLAG_PH = 0x02
+FLAG_TEMP = 0x04
+FLAG_TS = 0x08
+
+_V1 = struct.Struct("<BBBxIfff")
+
+# App支持的上行数据格式（连接成功后发布给设备，设备据此选择编码）
+SUPPORTED_FORMATS = ("bin1", "json")
+
+
+def encode_sensor_binary(do_value=None, ph_value=None, temp_value=None, ts=None):
+    """按v1格式编码一条传感器数据（供模拟设备/测试使用，字段传None表示未上传）"""
+    flags = 0
+    if do_value is not None:
+        flags |= FLAG_DO
+    if ph_value is not None:
+        flags |= FLAG_PH
+    if temp_value is not None:
+        flags |= FLAG_TEMP
+    if ts is not None:
+        flags |= FLAG_TS
+    return _V1.pack(
+        BINARY_MAGIC, SCHEMA_V1, flags,
+        int(ts or 0),
+        do_value or 0.0, ph_value or 0.0, temp_value or 0.0
+    )
+
+
+def _decode_binary(payload):
+    """直接在原始bytes/memoryview上unpack，不复制、不转字符串"""
+    if len(payload) < _V1.size:
+        raise ValueError(f"二进制数据长度不足（{len(payload)}字节）")
+    _, schema, flags, ts, do_value, ph_value, temp_value = _V1.unpack_from(payload, 0)
+    if schema != SCHEMA_V1:
+        raise ValueError(f"不支持的二进制格式版本：{schema}")
+    parsed_data = {}
+    if flags & FLAG_DO:
+        parsed_data["do"] = do_value
+    if flags & FLAG_PH:
+        parsed_data["ph"] = ph_value
+    if flags & FLAG_TEMP:
+        parsed_data["temp"] = temp_value
+    if flags & FLAG_TS:
+        parsed_data["ts"] = ts
+    return parsed_data
+
+
+def is_binary_payload(payload):
+    return len(payload) > 0 and payload[0] == BINARY_MAGIC
+
+
+def decode_sensor_payload(payload):
+    """
+    解码传感器消息：以魔数开头的按二进制解析，否则按JSON解析
+    :param payload: MQTT消息的原始bytes
+    :return: 数据字典，如{"do":7.25, "ph":7.0, "temp":25.5}
+    :raises ValueError: 数据格式错误（json.JSONDecodeError也是ValueError的子类）
+    """
+    if is_binary_payload(payload):
+        return _decode_binary(memoryview(payload))
+    # 显式按UTF-8解码比让json.loads自行探测bytes编码更快
+    parsed_data = json.loads(payload.decode("utf-8"))
+    if not isinstance(parsed_data, dict):
+        raise ValueError("传感器数据必须是JSON对象")
+    return parsed_data
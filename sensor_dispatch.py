@@ -0,0 +1,101 @@
+# sensor_dispatch.py：不依赖Kivy的样本分发器（无界面网关使用）
+#
+# Esp32MqttClient只要求分发器提供push(device_id, parsed_data, ts=None)：
+# App中使用ui_bridge.SensorFrameBridge（按帧投递到Kivy主线程），
+# 服务器上使用WorkerPoolDispatcher（按设备分片到多个工作线程批量处理）
+import time
+import zlib
+from threading import Thread, Event
+
+from app_logging import get_logger
+from ingest_queue import BoundedIngestQueue, POLICY_DROP_OLDEST
+from metrics import QUEUE_DEPTH
+
+logger = get_logger("dispatch")
+
+
+class _Worker:
+    __slots__ = ("queue", "event", "thread", "processed")
+
+    def __init__(self, maxlen, policy):
+        self.queue = BoundedIngestQueue(maxlen, policy)
+        self.event = Event()
+        self.thread = None
+        self.processed = 0
+
+
+class WorkerPoolDispatcher:
+    """
+    同一设备的样本总是进入同一个工作线程（按到达顺序处理），不同设备并行处理；
+    网络线程只做入队，解析后的入库、状态更新等耗时操作都在工作线程完成
+    """
+
+    def __init__(self, consumer, workers=4, maxlen=10000, batch_size=500, policy=POLICY_DROP_OLDEST):
+        """
+        :param consumer: 批量消费函数，参数为[(接收时间戳, 设备编号, 数据字典), ...]，在工作线程执行
+        :param workers: 工作线程数
+        :param maxlen: 每个工作线程的队列上限
+        :param batch_size: 每次交给消费函数的最大样本数
+        :param policy: 队列满时的策略（见ingest_queue）：丢弃最旧/每个设备只保留最新/阻塞网络线程
+        """
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self._workers = [_Worker(maxlen, policy) for _ in range(max(1, workers))]
+        self._stop_event = Event()
+        QUEUE_DEPTH.read = self.queue_depth
+
+    def start(self):
+        for index, worker in enumerate(self._workers):
+            worker.thread = Thread(target=self._run, args=(worker,), name=f"dispatch-{index}", daemon=True)
+            worker.thread.start()
+
+    def stop(self, timeout=5.0):
+        """处理完队列中剩余的样本后停止工作线程"""
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.queue.close()
+            worker.event.set()
+        for worker in self._workers:
+            if worker.thread:
+                worker.thread.join(timeout)
+
+    @property
+    def processed(self):
+        """已交给消费函数的样本总数"""
+        return sum(worker.processed for worker in self._workers)
+
+    def queue_depth(self):
+        """所有工作线程队列中待处理的样本数"""
+        return sum(len(worker.queue) for worker in self._workers)
+
+    @property
+    def dropped(self):
+        """队列满时丢弃（或合并）的样本总数"""
+        return sum(worker.queue.dropped for worker in self._workers)
+
+    def _worker_for(self, device_id):
+        # crc32在不同进程间结果一致（hash()对字符串是随机化的），便于排查问题
+        return self._workers[zlib.crc32(device_id.encode("utf-8")) % len(self._workers)]
+
+    def push(self, device_id, parsed_data, ts=None):
+        """网络线程调用：按设备分片入队"""
+        worker = self._worker_for(device_id)
+        worker.queue.put((time.time() if ts is None else ts, device_id, parsed_data))
+        worker.event.set()
+
+    def _run(self, worker):
+        queue = worker.queue
+        while True:
+            worker.event.wait()
+            worker.event.clear()
+            while True:
+                batch = queue.drain(self.batch_size)
+                if not batch:
+                    break
+                try:
+                    self.consumer(batch)
+                except Exception:
+                    logger.exception("样本批处理失败（%d条）", len(batch))
+                worker.processed += len(batch)
+            if self._stop_event.is_set():
+                return
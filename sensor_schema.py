@@ -0,0 +1,74 @@
+# sensor_schema.py：传感器数据校验（字段类型、取值范围、NaN/Inf），逐字段报告错误
+# 在网络线程解码后立即校验：异常字段不进入UI队列/历史/报警，其余字段照常更新（一个字段异常不影响其他字段）
+# 字段规则在导入时编译为元组，校验一条消息只是一次循环，不依赖异常控制流程；本模块不依赖Kivy
+import math
+
+METRIC_FIELDS = ("do", "ph", "temp")
+
+# 字段规则：字段名 -> (最小值, 最大值, 单位)；超出物理量程的读数视为传感器故障
+SENSOR_FIELDS = {
+    "do": (0.0, 50.0, "mg/L"),     # 溶解氧（过饱和时可超过20）
+    "ph": (0.0, 14.0, ""),
+    "temp": (-55.0, 125.0, "℃"),   # DS18B20量程
+    "ts": (0.0, 4294967295.0, ""),  # 设备时间戳（Unix秒，二进制格式为uint32）
+}
+
+
+class SensorSchema:
+    """编译后的校验规则：validate对每条消息只做类型判断和两次比较"""
+
+    def __init__(self, fields):
+        """
+        :param fields: {字段名: (最小值, 最大值, 单位)}
+        """
+        self.fields = tuple((name, float(low), float(high), unit) for name, (low, high, unit) in fields.items())
+
+    def validate(self, parsed_data):
+        """
+        :param parsed_data: 解码后的数据字典
+        :return: (values, errors)：values为通过校验的字段{字段名: float}，errors为{字段名: 错误说明}；
+                 未上传（缺失或为null）的字段两者都不包含，不认识的字段忽略
+        """
+        values = {}
+        errors = None
+        for name, low, high, unit in self.fields:
+            value = parsed_data.get(name)
+            if value is None:
+                continue
+            kind = type(value)
+            if kind is float or kind is int:
+                number = float(value)
+            elif kind is str:
+                # 兼容把数值当字符串上传的旧固件，如"7.25"
+                try:
+                    number = float(value)
+                except ValueError:
+                    errors = _add_error(errors, name, f"不是数字（{value!r}）")
+                    continue
+            else:
+                # bool是int的子类，但不是合法读数；列表/对象同样拒绝
+                errors = _add_error(errors, name, f"类型错误（{kind.__name__}）")
+                continue
+            if not math.isfinite(number):
+                errors = _add_error(errors, name, f"无效数值（{number}）")
+            elif number < low or number > high:
+                errors = _add_error(errors, name, f"超出范围{low:g}~{high:g}{unit}（{number:g}）")
+            else:
+                values[name] = number
+        return values, errors or {}
+
+
+def _add_error(errors, name, message):
+    # 绝大多数消息没有错误，用到时才创建字典
+    if errors is None:
+        errors = {}
+    errors[name] = message
+    return errors
+
+
+def format_errors(errors):
+    """错误说明，如 ph超出范围0~14（15.2）；temp无效数值（nan）"""
+    return "；".join(f"{name}{message}" for name, message in errors.items())
+
+
+SENSOR_SCHEMA = SensorSchema(SENSOR_FIELDS)
@@ -0,0 +1,53 @@
+# startup_profile.py：启动耗时分阶段统计（导入、字体注册、主题、页面构建、首帧、MQTT连接）
+# 设置环境变量 ESP32_STARTUP_PROFILE=1 开启；关闭时phase()只返回一个空上下文，几乎没有开销
+# 本模块只依赖标准库，需在main.py中最先导入，才能统计到Kivy/KivyMD的导入耗时
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+_PROCESS_START = time.perf_counter()
+
+
+class StartupProfiler:
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.phases = []  # [(阶段名, 相对进程启动的开始时间, 耗时)]，单位秒
+
+    def phase(self, name):
+        """统计一个阶段的耗时：with STARTUP.phase("字体注册"): ..."""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, started - _PROCESS_START, time.perf_counter() - started))
+
+    def mark(self, name, duration=0.0):
+        """记录一个时间点（如首帧），或一个在别处测得耗时的阶段（如MQTT连接）"""
+        if self.enabled:
+            now = time.perf_counter() - _PROCESS_START
+            self.phases.append((name, now - duration, duration))
+
+    def report(self, logger):
+        """按开始时间输出各阶段耗时"""
+        if not self.enabled:
+            return
+        for name, start, duration in sorted(self.phases, key=lambda phase: phase[1]):
+            logger.info("启动阶段 %-12s 开始于%8.1fms 耗时%8.1fms", name, start * 1000, duration * 1000)
+
+    def dump(self, path):
+        """写入JSON文件（便于从手机上导出，对比不同版本的冷启动耗时）"""
+        if not self.enabled:
+            return
+        with open(path, "w", encoding="utf-8") as output:
+            json.dump([{"phase": name, "start_ms": round(start * 1000, 2), "duration_ms": round(duration * 1000, 2)}
+                       for name, start, duration in self.phases], output, ensure_ascii=False, indent=2)
+
+
+STARTUP = StartupProfiler(os.environ.get("ESP32_STARTUP_PROFILE") == "1")
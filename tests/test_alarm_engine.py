@@ -0,0 +1,105 @@
+from alarm_engine import (AlarmEngine, EVENT_CLEARED, EVENT_RAISED, RateOfChangeRule, ThresholdRule,
+                          do_threshold_rule)
+from sample_buffer import SampleRingBuffer
+
+
+def _kinds(events):
+    return [event.kind for event in events]
+
+
+def _engine(rules, debounce=60.0):
+    notified = []
+    return AlarmEngine(rules, notifier=notified.append, debounce=debounce), notified
+
+
+def test_threshold_hysteresis():
+    engine, notified = _engine([ThresholdRule("r", "do", high=8.0, low=5.0, hysteresis=0.2)])
+    assert _kinds(engine.evaluate("dev", 0, 8.1)) == [EVENT_RAISED]
+    assert engine.evaluate("dev", 1, 7.9) == []  # 仍在回差区间内
+    assert engine.is_active("dev", "r")
+    assert _kinds(engine.evaluate("dev", 2, 7.8)) == [EVENT_CLEARED]
+    assert _kinds(engine.evaluate("dev", 3, 4.9)) == [EVENT_RAISED]
+    assert engine.evaluate("dev", 4, 5.1) == []
+    assert _kinds(engine.evaluate("dev", 5, 5.2)) == [EVENT_CLEARED]
+
+
+def test_threshold_min_duration_filters_spikes():
+    engine, _ = _engine([ThresholdRule("r", "do", low=5.0, min_duration=10.0)])
+    assert engine.evaluate("dev", 0, 4.0) == []
+    assert engine.evaluate("dev", 5, 6.0) == []  # 毛刺：未持续10秒
+    assert engine.evaluate("dev", 6, 4.0) == []
+    assert engine.evaluate("dev", 15, 4.0) == []
+    assert _kinds(engine.evaluate("dev", 16, 4.0)) == [EVENT_RAISED]
+    # 其他设备的状态互不影响
+    assert engine.evaluate("other", 16, 4.0) == []
+
+
+def test_rate_of_change():
+    engine, _ = _engine([RateOfChangeRule("rate", "do", max_rate=1.0, window=60.0, hysteresis=0.2,
+                                          direction=-1)])
+    assert engine.evaluate("dev", 0, 8.0) == []
+    assert engine.evaluate("dev", 30, 7.0) == []  # 窗口未满
+    assert _kinds(engine.evaluate("dev", 60, 6.5)) == [EVENT_RAISED]  # 每分钟下降1.5
+    assert engine.evaluate("dev", 120, 5.6) == []  # 下降0.9，仍高于解除线0.8
+    assert _kinds(engine.evaluate("dev", 180, 5.0)) == [EVENT_CLEARED]
+    assert engine.evaluate("dev", 240, 7.0) == []  # 只报下降
+
+
+def test_debounce_suppresses_repeated_notifications():
+    engine, notified = _engine([ThresholdRule("r", "do", high=8.0)], debounce=60.0)
+    for ts, value in ((0, 9.0), (10, 7.0), (20, 9.0), (30, 7.0), (70, 9.0)):
+        engine.evaluate("dev", ts, value)
+    # 20秒的再次报警在去抖间隔内：不通知，其解除也不通知
+    assert [(event.kind, event.ts) for event in notified] == [(EVENT_RAISED, 0), (EVENT_CLEARED, 10),
+                                                              (EVENT_RAISED, 70)]
+
+
+def _history(rows):
+    history = SampleRingBuffer(100)
+    for row in rows:
+        history.append(*row)
+    return history
+
+
+def test_rule_change_replays_history_without_per_sample_notifications():
+    ph_rule = ThresholdRule("ph", "ph", high=9.0)
+    engine, notified = _engine([ph_rule, do_threshold_rule(10.0, 2.0)])
+    history = _history([(ts, 4.0 if ts >= 100 else 6.0, 9.5, None) for ts in range(0, 200, 20)])
+    for ts, do_value, ph_value, _ in zip(*(history.column(name) for name in history.COLUMNS)):
+        engine.evaluate("dev", ts, do_value, ph_value)
+    assert [event.rule.rule_id for event in notified] == ["ph"]
+    ph_state = engine._states[("dev", "ph")]
+    del notified[:]
+
+    active = engine.set_rules([ph_rule, do_threshold_rule(8.0, 5.0)], {"dev": history})
+    assert [(event.rule.rule_id, event.ts) for event in active] == [("do_range", 120)]
+    assert [event.rule.rule_id for event in notified] == ["do_range"]  # 只通知一次
+    assert engine._states[("dev", "ph")] is ph_state  # 未修改的规则保留状态，不重放
+
+    # 阈值恢复：重算后不再报警
+    assert engine.set_rules([ph_rule, do_threshold_rule(10.0, 2.0)], {"dev": history}) == []
+    assert not engine.is_active("dev", "do_range")
+
+
+def test_rule_change_debounces_on_replay_time():
+    rule = ThresholdRule("r", "do", low=5.0)
+    engine, notified = _engine([rule], debounce=60.0)
+    engine.evaluate("dev", 1000, 4.0)
+    history = _history([(ts, 4.0, None, None) for ts in (0, 10, 20)])
+    del notified[:]
+    # 报警进入时间远早于上次通知，按重放到的最新样本时间（1000 + 30）去抖
+    engine.set_rules([ThresholdRule("r", "do", low=5.0)], {"dev": history}, {"dev": (1030, 4.0, None, None)})
+    assert notified == []
+    engine.set_rules([ThresholdRule("r", "do", low=5.0)], {"dev": history}, {"dev": (1100, 4.0, None, None)})
+    assert [event.ts for event in notified] == [0]
+
+
+def test_rule_change_uses_latest_sample_for_min_duration():
+    engine, _ = _engine([])
+    # 死区过滤后历史里只有一条低于下限的样本，之后数值不变的样本只更新了最新值
+    history = _history([(0, 6.0, None, None), (100, 4.0, None, None)])
+    rule = ThresholdRule("r", "do", low=5.0, min_duration=10.0)
+    assert engine.set_rules([rule], {"dev": history}) == []
+    assert len(engine.set_rules([ThresholdRule("r", "do", low=5.0, min_duration=10.0)], {"dev": history},
+                                {"dev": (150, 4.0, None, None)})) == 1
+    assert engine.is_active("dev", "r")
@@ -0,0 +1,103 @@
+import json
+import time
+
+from backfill import BackfillManager, DEDUPE_TOLERANCE, _has_near, parse_response, validate_samples
+from history_store import SensorHistoryStore
+
+
+def test_validate_samples_keeps_valid_rows_in_range():
+    samples = [
+        [105, 7.1, 7.0, 25.0],
+        [101, 7.0, None, 25.0],
+        [100, 7.0, 7.0, 25.0],    # 等于after（上一块已写入）
+        [200, 7.0, 7.0, 25.0],    # 等于until（重连后的实时数据）
+        [102, 99.0, 15.0, 200.0],  # 三个字段都超出范围
+        [103, "x", 7.0, None],     # 部分字段异常，其余照常保留
+        [104, 7.0, 7.0],           # 长度不对
+        "bad",
+        [None, 7.0, 7.0, 25.0],
+    ]
+    rows, invalid = validate_samples(samples, 100, 200)
+    assert rows == [(101, 7.0, None, 25.0), (103, None, 7.0, None), (105, 7.1, 7.0, 25.0)]
+    assert invalid == 6
+
+
+def test_parse_response_requires_fields():
+    response = parse_response(json.dumps({"req": "a", "seq": 0, "samples": [], "more": False}).encode())
+    assert response["req"] == "a"
+    for bad in ({"req": "a", "seq": "0", "samples": []}, {"req": "a", "seq": 0}, []):
+        try:
+            parse_response(json.dumps(bad))
+        except ValueError:
+            continue
+        raise AssertionError(bad)
+
+
+def test_has_near():
+    existing = [10.0, 20.0, 30.0]
+    assert _has_near(existing, 20.0)
+    assert _has_near(existing, 20.0 + DEDUPE_TOLERANCE)
+    assert _has_near(existing, 10.0 - DEDUPE_TOLERANCE)
+    assert not _has_near(existing, 25.0)
+    assert not _has_near(existing, 31.0)
+    assert not _has_near([], 10.0)
+    assert _has_near(existing, 30.0, 0.0)
+    assert not _has_near(existing, 30.1, 0.0)
+
+
+def _manager():
+    return BackfillManager(client=None, store=None, timeout=0.05, max_span=3600)
+
+
+def test_gap_uses_device_clock():
+    manager = _manager()
+    # 设备时钟比手机慢100秒：缺失时间段只取决于设备时间戳
+    manager._first_live["dev"] = (5000.0, 4900.0)
+    after, until, skew = manager._gap(0, "dev", (3000.0, 2900.0), None, 5000.0)
+    assert (after, until, skew) == (2900.0, 4900.0, 100.0)
+
+
+def test_gap_prefers_newer_live_snapshot_and_estimates_until():
+    manager = _manager()
+    # 数据库游标比内存中的快照旧；连上后没有收到实时数据时按上次的时钟偏差估计
+    after, until, skew = manager._gap(0, "dev", (3000.0, 2900.0), (4000.0, 3900.0), 5000.0)
+    assert (after, until, skew) == (3900.0, 4900.0, 100.0)
+
+
+def test_gap_falls_back_to_receive_time_for_legacy_firmware():
+    manager = _manager()
+    assert manager._gap(0, "dev", (3000.0, None), (4000.0, None), 5000.0) == (4000.0, 5000.0, None)
+
+
+def test_gap_limits_span_and_skips_short_gaps():
+    manager = _manager()
+    manager._first_live["dev"] = (0.0, 10000.0)
+    assert manager._gap(0, "dev", (0.0, 1000.0), None, 0.0)[0] == 10000.0 - 3600
+    manager._first_live["dev"] = (0.0, 1002.0)
+    assert manager._gap(0, "dev", (0.0, 1000.0), None, 0.0) is None
+
+
+def test_merge_converts_device_time_to_receive_time(tmp_path):
+    base = time.time() // 60 * 60 - 3600
+    store = SensorHistoryStore(str(tmp_path / "history.db"), flush_interval=0.05)
+    store.start()
+    merged = []
+    manager = BackfillManager(client=None, store=store, on_samples=lambda device_id, rows: merged.extend(rows))
+    try:
+        # 设备时钟慢30秒：断开前最后一条实时样本接收于base，设备时间base - 30
+        store.append(base, 7.0, None, None, "dev", device_ts=base - 30)
+        store.append(base + 10.2, 7.0, None, None, "dev", device_ts=base - 20)
+        store.flush()
+        rows = [(base - 30 + offset, 8.0, None, None) for offset in range(1, 11)]
+        assert manager._merge("dev", rows, 30.0) == 9  # base + 10与重连后的实时样本（有网络延迟）是同一样本
+        assert manager._merge("dev", rows, 30.0) == 0  # 重复投递
+        stored = [row[1] for row in store.query_range(base - 60, base + 60, "dev")]
+        assert stored == [base + offset for offset in range(0, 10)] + [base + 10.2]
+        assert merged == [(base + offset, 8.0, None, None) for offset in range(1, 10)]
+        assert store.device_cursors()["dev"] == (base + 10.2, base - 20)
+        # 旧固件：样本已是接收时间，不推进设备时间游标
+        assert manager._merge("old", [(base + 1, 7.0, None, None)], None) == 1
+        store.flush()
+        assert store.device_cursors()["old"] == (base + 1, None)
+    finally:
+        store.close()
@@ -0,0 +1,65 @@
+from command_queue import OutboundCommandQueue, STATUS_ACKED, STATUS_PENDING, STATUS_SENT
+
+
+def _status(queue, command_id):
+    return queue._conn.execute("SELECT status FROM commands WHERE id = ?", (command_id,)).fetchone()[0]
+
+
+def test_ack_after_mark_sent():
+    queue = OutboundCommandQueue()
+    command_id = queue.enqueue("esp32/switch", "on")
+    assert [row[0] for row in queue.take_pending()] == [command_id]
+    queue.begin_send()
+    queue.mark_sent(command_id, 7)
+    queue.end_send()
+    assert _status(queue, command_id) == STATUS_SENT
+    assert queue.counts() == {STATUS_PENDING: 0, STATUS_SENT: 1}
+    assert queue.mark_acked(7) is True
+    assert _status(queue, command_id) == STATUS_ACKED
+    assert queue.mark_acked(7) is False
+
+
+def test_ack_before_mark_sent_inside_send_window():
+    queue = OutboundCommandQueue()
+    command_id = queue.enqueue("esp32/switch", "on")
+    queue.begin_send()
+    # 网络线程在publish返回前就处理了PUBACK
+    assert queue.mark_acked(3) is False
+    queue.mark_sent(command_id, 3)
+    queue.end_send()
+    assert _status(queue, command_id) == STATUS_ACKED
+
+
+def test_qos0_mid_does_not_ack_later_command_with_same_mid():
+    queue = OutboundCommandQueue()
+    # QoS 0消息（RTT探测、补传请求）发布后立即回调，不在发送窗口内
+    assert queue.mark_acked(5) is False
+    command_id = queue.enqueue("esp32/switch", "on")
+    queue.begin_send()
+    queue.mark_sent(command_id, 5)  # 消息编号回绕后与旧的QoS 0消息相同
+    queue.end_send()
+    assert _status(queue, command_id) == STATUS_SENT
+    assert queue.mark_acked(5) is True
+    assert _status(queue, command_id) == STATUS_ACKED
+
+
+def test_send_window_drops_unclaimed_acks():
+    queue = OutboundCommandQueue()
+    queue.begin_send()
+    queue.mark_acked(9)  # 窗口内到达，但不是本次发送的指令
+    queue.end_send()
+    command_id = queue.enqueue("esp32/switch", "off")
+    queue.begin_send()
+    queue.mark_sent(command_id, 9)
+    queue.end_send()
+    assert _status(queue, command_id) == STATUS_SENT
+
+
+def test_sent_commands_are_resent_after_restart(tmp_path):
+    path = str(tmp_path / "commands.db")
+    queue = OutboundCommandQueue(path)
+    command_id = queue.enqueue("esp32/threshold", "{}")
+    queue.mark_sent(command_id, 1)
+    queue.close()
+    queue = OutboundCommandQueue(path)
+    assert [row[0] for row in queue.take_pending()] == [command_id]
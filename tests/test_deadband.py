@@ -0,0 +1,62 @@
+import pytest
+
+from deadband import DEFAULT_DEADBANDS, ChangeFilter, DisplayCache, parse_deadbands
+
+
+def test_suppresses_changes_within_deadband():
+    change_filter = ChangeFilter({"do": 0.1, "ph": 0.1, "temp": 0.5}, heartbeat=300)
+    assert change_filter.accept("dev", 0, 7.0, 7.2, 25.0)
+    assert not change_filter.accept("dev", 1, 7.05, 7.25, 25.3)
+    assert not change_filter.accept("dev", 2, 7.1, None, None)  # 缺失字段不算变化
+    assert change_filter.accept("dev", 3, 7.0, 7.2, 25.6)
+    # 与上一条已记录的样本比较：缓慢漂移累计超过死区后记录
+    assert not change_filter.accept("dev", 4, 7.06, 7.2, 25.6)
+    assert not change_filter.accept("dev", 5, 7.09, 7.2, 25.6)
+    assert change_filter.accept("dev", 6, 7.11, 7.2, 25.6)
+    assert (change_filter.accepted, change_filter.suppressed) == (3, 4)
+
+
+def test_heartbeat_records_unchanged_values():
+    change_filter = ChangeFilter(heartbeat=60)
+    assert change_filter.accept("dev", 0, 7.0, 7.2, 25.0)
+    assert not change_filter.accept("dev", 59, 7.0, 7.2, 25.0)
+    assert change_filter.accept("dev", 60, 7.0, 7.2, 25.0)
+    assert not change_filter.accept("dev", 119, 7.0, 7.2, 25.0)
+    assert change_filter.accept("dev", 120, 7.0, 7.2, 25.0)
+
+
+def test_state_is_per_device():
+    change_filter = ChangeFilter()
+    assert change_filter.accept("a", 0, 7.0, None, None)
+    assert change_filter.accept("b", 1, 7.0, None, None)
+    assert not change_filter.accept("a", 2, 7.0, None, None)
+    change_filter.forget("a")
+    assert change_filter.accept("a", 3, 7.0, None, None)
+    assert not change_filter.accept("b", 4, 7.0, None, None)
+
+
+def test_disabled_filter_keeps_everything():
+    change_filter = ChangeFilter(enabled=False)
+    assert all(change_filter.accept("dev", ts, 7.0, 7.2, 25.0) for ts in range(5))
+    assert change_filter.suppressed == 0
+
+
+def test_parse_deadbands():
+    assert parse_deadbands("") == DEFAULT_DEADBANDS
+    assert parse_deadbands("do=0.1, temp=0") == dict(DEFAULT_DEADBANDS, do=0.1, temp=0.0)
+    with pytest.raises(ValueError):
+        parse_deadbands("orp=1")
+    with pytest.raises(ValueError):
+        parse_deadbands("do=abc")
+    with pytest.raises(ValueError):
+        parse_deadbands("do")
+
+
+def test_display_cache_only_reports_visible_changes():
+    cache = DisplayCache()
+    assert cache.changed("do", 7.001) == 7.0
+    assert cache.changed("do", 7.004) is None
+    assert cache.changed("do", 7.006) == 7.01
+    assert cache.changed("ph", 7.01) == 7.0
+    cache.clear()
+    assert cache.changed("do", 7.006) == 7.01
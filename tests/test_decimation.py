@@ -0,0 +1,58 @@
+import math
+from array import array
+
+from decimation import drop_missing, lttb, minmax
+
+
+def _series(n):
+    xs = array("d", range(n))
+    ys = array("d", (math.sin(i / 50.0) for i in range(n)))
+    return xs, ys
+
+
+def test_lttb_short_series_unchanged():
+    xs, ys = _series(10)
+    assert lttb(xs, ys, 20) == (list(xs), list(ys))
+    assert lttb(xs, ys, 2) == (list(xs), list(ys))
+
+
+def test_lttb_keeps_endpoints_and_threshold():
+    xs, ys = _series(10000)
+    out_x, out_y = lttb(xs, ys, 300)
+    assert len(out_x) == len(out_y) == 300
+    assert out_x[0] == xs[0] and out_x[-1] == xs[-1]
+    assert out_x == sorted(out_x)
+    # 选中的都是原始点
+    assert all(ys[int(x)] == y for x, y in zip(out_x, out_y))
+
+
+def test_lttb_keeps_spike():
+    xs, ys = _series(5000)
+    ys[2345] = 10.0
+    out_x, out_y = lttb(xs, ys, 100)
+    assert 2345.0 in out_x
+    assert max(out_y) == 10.0
+
+
+def test_minmax_keeps_extremes_in_time_order():
+    xs, ys = _series(10000)
+    ys[777] = -5.0
+    ys[8888] = 5.0
+    out_x, out_y = minmax(xs, ys, 100)
+    assert len(out_x) <= 200
+    assert out_x == sorted(out_x)
+    assert min(out_y) == -5.0 and max(out_y) == 5.0
+    assert 777.0 in out_x and 8888.0 in out_x
+
+
+def test_minmax_short_series_unchanged():
+    xs, ys = _series(100)
+    assert minmax(xs, ys, 50) == (list(xs), list(ys))
+    assert minmax(xs, ys, 0) == (list(xs), list(ys))
+
+
+def test_drop_missing():
+    xs = [1.0, 2.0, 3.0]
+    ys = [1.0, float("nan"), 3.0]
+    assert drop_missing(xs, ys) == ([1.0, 3.0], [1.0, 3.0])
+    assert drop_missing(xs, [1.0, 2.0, 3.0]) == (xs, [1.0, 2.0, 3.0])
@@ -0,0 +1,63 @@
+import csv
+import time
+
+from history_export import FORMAT_COLUMNAR, FORMAT_CSV, export_history, read_columnar
+from history_store import SensorHistoryStore
+
+BASE = time.time() // 60 * 60 - 3600  # 保留期内、对齐到分钟
+
+
+def _store(tmp_path):
+    store = SensorHistoryStore(str(tmp_path / "history.db"), flush_interval=0.05)
+    store.start()
+    # 两个设备各80个样本，每30秒一个（跨40个分钟桶）
+    for index in range(80):
+        for device_id in ("dev", "other"):
+            store.append(BASE + index * 30, 7.0 + index / 100, 7.2, 25.0, device_id)
+    store.flush()
+    return store
+
+
+def test_filtered_samples_export_spans_chunks(tmp_path):
+    store = _store(tmp_path)
+    try:
+        start = BASE + 300
+        expected = [BASE + index * 30 for index in range(10, 80)]
+        csv_path = str(tmp_path / "samples.csv")
+        assert export_history(store, csv_path, FORMAT_CSV, start_ts=start, device_id="dev", chunk_size=7) == 70
+        with open(csv_path, encoding="utf-8-sig", newline="") as source:
+            rows = list(csv.reader(source))[1:]
+        assert [float(row[1]) for row in rows] == expected
+        assert {row[2] for row in rows} == {"dev"}
+
+        ecol_path = str(tmp_path / "samples.ecol")
+        assert export_history(store, ecol_path, FORMAT_COLUMNAR, start_ts=start, device_id="dev",
+                              chunk_size=7) == 70
+        groups = list(read_columnar(ecol_path))
+        assert len(groups) == 10
+        assert [ts for group in groups for ts in group["ts"]] == expected
+        assert {device for group in groups for device in group["device_id"]} == {"dev"}
+    finally:
+        store.close()
+
+
+def test_filtered_rollup_export_spans_chunks(tmp_path):
+    store = _store(tmp_path)
+    try:
+        start = BASE + 600
+        expected = len([row for row in store.query_rollups("minute", start, BASE + 3600)
+                        if row[0] == "dev"])
+        assert expected == 30 * 3
+        ecol_path = str(tmp_path / "minute.ecol")
+        assert export_history(store, ecol_path, FORMAT_COLUMNAR, source="minute", start_ts=start,
+                              device_id="dev", chunk_size=4) == expected
+        groups = list(read_columnar(ecol_path))
+        buckets = [bucket for group in groups for bucket in group["bucket"]]
+        assert len(buckets) == expected and buckets == sorted(buckets) and buckets[0] == start
+        assert sum(count for group in groups for count in group["count"]) == 30 * 2 * 3
+
+        csv_path = str(tmp_path / "minute.csv")
+        assert export_history(store, csv_path, FORMAT_CSV, source="minute", start_ts=start, device_id="dev",
+                              chunk_size=4) == expected
+    finally:
+        store.close()
@@ -0,0 +1,42 @@
+import time
+
+from alarm_engine import AlarmEngine
+from deadband import ChangeFilter
+from device_state import DeviceStateTable
+from history_ingest import record_samples
+from history_store import SensorHistoryStore
+from rollups import RollupTable
+
+
+class _Alarms(AlarmEngine):
+    def __init__(self):
+        super().__init__(())
+        self.seen = []
+
+    def evaluate(self, device_id, ts, do_value, ph_value, temp_value):
+        self.seen.append((device_id, ts))
+
+
+def test_record_samples_routes_every_sample(tmp_path):
+    base = time.time() // 60 * 60 - 600
+    store = SensorHistoryStore(str(tmp_path / "history.db"), flush_interval=0.05)
+    store.start()
+    devices, rollups, alarms = DeviceStateTable(100), RollupTable(), _Alarms()
+    samples = [
+        ("a", base, 7.0, 7.0, 25.0, base - 30),
+        ("a", base + 1, 7.01, None, None, base - 29),  # 死区内：不写历史，其余照常
+        ("b", base + 2, 8.0, None, None, None),
+        ("a", base + 3, 7.5, None, None, base - 27),
+    ]
+    try:
+        new_counts = record_samples(samples, devices, rollups, ChangeFilter(), alarms, store)
+        store.flush()
+        assert new_counts == {"a": 2, "b": 1}
+        assert len(devices.find("a").history) == 2
+        assert devices.find("a").do_value == 7.5
+        assert sum(row[4] for row in rollups.find("a").series["minute"].query("do", 0, 2 ** 32)) == 3
+        assert [row[1] for row in store.query_range(base, base + 60, "a")] == [base, base + 3]
+        assert store.device_cursors()["a"] == (base + 3, base - 27)
+        assert len(alarms.seen) == 4
+    finally:
+        store.close()
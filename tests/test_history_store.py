@@ -0,0 +1,102 @@
+import time
+
+from history_store import SensorHistoryStore
+from rollups import RollupTable
+
+BASE = time.time() // 60 * 60 - 3600  # 保留期内、对齐到分钟（压缩时不会被删除）
+
+
+def _store(tmp_path):
+    store = SensorHistoryStore(str(tmp_path / "history.db"), flush_interval=0.05)
+    store.start()
+    return store
+
+
+def _minute_count(store, metric="do"):
+    return sum(row[6] for row in store.query_rollups("minute", 0, 2 ** 32) if row[2] == metric)
+
+
+def test_redelivered_samples_do_not_inflate_rollups(tmp_path):
+    store = _store(tmp_path)
+    try:
+        for ts in (BASE, BASE + 1, BASE + 2):
+            store.append(ts, 7.0, 7.2, 25.0, "dev")
+        store.flush()
+        # 补传/重发再次投递同样的样本（同一批内也有重复）
+        for ts in (BASE + 1, BASE + 2, BASE + 2, BASE + 3):
+            store.append(ts, 8.0, 7.2, 25.0, "dev")
+        store.flush()
+        assert [row[1] for row in store.query_range(BASE, BASE + 60, "dev")] == [BASE, BASE + 1, BASE + 2, BASE + 3]
+        assert _minute_count(store) == 4
+        total = sum(row[5] for row in store.query_rollups("minute", 0, 2 ** 32) if row[2] == "do")
+        assert total == 7.0 * 3 + 8.0
+    finally:
+        store.close()
+
+
+def test_deadband_samples_only_counted_in_rollups(tmp_path):
+    store = _store(tmp_path)
+    try:
+        store.append(BASE, 7.0, None, None, "dev")
+        store.append(BASE + 1, 7.0, None, None, "dev", keep_sample=False)
+        store.flush()
+        assert len(store.query_range(BASE, BASE + 60, "dev")) == 1
+        assert _minute_count(store) == 2
+        assert _minute_count(store, "ph") == 0
+    finally:
+        store.close()
+
+
+def test_device_cursors_track_latest_received(tmp_path):
+    store = _store(tmp_path)
+    try:
+        store.append(BASE + 5, 7.0, None, None, "dev", device_ts=BASE - 25)
+        store.append(BASE + 9, 7.0, None, None, "dev", keep_sample=False, device_ts=BASE - 21)
+        store.append(BASE + 3, 7.0, None, None, "dev", device_ts=BASE - 40)  # 补传的旧样本不回退游标
+        store.append(BASE + 1, 7.0, None, None, "old")
+        store.flush()
+        assert store.device_cursors() == {"dev": (BASE + 9, BASE - 21), "old": (BASE + 1, None)}
+        assert store.device_ids() == ["dev", "old"]
+    finally:
+        store.close()
+
+
+def test_devices_table_filled_for_old_database(tmp_path):
+    store = _store(tmp_path)
+    store.append(BASE + 1, 7.0, None, None, "a")
+    store.append(BASE + 2, 7.0, None, None, "b")
+    store.flush()
+    store.close()
+    conn = store._connect()
+    with conn:
+        conn.execute("DELETE FROM devices")  # 升级前的数据库没有devices表的数据
+    conn.close()
+    store = _store(tmp_path)
+    try:
+        store.flush()
+        assert store.device_cursors() == {"a": (BASE + 1, None), "b": (BASE + 2, None)}
+    finally:
+        store.close()
+
+
+def test_load_startup_reads_snapshot_before_this_run(tmp_path):
+    store = _store(tmp_path)
+    for index in range(5):
+        store.append(BASE + index, float(index), None, None, "dev")
+    store.close()
+
+    store = SensorHistoryStore(str(tmp_path / "history.db"), flush_interval=0.05)
+    store.start(startup_snapshot=True)
+    try:
+        # 本次运行的样本（预加载期间到达）已写入数据库，但不在启动快照中
+        store.append(BASE + 10, 10.0, None, None, "dev")
+        store.append(BASE + 11, 11.0, None, None, "new")
+        store.flush()
+        rollups = RollupTable()
+        recent = store.load_startup(3, rollups)
+        assert recent == {"dev": [(BASE + index, float(index), None, None) for index in (2, 3, 4)]}
+        assert rollups.find("new") is None
+        assert sum(row[4] for row in rollups.find("dev").series["minute"].query("do", 0, 2 ** 32)) == 5
+        assert store.load_startup(3, RollupTable()) == {}
+    finally:
+        store.close()
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from ingest_queue import (BoundedIngestQueue, POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_KEEP_LATEST,
+                          check_policy)
+
+
+def _item(index, device_id="dev"):
+    return (float(index), device_id, {"do": float(index)})
+
+
+def test_drop_oldest():
+    queue = BoundedIngestQueue(4, POLICY_DROP_OLDEST)
+    drops = [queue.put(_item(i)) for i in range(6)]
+    assert drops == [0, 0, 0, 0, 1, 1]
+    assert queue.dropped == 2
+    assert [item[0] for item in queue.drain()] == [2, 3, 4, 5]
+    assert len(queue) == 0
+
+
+def test_keep_latest_per_device():
+    queue = BoundedIngestQueue(8, POLICY_KEEP_LATEST)
+    for i in range(8):
+        queue.put(_item(i, "noisy" if i % 4 else "quiet"))
+    queue.put(_item(8, "noisy"))
+    batch = queue.drain()
+    # 每个设备只保留最新一条，新样本代替该设备的旧样本
+    assert [(item[0], item[1]) for item in batch] == [(4.0, "quiet"), (8.0, "noisy")]
+    assert queue.dropped == 7
+
+
+def test_keep_latest_with_many_devices_frees_a_quarter():
+    queue = BoundedIngestQueue(8, POLICY_KEEP_LATEST)
+    for i in range(8):
+        queue.put(_item(i, f"dev{i}"))
+    # 设备数达到上限时压缩腾不出空间，丢弃最旧的到3/4
+    assert queue.put(_item(8, "dev8")) == 2
+    assert [item[1] for item in queue.drain()] == [f"dev{i}" for i in range(2, 9)]
+
+
+def test_drain_limit_keeps_order():
+    queue = BoundedIngestQueue(10)
+    for i in range(5):
+        queue.put(_item(i))
+    assert [item[0] for item in queue.drain(2)] == [0, 1]
+    assert [item[0] for item in queue.drain(10)] == [2, 3, 4]
+
+
+def test_block_waits_for_consumer():
+    queue = BoundedIngestQueue(2, POLICY_BLOCK, block_timeout=5)
+    queue.put(_item(0))
+    queue.put(_item(1))
+    drained = []
+    consumer = threading.Timer(0.1, lambda: drained.extend(queue.drain()))
+    consumer.start()
+    started = time.monotonic()
+    assert queue.put(_item(2)) == 0
+    assert time.monotonic() - started >= 0.05
+    consumer.join()
+    assert [item[0] for item in drained] == [0, 1]
+    assert queue.dropped == 0
+
+
+def test_block_times_out_and_drops_oldest():
+    queue = BoundedIngestQueue(1, POLICY_BLOCK, block_timeout=0.05)
+    queue.put(_item(0))
+    assert queue.put(_item(1)) == 1
+    assert [item[0] for item in queue.drain()] == [1]
+
+
+def test_block_close_releases_producer():
+    queue = BoundedIngestQueue(1, POLICY_BLOCK, block_timeout=5)
+    queue.put(_item(0))
+    threading.Timer(0.05, queue.close).start()
+    started = time.monotonic()
+    queue.put(_item(1))
+    assert time.monotonic() - started < 2
+
+
+def test_check_policy():
+    for policy in (POLICY_DROP_OLDEST, POLICY_KEEP_LATEST, POLICY_BLOCK):
+        check_policy(policy)
+    check_policy(POLICY_DROP_OLDEST, same_thread=True)
+    with pytest.raises(ValueError):
+        check_policy(POLICY_BLOCK, same_thread=True)
+    with pytest.raises(ValueError):
+        BoundedIngestQueue(10, "newest")
@@ -0,0 +1,88 @@
+import json
+
+from metrics import MetricsRegistry, RateMeter
+
+
+def test_counter_with_and_without_labels():
+    registry = MetricsRegistry()
+    plain = registry.counter("plain", "计数")
+    plain.inc()
+    plain.inc(4)
+    labelled = registry.counter("by_topic", "按主题", label="topic")
+    labelled.inc(label_value="a")
+    labelled.inc(2, label_value="b")
+    labelled.inc(label_value="a")
+    assert plain.total() == 5 and plain.samples() == [((), 5)]
+    assert labelled.total() == 4
+    assert dict(labelled.samples()) == {(("topic", "a"),): 2, (("topic", "b"),): 2}
+    assert registry.counter("plain", "重复注册") is plain
+
+
+def test_histogram_quantiles():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency", "耗时", buckets=(1.0, 2.0, 4.0))
+    registry.acquire()
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 0.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.count == 4 and histogram.sum == 5.5
+    assert histogram.quantile(0.5) == 1.0
+    assert histogram.quantile(0.75) == 2.0
+    assert histogram.quantile(1.0) == 4.0
+    histogram.observe(100.0)  # +Inf桶按最后一个桶上限估算
+    assert histogram.quantile(1.0) == 4.0
+    assert [value for _, value in histogram.samples()] == [2, 3, 4, 5]
+
+
+def test_acquire_release_gates_timing():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency", "耗时")
+    histogram.observe(0.1)
+    with histogram.time():
+        pass
+    assert histogram.count == 0
+    registry.acquire()
+    registry.acquire()
+    registry.release()
+    with histogram.time():
+        pass
+    assert histogram.count == 1
+    registry.release()
+    registry.release()  # 多余的release不会变成负数
+    assert not registry.enabled
+    histogram.observe(0.1)
+    assert histogram.count == 1
+    registry.acquire()
+    assert registry.enabled
+
+
+def test_dump_format_by_extension(tmp_path):
+    registry = MetricsRegistry(prefix="t_")
+    registry.counter("messages", "消息数", label="topic").inc(3, label_value='a"b')
+    registry.gauge("depth", "队列长度", read=lambda: 7)
+    registry.histogram("latency", "耗时", buckets=(1.0,))
+
+    prom_path = tmp_path / "metrics.prom"
+    registry.dump(str(prom_path))
+    text = prom_path.read_text(encoding="utf-8")
+    assert "# TYPE t_messages counter" in text
+    assert 't_messages{topic="a\\"b"} 3' in text
+    assert "t_depth 7" in text
+    assert 't_latency_bucket{le="+Inf"} 0' in text and "t_latency_count 0" in text
+
+    json_path = tmp_path / "metrics.json"
+    registry.dump(str(json_path))
+    data = json.loads(json_path.read_text(encoding="utf-8"))
+    assert data["metrics"]["messages"] == {'a"b': 3}
+    assert data["metrics"]["depth"] == 7
+    assert data["metrics"]["latency"]["count"] == 0 and data["metrics"]["latency"]["p50"] is None
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_rate_meter_first_call_empty():
+    registry = MetricsRegistry()
+    counter = registry.counter("messages", "消息数")
+    meter = RateMeter(counter)
+    assert meter.rates() == {}
+    counter.inc(10)
+    assert meter.rates()[None] > 0
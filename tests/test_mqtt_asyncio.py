@@ -0,0 +1,49 @@
+import paho.mqtt.client as mqtt
+
+from mqtt_asyncio import AsyncioMqttTransport
+
+
+class _FakeClient:
+    def __init__(self, sock, results=None):
+        self.sock = sock
+        self.results = list(results or [])
+        self.reads = 0
+
+    def loop_read(self):
+        self.reads += 1
+        self.sock.buffered = max(0, self.sock.buffered - 1)
+        return self.results.pop(0) if self.results else mqtt.MQTT_ERR_SUCCESS
+
+
+class _TlsSocket:
+    def __init__(self, buffered):
+        self.buffered = buffered
+
+    def pending(self):
+        return self.buffered
+
+
+class _PlainSocket:
+    buffered = 0
+
+
+def test_reads_buffered_tls_records():
+    sock = _TlsSocket(4)
+    client = _FakeClient(sock)
+    AsyncioMqttTransport._read_ready(client, sock)
+    assert client.reads == 4
+    assert sock.buffered == 0
+
+
+def test_stops_on_read_error():
+    sock = _TlsSocket(4)
+    client = _FakeClient(sock, [mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_CONN_LOST])
+    AsyncioMqttTransport._read_ready(client, sock)
+    assert client.reads == 2
+
+
+def test_plain_socket_reads_once():
+    sock = _PlainSocket()
+    client = _FakeClient(sock)
+    AsyncioMqttTransport._read_ready(client, sock)
+    assert client.reads == 1
@@ -0,0 +1,71 @@
+import random
+
+from mqtt_reconnect import ReconnectBackoff
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _backoff(clock):
+    return ReconnectBackoff(base_delay=1.0, max_delay=120.0, rng=random.Random(1), stable_after=30.0, clock=clock)
+
+
+def test_delay_grows_and_is_capped():
+    backoff = _backoff(FakeClock())
+    delays = [backoff.next_delay() for _ in range(10)]
+    assert backoff.attempts == 10
+    assert 0.5 <= delays[0] <= 1.0
+    assert 4.0 <= delays[3] <= 8.0
+    assert 60.0 <= delays[-1] <= 120.0
+
+
+def test_short_connection_keeps_backoff_growing():
+    clock = FakeClock()
+    backoff = _backoff(clock)
+    for _ in range(4):
+        backoff.next_delay()
+    # Broker接受连接后立即断开：不清零
+    backoff.connected()
+    clock.now += 2.0
+    delay = backoff.next_delay()
+    assert backoff.attempts == 5
+    assert 8.0 <= delay <= 16.0
+
+
+def test_stable_connection_resets_backoff():
+    clock = FakeClock()
+    backoff = _backoff(clock)
+    for _ in range(4):
+        backoff.next_delay()
+    backoff.connected()
+    clock.now += 30.0
+    delay = backoff.next_delay()
+    assert backoff.attempts == 1
+    assert 0.5 <= delay <= 1.0
+
+
+def test_connection_time_is_used_once():
+    clock = FakeClock()
+    backoff = _backoff(clock)
+    backoff.connected()
+    clock.now += 60.0
+    backoff.next_delay()
+    # 重连失败（未连上）时不再按上一次连接的时长清零
+    backoff.next_delay()
+    assert backoff.attempts == 2
+
+
+def test_reset_clears_immediately():
+    backoff = _backoff(FakeClock())
+    for _ in range(3):
+        backoff.next_delay()
+    backoff.connected()
+    backoff.reset()
+    assert backoff.attempts == 0
+    backoff.next_delay()
+    assert backoff.attempts == 1
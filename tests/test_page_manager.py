@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+from ui_utils import PageManager, set_page_hooks
+
+
+class FakeContainer:
+    def __init__(self):
+        self.children = []
+
+    def add_widget(self, widget):
+        self.children.append(widget)
+
+    def remove_widget(self, widget):
+        self.children.remove(widget)
+
+
+def _manager(capacity, events):
+    built = []
+
+    def factory(name):
+        def build(app_instance):
+            page = SimpleNamespace(name=name)
+            set_page_hooks(page, on_show=lambda: events.append(("show", name)),
+                           on_hide=lambda: events.append(("hide", name)),
+                           on_destroy=lambda: events.append(("destroy", name)))
+            built.append(name)
+            return page
+        return build
+
+    factories = {name: factory(name) for name in ("home", "me", "history")}
+    app_instance = SimpleNamespace(current_page=None)
+    return PageManager(app_instance, FakeContainer(), factories, capacity=capacity), built
+
+
+def test_pages_built_once_with_default_capacity():
+    events = []
+    manager, built = _manager(3, events)
+    for name in ("home", "history", "me", "history", "home", "me"):
+        manager.show(name)
+    assert built == ["home", "history", "me"]
+    assert not [event for event in events if event[0] == "destroy"]
+    assert manager.container.children == [manager.get("me")]
+    assert manager.app_instance.current_page is manager.get("me")
+
+
+def test_evicts_least_recently_used_unpinned_page():
+    events = []
+    manager, built = _manager(2, events)
+    manager.show("home")
+    manager.show("history")
+    manager.show("me")
+    assert ("destroy", "history") in events
+    assert manager.get("history") is None and manager.get("home") is not None
+    manager.show("home")
+    manager.show("history")
+    assert built == ["home", "history", "me", "history"]
+    assert ("destroy", "me") in events
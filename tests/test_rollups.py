@@ -0,0 +1,93 @@
+import math
+
+from rollups import DeviceRollups, RollupSeries, RollupTable, aggregate_batch
+
+DAY = 86400
+NOW = 1700000000 - 1700000000 % DAY + 12 * 3600  # 某天中午（UTC）
+
+
+def test_series_add_and_query():
+    series = RollupSeries(60, 100)
+    series.add(120, (1.0, 7.0, None))
+    series.add(150, (3.0, 7.5, 25.0))
+    series.add(200, (2.0, float("nan"), 26.0))
+    assert series.query("do", 0, 1000) == [(120, 1.0, 3.0, 2.0, 2), (180, 2.0, 2.0, 2.0, 1)]
+    assert series.query("ph", 0, 1000) == [(120, 7.0, 7.5, 7.25, 2)]
+    assert series.query("temp", 0, 1000) == [(120, 25.0, 25.0, 25.0, 1), (180, 26.0, 26.0, 26.0, 1)]
+    assert series.query("do", 180, 240) == [(180, 2.0, 2.0, 2.0, 1)]
+    assert series.time_range() == (120, 240)
+
+
+def test_series_late_sample_and_merge():
+    series = RollupSeries(60, 100)
+    series.add(600, (1.0, None, None))
+    series.add(60, (5.0, None, None))  # 迟到的样本插入到前面的桶
+    series.merge(600, "do", 0.5, 4.0, 6.0, 3)
+    assert list(series.start) == [60, 600]
+    assert series.query("do", 0, 1000) == [(60, 5.0, 5.0, 5.0, 1), (600, 0.5, 4.0, 7.0 / 4, 4)]
+
+
+def test_series_trims_oldest_buckets():
+    series = RollupSeries(60, 8)
+    for index in range(11):
+        series.add(index * 60, (1.0, None, None))
+    assert len(series) == 8
+    assert series.start[0] == 3 * 60
+
+
+def test_aggregate_batch_matches_series():
+    samples = [("dev", NOW + i * 20, float(i), None, 25.0) for i in range(10)]
+    deltas = {(resolution, bucket, metric): (low, high, total, count)
+              for _, resolution, bucket, metric, low, high, total, count in aggregate_batch(samples)}
+    assert deltas[("minute", NOW, "do")] == (0.0, 2.0, 3.0, 3)
+    assert deltas[("day", NOW - NOW % DAY, "do")] == (0.0, 9.0, 45.0, 10)
+    assert not any(metric == "ph" for _, _, metric in deltas)
+    assert math.isclose(deltas[("hour", NOW - NOW % 3600, "temp")][2], 250.0)
+
+
+def test_choose_by_span():
+    rollups = DeviceRollups()
+    rollups.add(NOW, 1.0, 7.0, 25.0)
+    assert rollups.choose(6 * 3600, 500).seconds == 60
+    assert rollups.choose(7 * DAY, 500).seconds == 3600
+    assert rollups.choose(365 * DAY, 500).seconds == DAY
+    assert rollups.choose(100 * 365 * DAY, 500).seconds == DAY
+
+
+def test_choose_falls_back_when_minutes_do_not_cover_start():
+    rollups = DeviceRollups()
+    for hour in range(5 * 24):
+        rollups.add(NOW - hour * 3600, 1.0, 7.0, 25.0)
+    minutes = rollups.series["minute"]
+    # 内存中只保留最近两天的分钟聚合
+    while minutes.start[0] < NOW - 2 * DAY:
+        for column in minutes._columns():
+            del column[:1]
+    start_ts = NOW - 3 * DAY
+    chosen = rollups.choose(6 * 3600, 500, start_ts)
+    assert chosen.seconds == 3600
+    assert chosen.query("do", start_ts, start_ts + 6 * 3600)
+    # 最近的窗口仍然用分钟聚合
+    assert rollups.choose(6 * 3600, 500, NOW - 6 * 3600).seconds == 60
+
+
+def test_choose_keeps_minutes_for_new_device():
+    rollups = DeviceRollups()
+    for minute in range(60):
+        rollups.add(NOW - minute * 60, 1.0, 7.0, 25.0)
+    # 设备刚接入一小时：窗口起点早于所有数据，但更粗的分辨率也没有更早的数据
+    assert rollups.choose(6 * 3600, 500, NOW - 6 * 3600).seconds == 60
+    assert DeviceRollups().choose(6 * 3600, 500, NOW).seconds == 60
+
+
+def test_merge_loaded_keeps_live_buckets():
+    live = RollupTable()
+    live.add("dev", NOW + 30, 2.0, None, None)
+    loaded = RollupTable()
+    loaded.add("dev", NOW - 3600, 1.0, None, None)
+    loaded.add("dev", NOW + 10, 4.0, None, None)
+    loaded.add("old", NOW - 3600, 1.0, None, None)
+    live.merge_loaded(loaded)
+    minutes = live.find("dev").series["minute"]
+    assert minutes.query("do", 0, NOW + DAY) == [(NOW - 3600, 1.0, 1.0, 1.0, 1), (NOW, 2.0, 4.0, 3.0, 2)]
+    assert live.find("old") is not None
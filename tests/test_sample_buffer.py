@@ -0,0 +1,64 @@
+import math
+
+from sample_buffer import SampleRingBuffer
+
+
+def _filled(capacity, timestamps):
+    buffer = SampleRingBuffer(capacity)
+    for ts in timestamps:
+        buffer.append(ts, ts / 10, None, 25.0)
+    return buffer
+
+
+def test_append_wraps_and_keeps_order():
+    buffer = _filled(4, range(6))
+    assert len(buffer) == 4
+    assert list(buffer.column("ts")) == [2, 3, 4, 5]
+    assert buffer.latest().ts == 5
+    assert buffer.get(0).ph_value is None
+    assert buffer.time_range() == (2, 5)
+    assert buffer.seq(0) == 5
+
+
+def test_columns_between_inclusive_bounds():
+    buffer = _filled(8, range(10))  # 已回绕
+    ts, do_values = buffer.columns_between(3, 6, ("ts", "do_value"))
+    assert list(ts) == [3, 4, 5, 6]
+    assert list(do_values) == [0.3, 0.4, 0.5, 0.6]
+    assert list(buffer.columns_between(2.5, 3.5, ("ts",))[0]) == [3]
+    assert list(buffer.columns_between(100, 200, ("ts",))[0]) == []
+    assert list(buffer.columns_between(-5, 100, ("ts",))[0]) == list(range(2, 10))
+    assert math.isnan(buffer.columns_between(4, 4, ("ph_value",))[0][0])
+
+
+def test_merge_appends_newer_rows():
+    buffer = _filled(8, [1, 2])
+    buffer.merge([(3, 1.0, None, None), (4, 2.0, None, None)])
+    assert list(buffer.column("ts")) == [1, 2, 3, 4]
+    assert buffer.total == 4
+
+
+def test_merge_inserts_gap_in_order():
+    buffer = _filled(10, [1, 2, 8, 9])
+    buffer.merge([(3, 0.3, 7.0, None), (5, 0.5, None, None)])
+    assert list(buffer.column("ts")) == [1, 2, 3, 5, 8, 9]
+    assert buffer.get(3).ph_value == 7.0
+    assert buffer.get(3).temp_value is None
+    assert buffer.total == 6
+    buffer.append(10, 1.0, None, None)
+    assert list(buffer.column("ts", 3)) == [8, 9, 10]
+
+
+def test_merge_drops_oldest_beyond_capacity():
+    buffer = _filled(5, range(0, 20, 2))  # 已回绕：10, 12, 14, 16, 18
+    buffer.merge([(11, 0.0, None, None), (13, 0.0, None, None), (15, 0.0, None, None)])
+    assert list(buffer.column("ts")) == [13, 14, 15, 16, 18]
+    buffer.append(19, 0.0, None, None)
+    assert list(buffer.column("ts")) == [14, 15, 16, 18, 19]
+    assert list(buffer.columns_between(15, 18, ("ts",))[0]) == [15, 16, 18]
+
+
+def test_merge_older_than_everything():
+    buffer = _filled(4, [10, 11, 12, 13])
+    buffer.merge([(1, 0.0, None, None)])
+    assert list(buffer.column("ts")) == [10, 11, 12, 13]
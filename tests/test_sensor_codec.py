@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from sensor_codec import (BINARY_MAGIC, FLAG_DO, FLAG_TS, decode_sensor_payload, encode_sensor_binary,
+                          is_binary_payload)
+
+
+def test_binary_round_trip():
+    payload = encode_sensor_binary(7.25, 7.0, 25.5, ts=1700000000)
+    assert len(payload) == 20 and is_binary_payload(payload)
+    assert decode_sensor_payload(payload) == {"do": 7.25, "ph": 7.0, "temp": 25.5, "ts": 1700000000}
+
+
+def test_binary_missing_fields_not_decoded():
+    payload = encode_sensor_binary(do_value=6.5)
+    assert payload[2] == FLAG_DO
+    assert decode_sensor_payload(payload) == {"do": 6.5}
+    # 数值0与未上传不同
+    assert decode_sensor_payload(encode_sensor_binary(0.0, ts=5))["do"] == 0.0
+    assert encode_sensor_binary(ts=5)[2] == FLAG_TS
+
+
+def test_binary_accepts_memoryview_and_trailing_bytes():
+    payload = encode_sensor_binary(7.0, 7.2, 25.0) + b"\x00\x00"
+    assert decode_sensor_payload(bytearray(payload)) == {"do": 7.0, "ph": pytest.approx(7.2), "temp": 25.0}
+
+
+def test_json_round_trip():
+    data = {"do": 7.25, "ph": 7.0, "temp": 25.5, "ts": 1700000000}
+    payload = json.dumps(data).encode("utf-8")
+    assert not is_binary_payload(payload)
+    assert decode_sensor_payload(payload) == data
+
+
+@pytest.mark.parametrize("payload", [
+    bytes([BINARY_MAGIC]),                                 # 截断
+    encode_sensor_binary(7.0, 7.2, 25.0)[:19],              # 截断
+    bytes([BINARY_MAGIC, 2]) + bytes(18),                   # 版本号不支持
+    b"[1, 2, 3]",                                           # 不是JSON对象
+    b"{\"do\": 7.0",                                        # JSON不完整
+    b"\xff\xfe{}",                                          # 非UTF-8
+    b"",
+])
+def test_malformed_payload_rejected(payload):
+    with pytest.raises(ValueError):
+        decode_sensor_payload(payload)
@@ -0,0 +1,50 @@
+import json
+
+from esp32_mqtt_utils import Esp32MqttClient
+from metrics import INVALID_FIELDS
+from sensor_schema import SENSOR_SCHEMA, format_errors
+
+
+def test_valid_payload_passes_through():
+    values, errors = SENSOR_SCHEMA.validate({"do": 7.25, "ph": 7, "temp": "25.5", "ts": 1700000000})
+    assert values == {"do": 7.25, "ph": 7.0, "temp": 25.5, "ts": 1700000000.0}
+    assert errors == {}
+
+
+def test_missing_and_unknown_fields_ignored():
+    values, errors = SENSOR_SCHEMA.validate({"do": 7.0, "ph": None, "orp": 300})
+    assert values == {"do": 7.0}
+    assert errors == {}
+
+
+def test_invalid_fields_rejected_individually():
+    values, errors = SENSOR_SCHEMA.validate({"do": 60.0, "ph": "abc", "temp": float("nan"), "ts": True})
+    assert values == {}
+    assert set(errors) == {"do", "ph", "temp", "ts"}
+    values, errors = SENSOR_SCHEMA.validate({"do": 7.0, "ph": 15.2, "temp": [25]})
+    assert values == {"do": 7.0}
+    assert format_errors(errors) == "ph超出范围0~14（15.2）；temp类型错误（list）"
+
+
+class _Dispatcher:
+    def __init__(self):
+        self.pushed = []
+        self.dropped = 0
+
+    def push(self, device_id, parsed_data, ts=None):
+        self.pushed.append((device_id, parsed_data))
+
+
+def test_client_counts_invalid_fields_and_forwards_valid_ones():
+    messages = []
+    dispatcher = _Dispatcher()
+    client = Esp32MqttClient("127.0.0.1", 1883, "", "", messages.append, use_tls=False, dispatcher=dispatcher)
+    before = {key: value for ((_, key),), value in INVALID_FIELDS.samples()}
+    client._handle_sensor_message("esp32/dev/sensor", "dev", json.dumps({"do": 7.5, "ph": 99}).encode())
+    client._handle_sensor_message("esp32/dev/sensor", "dev", json.dumps({"do": "x", "ph": "bad"}).encode())
+    after = {key: value for ((_, key),), value in INVALID_FIELDS.samples()}
+    assert after["ph"] - before.get("ph", 0) == 2
+    assert after["do"] - before.get("do", 0) == 1
+    # 只有通过校验的字段交给分发器；没有可用数值的消息不转发
+    assert dispatcher.pushed == [("dev", {"do": 7.5})]
+    assert any("数据异常" in message for message in messages)
@@ -0,0 +1,22 @@
+import json
+
+import pytest
+
+from thresholds import build_threshold_payload, validate_threshold
+
+
+def test_validate_threshold_parses_numbers():
+    assert validate_threshold("8.5", " 5 ") == (8.5, 5.0)
+    assert validate_threshold(8, 5.5) == (8.0, 5.5)
+
+
+@pytest.mark.parametrize("max_val, min_val", [("abc", "5"), ("8", ""), ("nan", "5"), ("8", "-inf"), ("inf", "5")])
+def test_validate_threshold_rejects_invalid(max_val, min_val):
+    with pytest.raises(ValueError):
+        validate_threshold(max_val, min_val)
+
+
+def test_build_threshold_payload():
+    payload = json.loads(build_threshold_payload(8.5, 5.0))
+    assert payload["max_do"] == 8.5 and payload["min_do"] == 5.0
+    assert "timestamp" in payload
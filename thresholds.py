@@ -0,0 +1,32 @@
+# thresholds.py：溶解氧阈值指令（App界面和无界面网关共用）
+import datetime
+import json
+import math
+
+THRESHOLD_TOPIC = "esp32/threshold"
+THRESHOLD_RESPONSE_TOPIC = "esp32/threshold_response"
+
+
+def validate_threshold(max_val, min_val):
+    """
+    校验阈值输入（文本或数字）
+    :return: (最高值, 最低值)浮点数
+    :raises ValueError: 不是数字，或为nan/inf（报警规则永远不会触发）
+    """
+    max_do, min_do = float(max_val), float(min_val)
+    if not (math.isfinite(max_do) and math.isfinite(min_do)):
+        raise ValueError(f"阈值必须是有限数值：最高={max_val}，最低={min_val}")
+    return max_do, min_do
+
+
+def build_threshold_payload(max_val, min_val, now=None):
+    """
+    构造下发给设备的阈值JSON（数值保持用户输入的原样）
+    :param now: 时间戳所用的datetime（默认当前时间）
+    """
+    return json.dumps({
+        "max_do": max_val,
+        "min_do": min_val,
+        "timestamp": str(now or datetime.datetime.now())
+    }, ensure_ascii=False)
+
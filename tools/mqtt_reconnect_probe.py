@@ -0,0 +1,54 @@
+# mqtt_reconnect_probe.py：用本地Broker验证重连状态机
+# 用法：
+#   1. 启动本地Broker：mosquitto -p 1883
+#   2. python tools/mqtt_reconnect_probe.py --port 1883
+#   3. 杀掉/重启mosquitto，观察状态变化、退避时间和重连耗时
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("KIVY_NO_ARGS", "1")  # 命令行参数留给本脚本解析
+from esp32_mqtt_utils import Esp32MqttClient  # noqa: E402
+from mqtt_reconnect import ReconnectBackoff  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT重连状态机验证工具")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--username", default="")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--tls", action="store_true", help="启用TLS")
+    parser.add_argument("--max-delay", type=float, default=30.0, help="退避等待上限（秒）")
+    parser.add_argument("--duration", type=float, default=0, help="运行秒数，0表示一直运行")
+    args = parser.parse_args()
+
+    client = Esp32MqttClient(
+        broker=args.host,
+        port=args.port,
+        username=args.username,
+        password=args.password,
+        data_callback=lambda content: print(f"[{time.strftime('%H:%M:%S')}] {content}"),
+        use_tls=args.tls,
+        backoff=ReconnectBackoff(max_delay=args.max_delay),
+    )
+    client.start_mqtt()
+    started = time.monotonic()
+    last_state = None
+    try:
+        while not args.duration or time.monotonic() - started < args.duration:
+            if client.state != last_state:
+                last_state = client.state
+                print(f"[{time.strftime('%H:%M:%S')}] 状态：{last_state} "
+                      f"尝试次数={client.connect_attempts} 重连次数={client.reconnect_count} "
+                      f"连接耗时={client.last_connect_seconds} 首条消息耗时={client.last_first_message_seconds}")
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    client.stop_mqtt()
+
+
+if __name__ == "__main__":
+    main()
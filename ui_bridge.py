@@ -0,0 +1,98 @@
+# ui_bridge.py：网络线程 → Kivy主线程的数据桥（按帧合并投递）
+import time
+from kivy.clock import Clock
+from kivy.event import EventDispatcher
+from kivy.properties import StringProperty, NumericProperty
+from mqtt_reconnect import STATE_IDLE
+from metrics import REGISTRY, QUEUE_DEPTH, CLOCK_LAG_SECONDS
+from ingest_queue import BoundedIngestQueue, POLICY_DROP_OLDEST
+
+
+class SensorFrameBridge:
+    """
+    网络线程只负责把样本放入有界队列，并触发一次“下一帧消费”；
+    同一帧内到达的多条消息由主线程一次性批量取出，
+    避免每条消息都创建一个Clock回调闭包
+    """
+
+    def __init__(self, consumer, maxlen=10000, policy=POLICY_DROP_OLDEST, on_drop=None):
+        """
+        :param consumer: 主线程批量消费函数，参数为[(接收时间戳, 设备编号, 数据字典), ...]（按到达顺序）
+        :param maxlen: 队列上限（主线程长时间卡死时防止内存无限增长）
+        :param policy: 队列满时的策略（见ingest_queue.py）
+        :param on_drop: 主线程回调on_drop(本帧之前新丢弃的条数)，有丢弃时才调用
+        """
+        self.consumer = consumer
+        self.on_drop = on_drop
+        self._queue = BoundedIngestQueue(maxlen, policy)
+        self._reported_drops = 0
+        # Trigger已处于等待状态时重复调用不会重复调度，天然实现按帧合并；Clock的调度方法线程安全
+        self._trigger = Clock.create_trigger(self._drain, 0)
+        self._queued_at = None  # 队列由空变为非空的时间（只在查看指标时记录，用于统计Clock回调延迟）
+        QUEUE_DEPTH.read = lambda: len(self._queue)
+
+    @property
+    def dropped(self):
+        return self._queue.dropped
+
+    def push(self, device_id, parsed_data, ts=None):
+        """网络线程调用：入队并请求下一帧消费（不做任何UI操作；block策略下队列满时在这里等待）"""
+        if REGISTRY.enabled and not len(self._queue):
+            self._queued_at = time.perf_counter()
+        self._queue.put((time.time() if ts is None else ts, device_id, parsed_data))
+        self._trigger()
+
+    def close(self):
+        """App退出时调用：唤醒被阻塞的网络线程"""
+        self._queue.close()
+
+    def _drain(self, dt):
+        """主线程：取出当前队列中的全部样本，交给消费函数批量处理"""
+        queued_at, self._queued_at = self._queued_at, None
+        if queued_at is not None:
+            CLOCK_LAG_SECONDS.observe(time.perf_counter() - queued_at)
+        batch = self._queue.drain()
+        dropped = self._queue.dropped
+        if dropped != self._reported_drops and self.on_drop is not None:
+            self.on_drop(dropped - self._reported_drops)
+        self._reported_drops = dropped
+        if batch:
+            self.consumer(batch)
+
+
+class ConnectionStateBridge(EventDispatcher):
+    """
+    把Esp32MqttClient的连接状态同步为Kivy属性（主线程），界面控件直接bind这些属性
+    状态变化/RTT更新时在下一帧同步；消息间隔、重连倒计时每秒同步一次（值不变时不会触发绑定）
+    """
+    state = StringProperty(STATE_IDLE)
+    attempts = NumericProperty(0)             # 连续失败次数
+    rtt_ms = NumericProperty(-1)              # 往返延迟（毫秒），-1表示未测量
+    last_message_age = NumericProperty(-1)    # 距最近一条消息的秒数，-1表示未收到
+    retry_in = NumericProperty(-1)            # 距下次重连的秒数，-1表示不在等待重连
+    last_error = StringProperty("")
+
+    def __init__(self, client, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        # Trigger可在任意线程调用，多次状态变化在同一帧只同步一次
+        self._trigger = Clock.create_trigger(self.refresh, 0)
+        client.add_state_listener(self._trigger)
+        self._ticker = Clock.schedule_interval(self.refresh, 1)
+        self.refresh()
+
+    def stop(self):
+        self.client.remove_state_listener(self._trigger)
+        self._ticker.cancel()
+
+    def refresh(self, *args):
+        status = self.client.connection_status()
+        now = time.monotonic()
+        age = status.last_message_age(now)
+        retry_in = status.retry_in(now)
+        self.state = status.state
+        self.attempts = status.attempts
+        self.rtt_ms = -1 if status.rtt is None else round(status.rtt * 1000)
+        self.last_message_age = -1 if age is None else int(age)
+        self.retry_in = -1 if retry_in is None else int(retry_in + 0.999)
+        self.last_error = status.last_error or ""
@@ -0,0 +1,188 @@
+# ui_export.py：历史页面的导出面板（选择范围/数据/设备，后台线程导出，进度在主线程刷新）
+import os
+import time
+from threading import Event, Thread
+
+from kivy.clock import Clock
+from kivy.metrics import dp
+from kivymd.uix.boxlayout import MDBoxLayout
+from kivymd.uix.label import MDLabel
+
+from app_logging import get_logger
+from app_ui_pages import get_selected_device
+from history_export import (FORMAT_CSV, FORMAT_COLUMNAR, SOURCE_SAMPLES, ExportCancelled,
+                            export_filename, export_history, format_progress)
+from ui_utils import NoBorderButton
+
+logger = get_logger("export")
+
+# 可选项：(按钮文字, 取值)，点击按钮循环切换
+RANGE_OPTIONS = (("最近1天", 86400), ("最近7天", 7 * 86400), ("最近30天", 30 * 86400), ("全部", None))
+SOURCE_OPTIONS = (("原始数据", SOURCE_SAMPLES), ("每分钟", "minute"), ("每小时", "hour"), ("每天", "day"))
+DEVICE_OPTIONS = (("当前设备", True), ("全部设备", False))
+
+
+SHARED_SUBDIR = "ESP32"  # 共享存储Download下的子目录
+
+
+def export_directory(app_instance):
+    """导出文件先写到App私有目录（不需要任何权限），Android上完成后再复制到共享存储"""
+    return os.path.join(app_instance.user_data_dir, "exports")
+
+
+def request_storage_permission(on_done):
+    """
+    Android 9及以下复制到共享存储需要运行时授权WRITE_EXTERNAL_STORAGE（Android 10起经MediaStore写入，不需要权限）
+    :param on_done: 授权结束（无论是否同意）后在主线程调用
+    """
+    try:
+        from android.permissions import Permission, check_permission, request_permissions
+        from jnius import autoclass
+    except ImportError:
+        on_done()
+        return
+    if autoclass("android.os.Build$VERSION").SDK_INT >= 29 or check_permission(Permission.WRITE_EXTERNAL_STORAGE):
+        on_done()
+        return
+    # 授权回调在Java线程执行，切回主线程
+    request_permissions([Permission.WRITE_EXTERNAL_STORAGE],
+                        lambda permissions, grants: Clock.schedule_once(lambda dt: on_done()))
+
+
+def publish_export(path):
+    """
+    后台线程：把导出文件复制到共享存储的Download/ESP32（可被文件管理器、微信等访问），成功后删除私有目录中的文件
+    :return: 共享存储中的文件URI；不是Android或复制失败时返回None（文件保留在私有目录）
+    """
+    try:
+        from androidstorage4kivy import SharedStorage
+        from jnius import autoclass
+    except ImportError:
+        return None
+    try:
+        uri = SharedStorage().copy_to_shared(path, collection=autoclass("android.os.Environment").DIRECTORY_DOWNLOADS,
+                                             filepath=f"{SHARED_SUBDIR}/{os.path.basename(path)}")
+    except Exception:
+        logger.exception("复制到共享存储失败：%s", path)
+        return None
+    if uri is not None:
+        os.remove(path)
+    return uri
+
+
+def _cycle_button(options):
+    button = NoBorderButton(
+        text=options[0][0],
+        size_hint_y=None,
+        height=dp(30)
+    )
+    button.option_index = 0
+
+    def on_press(instance):
+        instance.option_index = (instance.option_index + 1) % len(options)
+        instance.text = options[instance.option_index][0]
+    button.bind(on_press=on_press)
+    return button
+
+
+def create_export_panel(app_instance):
+    panel = MDBoxLayout(orientation="vertical", spacing=dp(6), size_hint_y=None, height=dp(100))
+    option_bar = MDBoxLayout(orientation="horizontal", spacing=dp(8), size_hint_y=None, height=dp(30))
+    range_btn = _cycle_button(RANGE_OPTIONS)
+    source_btn = _cycle_button(SOURCE_OPTIONS)
+    device_btn = _cycle_button(DEVICE_OPTIONS)
+    for button in (range_btn, source_btn, device_btn):
+        option_bar.add_widget(button)
+
+    action_bar = MDBoxLayout(orientation="horizontal", spacing=dp(8), size_hint_y=None, height=dp(30))
+    csv_btn = NoBorderButton(text="导出CSV", size_hint_y=None, height=dp(30))
+    columnar_btn = NoBorderButton(text="导出列式", size_hint_y=None, height=dp(30))
+    cancel_btn = NoBorderButton(text="取消", size_hint_y=None, height=dp(30))
+    for button in (csv_btn, columnar_btn, cancel_btn):
+        action_bar.add_widget(button)
+    progress_label = MDLabel(
+        text="",
+        font_size=dp(13),
+        font_name="CustomChinese",
+        halign="center",
+        size_hint_y=None,
+        height=dp(24)
+    )
+    panel.add_widget(option_bar)
+    panel.add_widget(action_bar)
+    panel.add_widget(progress_label)
+
+    running = {"cancel": None}  # 正在进行的导出（同一时间只允许一个）
+
+    def set_running(cancel):
+        running["cancel"] = cancel
+        for button in (csv_btn, columnar_btn):
+            button.is_disabled = cancel is not None
+            button.update_button_colors()
+        cancel_btn.is_disabled = cancel is None
+        cancel_btn.update_button_colors()
+
+    def finish(message):
+        """主线程：导出结束（成功/失败/取消）"""
+        set_running(None)
+        progress_label.text = message
+        app_instance._update_recv_data(message)
+
+    def run_export(fmt, options, cancel):
+        """后台线程：分块读取数据库并写文件，进度切回主线程显示"""
+        store = app_instance.history_store
+        directory = export_directory(app_instance)
+        try:
+            store.flush()  # 先把内存队列中的样本落盘，导出结果包含最新数据
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, export_filename(options["source"], fmt, options["device_id"]))
+            rows = export_history(
+                store, path, fmt,
+                source=options["source"],
+                start_ts=options["start_ts"],
+                device_id=options["device_id"],
+                progress=lambda done, total: Clock.schedule_once(
+                    lambda dt: setattr(progress_label, "text", format_progress(done, total))),
+                cancel=cancel
+            )
+            shared = publish_export(path)
+            if shared is not None:
+                message = f"✅ 已导出{rows}行：Download/{SHARED_SUBDIR}/{os.path.basename(path)}"
+            else:
+                message = f"✅ 已导出{rows}行：{path}"
+            logger.info(message)
+        except ExportCancelled:
+            message = "⚠️ 导出已取消"
+        except Exception as e:
+            message = f"❌ 导出失败：{str(e)}"
+            logger.exception("导出失败")
+        Clock.schedule_once(lambda dt: finish(message))
+
+    def start_export(fmt):
+        if running["cancel"] is not None:
+            return
+        if app_instance.history_store is None:
+            progress_label.text = "❌ 历史数据库未初始化"
+            return
+        span = RANGE_OPTIONS[range_btn.option_index][1]
+        options = {
+            "start_ts": time.time() - span if span else None,
+            "source": SOURCE_OPTIONS[source_btn.option_index][1],
+            "device_id": get_selected_device() if DEVICE_OPTIONS[device_btn.option_index][1] else None,
+        }
+        cancel = Event()
+        set_running(cancel)
+        progress_label.text = "导出中..."
+        # 旧版Android先申请存储权限（拒绝时导出到App私有目录）
+        request_storage_permission(
+            lambda: Thread(target=run_export, args=(fmt, options, cancel), daemon=True).start())
+
+    def on_cancel(instance):
+        if running["cancel"] is not None:
+            running["cancel"].set()
+
+    csv_btn.bind(on_press=lambda instance: start_export(FORMAT_CSV))
+    columnar_btn.bind(on_press=lambda instance: start_export(FORMAT_COLUMNAR))
+    cancel_btn.bind(on_press=on_cancel)
+    set_running(None)
+    return panel
@@ -0,0 +1,173 @@
+# ui_history_page.py：历史数据页面（首次打开时才导入，缩短App冷启动时间）
+from kivymd.uix.boxlayout import MDBoxLayout
+from kivymd.uix.label import MDLabel
+from kivy.metrics import dp
+from ui_utils import RecycledListView, set_page_hooks
+from sample_buffer import format_sample
+from chart_source import HistoryChartSource
+from ui_trend_chart import TrendChart, format_range
+from ui_export import create_export_panel
+from app_ui_pages import (DEVICE_TABLE, ROLLUP_TABLE, get_selected_device,
+                          register_history_callback, unregister_history_callback,
+                          register_device_select_callback, unregister_device_select_callback)
+
+# 趋势图曲线：(指标, 图例名称, 颜色)
+CHART_SERIES = (
+    ("do", "溶解氧", (0.13, 0.45, 0.85, 1)),
+    ("ph", "PH", (0.2, 0.65, 0.3, 1)),
+    ("temp", "温度", (0.9, 0.5, 0.1, 1)),
+)
+
+# ======================== 历史数据页面 ========================
+def create_history_page(app_instance):
+    history_layout = MDBoxLayout(
+        orientation="vertical",
+        padding=dp(20),
+        spacing=dp(10),
+        size_hint=(1, 1),
+    )
+
+    history_title = MDLabel(
+        text="设备历史数据",
+        font_size=dp(22),
+        font_name="CustomChinese",
+        halign="center",
+        bold=True,
+        size_hint_y=None,
+        height=dp(60)
+    )
+    history_layout.add_widget(history_title)
+    device_title = MDLabel(
+        text=f"设备：{get_selected_device()}",
+        font_size=dp(16),
+        font_name="CustomChinese",
+        halign="center",
+        size_hint_y=None,
+        height=dp(30)
+    )
+    history_layout.add_widget(device_title)
+
+    def selected_history():
+        """当前设备的历史缓冲区（设备还没有数据时返回None）"""
+        state = DEVICE_TABLE.find(get_selected_device())
+        return state.history if state is not None and len(state.history) > 0 else None
+
+    # 趋势图：拖动平移、双指/滚轮缩放、双击回到实时
+    trend_chart = TrendChart(
+        source=HistoryChartSource(selected_history, lambda: ROLLUP_TABLE.find(get_selected_device())),
+        series=[(metric, color) for metric, _, color in CHART_SERIES],
+        size_hint_y=None,
+        height=dp(200)
+    )
+    legend_bar = MDBoxLayout(orientation="horizontal", spacing=dp(8), size_hint_y=None, height=dp(24))
+    legend_labels = {}
+    for metric, name, color in CHART_SERIES:
+        legend_labels[metric] = MDLabel(
+            text=f"{name} --",
+            font_size=dp(13),
+            font_name="CustomChinese",
+            theme_text_color="Custom",
+            text_color=color
+        )
+        legend_bar.add_widget(legend_labels[metric])
+    view_label = MDLabel(
+        text="",
+        font_size=dp(13),
+        font_name="CustomChinese",
+        halign="center",
+        size_hint_y=None,
+        height=dp(20)
+    )
+
+    def update_legend(chart, ranges):
+        for metric, name, _ in CHART_SERIES:
+            legend_labels[metric].text = f"{name} {format_range(metric, ranges.get(metric))}"
+
+    trend_chart.bind(ranges=update_legend)
+    trend_chart.bind(view_text=view_label.setter("text"))
+    history_layout.add_widget(trend_chart)
+    history_layout.add_widget(legend_bar)
+    history_layout.add_widget(view_label)
+    history_layout.add_widget(create_export_panel(app_instance))
+
+    # 无数据时的占位提示
+    placeholder_rows = [
+        "暂无历史数据，请先等待设备上传数据...",
+        "2026-01-11 16:00: 溶解氧7.25mg/L | PH7.0 | 温度25.5℃"
+    ]
+
+    def row_count():
+        history = selected_history()
+        return len(history) if history is not None else len(placeholder_rows)
+
+    def row_text(index):
+        # 只有滚动到可见区域的行才会格式化成文本
+        history = selected_history()
+        if history is None:
+            return placeholder_rows[index]
+        return format_sample(history.get(index))
+
+    def row_key(index):
+        history = selected_history()
+        if history is None:
+            return ("placeholder", index)
+        return (get_selected_device(), history.seq(index))
+
+    def row_color(index):
+        if selected_history() is None and index == 0:
+            return (0.8, 0, 0, 1)
+        return (0.2, 0.2, 0.2, 1)
+
+    # 虚拟化列表：只创建一屏的标签，新数据在顶部增量插入
+    history_list = RecycledListView(
+        row_count=row_count,
+        row_text=row_text,
+        row_key=row_key,
+        row_color=row_color,
+        row_height=dp(40),
+        size_hint=(1, 1),
+        scroll_type=['content', 'bars'],
+        bar_width=dp(1),
+        bar_color=(0.3, 0.3, 0.3, 1),
+        bar_inactive_color=(0.8, 0.8, 0.8, 1),
+        always_overscroll=True,
+        scroll_wheel_distance=dp(20)
+    )
+
+    def refresh_history_ui(new_counts):
+        # 只有当前设备有新数据时才刷新
+        new_count = new_counts.get(get_selected_device(), 0)
+        if new_count:
+            history_list.refresh(prepended=new_count)
+            trend_chart.refresh()
+
+    def on_device_selected(device_id):
+        device_title.text = f"设备：{device_id}"
+        history_list.scroll_y = 1
+        history_list.refresh()
+        trend_chart.reset()
+
+    history_layout.add_widget(history_list)
+
+    shown_device = None  # 上次显示时的设备（设备变化后回到顶部）
+
+    def on_show():
+        # 显示期间才注册回调（新数据到达时增量刷新，切换设备时整体刷新）
+        nonlocal shown_device
+        register_history_callback(refresh_history_ui)
+        register_device_select_callback(on_device_selected)
+        if shown_device != get_selected_device():
+            shown_device = get_selected_device()
+            on_device_selected(shown_device)
+        else:
+            # 隐藏期间到达的数据：页面停在顶部时直接显示最新数据
+            history_list.refresh()
+            trend_chart.refresh()
+
+    def on_hide():
+        # 隐藏后不再消费数据更新
+        unregister_history_callback(refresh_history_ui)
+        unregister_device_select_callback(on_device_selected)
+
+    set_page_hooks(history_layout, on_show=on_show, on_hide=on_hide)
+    return history_layout
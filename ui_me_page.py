@@ -0,0 +1,251 @@
+# ui_me_page.py：个人中心页面（首次打开时才导入，缩短App冷启动时间）
+from kivymd.uix.boxlayout import MDBoxLayout
+from kivymd.uix.label import MDLabel
+from kivy.metrics import dp
+from kivy.clock import Clock
+from ui_utils import NoBorderButton, RecycledListView, set_page_hooks
+from run_log import RUN_LOG, LEVEL_COLORS, format_entry
+from app_logging import set_payload_debug, is_payload_debug_enabled
+from app_ui_pages import CHANGE_FILTER
+from metrics import (REGISTRY, RateMeter, MESSAGES, BYTES_RECEIVED, RECONNECTS, DECODE_SECONDS,
+                     CLOCK_LAG_SECONDS, FRAME_SECONDS, HISTORY_WRITE_SECONDS, HISTORY_ROWS, QUEUE_DEPTH,
+                     INGEST_DROPPED)
+from mqtt_reconnect import STATE_IDLE, STATE_CONNECTING, STATE_CONNECTED, STATE_BACKOFF, STATE_FAILED, STATE_STOPPED
+
+# 连接状态 -> (文字, 颜色)
+STATE_DISPLAY = {
+    STATE_IDLE: ("未连接", (0.5, 0.5, 0.5, 1)),
+    STATE_CONNECTING: ("连接中", (0.9, 0.6, 0, 1)),
+    STATE_CONNECTED: ("已连接", (0, 0.8, 0, 1)),
+    STATE_BACKOFF: ("连接断开", (0.8, 0, 0, 1)),
+    STATE_FAILED: ("连接失败", (0.8, 0, 0, 1)),
+    STATE_STOPPED: ("已停止", (0.5, 0.5, 0.5, 1)),
+}
+
+
+def format_connection_status(status):
+    """ConnectionStateBridge -> 状态标签文字"""
+    text = f"服务器连接状态: {STATE_DISPLAY[status.state][0]}"
+    if status.state == STATE_CONNECTED:
+        if status.rtt_ms >= 0:
+            text += f" | 延迟{status.rtt_ms}ms"
+        if status.last_message_age >= 0:
+            text += f" | 最近消息{status.last_message_age}秒前"
+    elif status.state in (STATE_BACKOFF, STATE_FAILED) and status.retry_in >= 0:
+        text += f" | {status.retry_in}秒后重连（第{status.attempts}次）"
+    return text
+
+def _ms(histogram, q):
+    value = histogram.quantile(q)
+    return "--" if value is None else f"{value * 1000:.1f}"
+
+
+def format_metrics(topic_rates):
+    """运行指标摘要（多行文本）；topic_rates为{主题: 每秒消息数}"""
+    top = sorted(topic_rates.items(), key=lambda item: item[1], reverse=True)[:3]
+    rate_text = " | ".join(f"{topic} {rate:.1f}" for topic, rate in top) or "--"
+    return "\n".join((
+        f"消息速率（条/秒）：合计{sum(topic_rates.values()):.1f}  {rate_text}",
+        f"接收：{BYTES_RECEIVED.value / 1024:.1f}KB | 重连：{RECONNECTS.value}次 | 队列：{QUEUE_DEPTH.samples()[0][1]}条"
+        f"（丢弃{INGEST_DROPPED.total()}）",
+        f"解码 p50/p99：{_ms(DECODE_SECONDS, 0.5)}/{_ms(DECODE_SECONDS, 0.99)}ms | "
+        f"Clock延迟 p99：{_ms(CLOCK_LAG_SECONDS, 0.99)}ms",
+        f"帧间隔 p50/p99：{_ms(FRAME_SECONDS, 0.5)}/{_ms(FRAME_SECONDS, 0.99)}ms | "
+        f"历史写入 p99：{_ms(HISTORY_WRITE_SECONDS, 0.99)}ms（{HISTORY_ROWS.value}条）",
+    ))
+
+
+# ======================== 个人中心页面（唯一版本，删除重复定义） ========================
+def create_me_page(app_instance):
+    me_layout = MDBoxLayout(
+        orientation="vertical",
+        padding=dp(20),
+        spacing=dp(15),
+        size_hint_y=None,
+    )
+    me_layout.bind(minimum_height=me_layout.setter('height'))
+    me_layout.add_widget(MDLabel(
+        text="我的个人中心",
+        font_size=dp(20),
+        halign="center",
+        font_name="CustomChinese",
+        bold=True
+    ))
+    
+    # 显示MQTT连接状态：绑定到连接状态属性，状态变化只更新这一个标签
+    status_label = MDLabel(
+        text="服务器连接状态: 未初始化",
+        font_size=dp(16),
+        font_name="CustomChinese",
+        theme_text_color="Custom",
+        text_color=(0.5, 0.5, 0.5, 1)
+    )
+
+    def update_status_label(*args):
+        status = app_instance.connection_state
+        status_label.text = format_connection_status(status)
+        status_label.text_color = STATE_DISPLAY[status.state][1]
+
+    me_layout.add_widget(status_label)
+    
+    # 设备信息
+    me_layout.add_widget(MDLabel(
+        text="设备编号：DEV-20260111",
+        font_size=dp(16),
+        font_name="CustomChinese"
+    ))
+    me_layout.add_widget(MDLabel(
+        text="当前在线：是",
+        font_size=dp(16),
+        font_name="CustomChinese"
+    ))
+
+    # 调试开关：逐条输出传感器数据到控制台（默认关闭，数据量大时影响性能）
+    debug_layout = MDBoxLayout(
+        orientation="horizontal",
+        spacing=dp(10),
+        size_hint_y=None,
+        height=dp(30)
+    )
+    debug_label = MDLabel(
+        text="传感器数据调试日志",
+        font_size=dp(16),
+        font_name="CustomChinese",
+        valign="middle"
+    )
+    debug_switch = NoBorderButton(
+        button_type="switch",
+        size_hint_x=None,
+        width=dp(60),
+        size_hint_y=None,
+        height=dp(30)
+    )
+    debug_switch.current_state = "开" if is_payload_debug_enabled() else "关"
+    debug_switch.text = debug_switch.current_state
+    debug_switch.update_button_colors()
+
+    def toggle_payload_debug(instance):
+        instance.current_state = "开" if instance.current_state == "关" else "关"
+        instance.text = instance.current_state
+        instance.update_button_colors()
+        set_payload_debug(instance.current_state == "开")
+
+    debug_switch.bind(on_press=toggle_payload_debug)
+    debug_layout.add_widget(debug_label)
+    debug_layout.add_widget(debug_switch)
+    me_layout.add_widget(debug_layout)
+
+    # 变化记录开关：打开时数值在死区内的样本不写入历史（每5分钟仍记录一条心跳样本）
+    change_layout = MDBoxLayout(
+        orientation="horizontal",
+        spacing=dp(10),
+        size_hint_y=None,
+        height=dp(30)
+    )
+    change_label = MDLabel(
+        text="仅记录变化的数据",
+        font_size=dp(16),
+        font_name="CustomChinese",
+        valign="middle"
+    )
+    change_switch = NoBorderButton(
+        button_type="switch",
+        size_hint_x=None,
+        width=dp(60),
+        size_hint_y=None,
+        height=dp(30)
+    )
+    change_switch.current_state = "开" if CHANGE_FILTER.enabled else "关"
+    change_switch.text = change_switch.current_state
+    change_switch.update_button_colors()
+
+    def update_change_label():
+        change_label.text = f"仅记录变化的数据（已跳过{CHANGE_FILTER.suppressed}条）"
+
+    def toggle_change_filter(instance):
+        instance.current_state = "开" if instance.current_state == "关" else "关"
+        instance.text = instance.current_state
+        instance.update_button_colors()
+        CHANGE_FILTER.enabled = instance.current_state == "开"
+        CHANGE_FILTER.forget()
+
+    change_switch.bind(on_press=toggle_change_filter)
+    change_layout.add_widget(change_label)
+    change_layout.add_widget(change_switch)
+    me_layout.add_widget(change_layout)
+
+    # 运行指标：页面显示期间才开启计时类指标，每秒刷新一次
+    me_layout.add_widget(MDLabel(
+        text="运行指标",
+        font_size=dp(18),
+        font_name="CustomChinese",
+        bold=True,
+        size_hint_y=None,
+        height=dp(40)
+    ))
+    metrics_label = MDLabel(
+        text="",
+        font_size=dp(13),
+        font_name="CustomChinese",
+        size_hint_y=None,
+        height=dp(90)
+    )
+    me_layout.add_widget(metrics_label)
+    topic_rates = RateMeter(MESSAGES)
+    metrics_events = []
+
+    def refresh_metrics(*args):
+        metrics_label.text = format_metrics(topic_rates.rates())
+
+    # ========== 添加日志显示区域（原全局的日志移到这里） ==========
+    me_layout.add_widget(MDLabel(
+        text="运行日志",
+        font_size=dp(18),
+        font_name="CustomChinese",
+        bold=True,
+        size_hint_y=None,
+        height=dp(40)
+    ))
+    # 日志视图：虚拟化列表，新日志只生成一行的纹理，停留在底部时自动跟随最新日志
+    log_view = RecycledListView(
+        row_count=lambda: len(RUN_LOG),
+        row_text=lambda index: format_entry(RUN_LOG.get(index)),
+        row_key=RUN_LOG.seq,
+        row_color=lambda index: LEVEL_COLORS[RUN_LOG.get(index)[1]],
+        row_height=dp(22),
+        follow_tail=True,
+        label_kwargs={"font_size": dp(13), "shorten": True, "shorten_from": "right"},
+        size_hint=(1, None),
+        height=dp(200)
+    )
+    log_view.scroll_y = 0
+    me_layout.add_widget(log_view)
+
+    status_bindings = {"state": update_status_label, "rtt_ms": update_status_label,
+                       "last_message_age": update_status_label, "retry_in": update_status_label}
+
+    def on_show():
+        # 显示期间才绑定连接状态、接收新日志；隐藏期间的日志在重新显示时一次补上
+        if app_instance.connection_state:
+            app_instance.connection_state.bind(**status_bindings)
+            update_status_label()
+        app_instance.log_view = log_view
+        log_view.refresh()
+        update_change_label()
+        REGISTRY.acquire()
+        refresh_metrics()
+        metrics_events.append(Clock.schedule_interval(refresh_metrics, 1))
+        metrics_events.append(Clock.schedule_interval(FRAME_SECONDS.observe, 0))
+
+    def on_hide():
+        if app_instance.connection_state:
+            app_instance.connection_state.unbind(**status_bindings)
+        app_instance.log_view = None
+        if metrics_events:
+            for event in metrics_events:
+                event.cancel()
+            metrics_events.clear()
+            REGISTRY.release()
+
+    set_page_hooks(me_layout, on_show=on_show, on_hide=on_hide, on_destroy=on_hide)
+    return me_layout
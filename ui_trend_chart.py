@@ -0,0 +1,179 @@
+# ui_trend_chart.py：溶解氧/PH/温度实时趋势图
+# 直接用画布指令绘制：每条曲线一个Line，刷新时原地替换points，不为每个点创建控件
+# 数据源只返回可见范围内抽稀后的点（点数≈绘图区域宽度的像素数）；单指拖动平移，双指/滚轮缩放，双击回到实时
+import datetime
+
+from kivy.clock import Clock
+from kivy.graphics import Color, Line, Rectangle
+from kivy.metrics import dp
+from kivy.properties import BooleanProperty, DictProperty, StringProperty
+from kivy.uix.widget import Widget
+
+MIN_SPAN = 60.0               # 最小可见范围（秒）
+MAX_SPAN = 7 * 24 * 3600.0    # 最大可见范围（秒）
+DEFAULT_SPAN = 3600.0         # 默认显示最近1小时
+DATA_REFRESH_INTERVAL = 0.5   # 新数据到达时最多每0.5秒重画一次
+ZOOM_STEP = 1.25              # 滚轮每格的缩放倍数
+GRID_LINES = 4
+
+
+class TrendChart(Widget):
+    """
+    多指标趋势图：各指标按可见范围内的最小/最大值各自缩放到整个绘图区域
+    数据源需提供time_range()和series(start_ts, end_ts, max_points)（见chart_source.py）
+    """
+
+    view_text = StringProperty("")  # 当前可见时间范围（供页面上的标签绑定）
+    live = BooleanProperty(True)    # 是否跟随最新数据
+    ranges = DictProperty({})       # 指标 -> 可见范围内的(最小值, 最大值)（供图例绑定）
+
+    def __init__(self, source, series, span=DEFAULT_SPAN, **kwargs):
+        """
+        :param source: 数据源
+        :param series: [(指标, 颜色rgba), ...]，决定绘制哪些曲线
+        :param span: 初始可见范围（秒）
+        """
+        super().__init__(**kwargs)
+        self.source = source
+        self.span = span
+        self.view_end = None  # 可见范围的结束时间（live时跟随最新数据）
+        self._touches = []
+        self._lines = {}
+        with self.canvas:
+            Color(0.97, 0.97, 0.97, 1)
+            self._background = Rectangle()
+            Color(0.85, 0.85, 0.85, 1)
+            self._grid = [Line(width=1) for _ in range(GRID_LINES)]
+            for metric, rgba in series:
+                Color(*rgba)
+                self._lines[metric] = Line(width=dp(1.2))
+        self._redraw_trigger = Clock.create_trigger(self._redraw)
+        self._data_trigger = Clock.create_trigger(self._redraw, DATA_REFRESH_INTERVAL)
+        self.bind(pos=self._redraw_trigger, size=self._redraw_trigger)
+
+    # ---------- 外部调用 ----------
+    def refresh(self, *args):
+        """有新数据时调用：跟随最新数据时限频重画，查看历史时不用重画"""
+        if self.live:
+            self._data_trigger()
+
+    def reset(self, *args):
+        """回到实时、默认范围（切换设备、双击时）"""
+        self.live = True
+        self.span = DEFAULT_SPAN
+        self.view_end = None
+        self._redraw_trigger()
+
+    # ---------- 绘制 ----------
+    def _redraw(self, *args):
+        self._background.pos = self.pos
+        self._background.size = self.size
+        for index, line in enumerate(self._grid):
+            y = self.y + self.height * (index + 1) / (GRID_LINES + 1)
+            line.points = [self.x, y, self.right, y]
+
+        time_range = self.source.time_range()
+        if time_range is None or self.width <= 1:
+            for line in self._lines.values():
+                line.points = []
+            self.ranges = {}
+            self.view_text = "暂无数据"
+            return
+        newest = time_range[1]
+        if self.live or self.view_end is None:
+            self.view_end = newest
+        start = self.view_end - self.span
+        series = self.source.series(start, self.view_end, max(3, int(self.width)))
+
+        x_scale = self.width / self.span
+        ranges = {}
+        for metric, line in self._lines.items():
+            xs, ys = series.get(metric, ((), ()))
+            if not ys:
+                line.points = []
+                continue
+            low, high = min(ys), max(ys)
+            pad = (high - low) * 0.1 or 0.5
+            low, high = low - pad, high + pad
+            y_scale = self.height / (high - low)
+            points = []
+            for x, y in zip(xs, ys):
+                points.append(self.x + (x - start) * x_scale)
+                points.append(self.y + (y - low) * y_scale)
+            line.points = points
+            ranges[metric] = (low + pad, high - pad)
+        self.ranges = ranges
+        fmt = "%m-%d %H:%M" if self.span >= 86400 else "%H:%M:%S"
+        self.view_text = "{} ~ {}{}".format(
+            datetime.datetime.fromtimestamp(start).strftime(fmt),
+            datetime.datetime.fromtimestamp(self.view_end).strftime(fmt),
+            "（实时）" if self.live else "")
+
+    # ---------- 平移/缩放 ----------
+    def _zoom(self, factor, anchor_x):
+        """以anchor_x（像素）对应的时间为中心缩放"""
+        span = min(MAX_SPAN, max(MIN_SPAN, self.span * factor))
+        if self.view_end is None or span == self.span:
+            return
+        ratio = (anchor_x - self.x) / self.width if self.width else 1.0
+        anchor_ts = self.view_end - self.span * (1 - ratio)
+        self.span = span
+        self._pan_to(anchor_ts + span * (1 - ratio))
+
+    def _pan_to(self, view_end):
+        time_range = self.source.time_range()
+        if time_range is None:
+            return
+        oldest, newest = time_range
+        # 拖到最新数据之后时回到实时；最早只能拖到最旧数据出现在右边缘
+        self.live = view_end >= newest
+        self.view_end = newest if self.live else max(oldest, view_end)
+        self._redraw_trigger()
+
+    def on_touch_down(self, touch):
+        if not self.collide_point(*touch.pos):
+            return super().on_touch_down(touch)
+        if getattr(touch, "is_mouse_scrolling", False):
+            if touch.button == "scrollup":
+                self._zoom(ZOOM_STEP, touch.x)
+            elif touch.button == "scrolldown":
+                self._zoom(1 / ZOOM_STEP, touch.x)
+            return True
+        if touch.is_double_tap:
+            self.reset()
+            return True
+        touch.grab(self)
+        self._touches.append(touch)
+        return True
+
+    def on_touch_move(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_move(touch)
+        if self.view_end is None or not self.width:
+            return True
+        if len(self._touches) == 1:
+            self._pan_to(self.view_end - touch.dx / self.width * self.span)
+        elif len(self._touches) == 2:
+            # 双指缩放：两指水平距离变化的倍数
+            other = self._touches[0] if self._touches[1] is touch else self._touches[1]
+            before = abs((touch.x - touch.dx) - other.x)
+            after = abs(touch.x - other.x)
+            if before > dp(10) and after > dp(10):
+                self._zoom(before / after, (touch.x + other.x) / 2)
+        return True
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+        touch.ungrab(self)
+        if touch in self._touches:
+            self._touches.remove(touch)
+        return True
+
+
+def format_range(metric, value_range):
+    """图例文字：可见范围内的最小~最大值"""
+    if value_range is None:
+        return "--"
+    digits = 2 if metric == "do" else 1
+    return f"{round(value_range[0], digits)}~{round(value_range[1], digits)}"
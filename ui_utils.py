@@ -4,6 +4,9 @@ from kivy.uix.button import ButtonBehavior
 from kivy.core.text import LabelBase
 from kivy.metrics import dp
 from kivy.clock import Clock
+from kivy.uix.scrollview import ScrollView
+from kivy.uix.relativelayout import RelativeLayout
+from collections import OrderedDict
 
 # 通用按钮组件
 class NoBorderButton(ButtonBehavior, MDLabel):
@@ -52,6 +55,102 @@ class NoBorderButton(ButtonBehavior, MDLabel):
             self.is_pressed = False
             self.update_button_colors()
 
+# 虚拟化列表组件：只创建可见行数量的标签，滚动或新增数据时复用
+class RecycledListView(ScrollView):
+    def __init__(self, row_count, row_text, row_key=None, row_color=None, row_height=dp(40),
+                 follow_tail=False, label_kwargs=None, **kwargs):
+        """
+        :param row_count: 返回总行数的函数
+        :param row_text: 根据行号（0为最上面一行）返回文本的函数，只对可见行调用
+        :param row_key: 根据行号返回该行数据的唯一标识；数据在顶部插入时，
+                        标识不变的行只移动位置，不重新生成文字纹理
+        :param row_color: 根据行号返回文字颜色的函数（可选）
+        :param row_height: 固定行高（固定行高才能O(1)算出可见范围）
+        :param follow_tail: 已滚动到底部时，新增数据后继续停留在底部（用于日志）
+        :param label_kwargs: 行标签的额外参数（如字号、超长截断）
+        """
+        kwargs.setdefault("do_scroll_x", False)
+        super().__init__(**kwargs)
+        self.row_count = row_count
+        self.row_text = row_text
+        self.row_key = row_key or (lambda index: index)
+        self.row_color = row_color
+        self.row_height = row_height
+        self.follow_tail = follow_tail
+        self.label_kwargs = label_kwargs or {}
+        self._count = 0
+        self._rows = []  # 标签池
+        self.content = RelativeLayout(size_hint=(1, None), height=0)
+        self.add_widget(self.content)
+        self.bind(scroll_y=self._refresh_rows, height=self._on_resize)
+
+    def _on_resize(self, *args):
+        # 标签池大小 = 一屏可见行数 + 2（滚动时上下各露出半行）
+        needed = int(self.height // self.row_height) + 2
+        while len(self._rows) < needed:
+            options = dict(
+                font_size=dp(16),
+                font_name="CustomChinese",
+                halign="left",
+                valign="middle",
+                theme_text_color="Custom",
+                text_color=(0.2, 0.2, 0.2, 1)
+            )
+            options.update(self.label_kwargs)
+            label = MDLabel(size_hint=(1, None), height=self.row_height, opacity=0, **options)
+            label.row_key = None
+            self._rows.append(label)
+            self.content.add_widget(label)
+        self.refresh()
+
+    def _first_visible(self):
+        scrollable = self.content.height - self.height
+        if scrollable <= 0:
+            return 0
+        return int((1 - self.scroll_y) * scrollable // self.row_height)
+
+    def _refresh_rows(self, *args):
+        first = self._first_visible()
+        last = min(first + len(self._rows), self._count)
+        wanted = {self.row_key(index): index for index in range(first, last)}
+        # 1. 仍然可见的行原样保留（只改位置），其余标签回收
+        free = []
+        for label in self._rows:
+            if label.row_key in wanted:
+                index = wanted.pop(label.row_key)
+                label.y = self.content.height - (index + 1) * self.row_height
+            else:
+                free.append(label)
+        # 2. 新出现的行复用回收的标签
+        for key, index in wanted.items():
+            label = free.pop()
+            label.row_key = key
+            label.text = self.row_text(index)
+            if self.row_color:
+                label.text_color = self.row_color(index)
+            label.y = self.content.height - (index + 1) * self.row_height
+            label.opacity = 1
+        for label in free:
+            label.row_key = None
+            label.opacity = 0
+
+    def refresh(self, prepended=0):
+        """
+        数据变化后调用
+        :param prepended: 顶部新增的行数；用户已向下滚动时保持当前看到的行不跳动
+        """
+        scrollable = self.content.height - self.height
+        offset = (1 - self.scroll_y) * scrollable if scrollable > 0 else 0
+        at_tail = self.follow_tail and (scrollable <= 0 or self.scroll_y <= 0)
+        if offset > 0:
+            offset += prepended * self.row_height
+        self._count = self.row_count()
+        self.content.height = self._count * self.row_height
+        scrollable = self.content.height - self.height
+        if scrollable > 0:
+            self.scroll_y = 0 if at_tail else 1 - min(offset, scrollable) / scrollable
+        self._refresh_rows()
+
 # 注册中文字体
 def register_chinese_font():
     LabelBase.register(
@@ -59,23 +158,105 @@ def register_chinese_font():
         fn_regular="Font_0.ttf"
     )
 
-# 页面切换工具函数（优化回调清理）
+# ======================== 页面管理 ========================
+def set_page_hooks(page, on_show=None, on_hide=None, on_destroy=None):
+    """
+    给页面挂上生命周期钩子（由PageManager调用，均在主线程执行）
+    :param on_show: 页面显示时调用（重新订阅数据、把隐藏期间的变化同步到界面）
+    :param on_hide: 页面隐藏时调用（停止消费数据更新）
+    :param on_destroy: 页面被移出缓存时调用（释放回调等资源）
+    """
+    page.on_page_show = on_show
+    page.on_page_hide = on_hide
+    page.on_page_destroy = on_destroy
+
+
+def _call_page_hook(page, name):
+    hook = getattr(page, name, None)
+    if hook:
+        hook()
+
+
+def _build_home_page(app_instance):
+    from app_ui_pages import create_home_page
+    return create_home_page(app_instance)
+
+
+def _build_me_page(app_instance):
+    # 历史/个人中心页面第一次打开时才导入（不占用冷启动时间）
+    from ui_me_page import create_me_page
+    return create_me_page(app_instance)
+
+
+def _build_history_page(app_instance):
+    from ui_history_page import create_history_page
+    return create_history_page(app_instance)
+
+
+PAGE_FACTORIES = {
+    "home": _build_home_page,
+    "me": _build_me_page,
+    "history": _build_history_page,
+}
+
+
+class PageManager:
+    """
+    每个页面只构建一次，切换时只做挂载/卸载，不重新创建控件
+    常驻页面（首页）始终保留；其余页面按最近使用顺序缓存，超过容量时销毁最久未用的页面
+    """
+
+    def __init__(self, app_instance, container, factories=None, pinned=("home",), capacity=3):
+        """
+        :param container: 页面容器（同一时间只挂载一个页面）
+        :param factories: {页面名: 构建函数(app_instance) -> 页面}，默认PAGE_FACTORIES
+        :param pinned: 常驻页面，不参与淘汰
+        :param capacity: 最多缓存的页面数（含常驻页面和当前页面）
+        """
+        self.app_instance = app_instance
+        self.container = container
+        self.factories = factories or PAGE_FACTORIES
+        self.pinned = set(pinned)
+        self.capacity = capacity
+        self._pages = OrderedDict()  # 页面名 -> 页面（按最近使用排序）
+        self.current_name = None
+
+    @property
+    def current_page(self):
+        return self._pages.get(self.current_name)
+
+    def get(self, name):
+        """已构建的页面（未构建或已被淘汰时返回None）"""
+        return self._pages.get(name)
+
+    def show(self, name):
+        """切换到指定页面（已是当前页面时不做任何事）"""
+        if name == self.current_name:
+            return self.current_page
+        old_page = self.current_page
+        if old_page is not None:
+            _call_page_hook(old_page, "on_page_hide")
+            self.container.remove_widget(old_page)
+        page = self._pages.get(name)
+        if page is None:
+            page = self._pages[name] = self.factories[name](self.app_instance)
+        self._pages.move_to_end(name)
+        self.current_name = name
+        self.app_instance.current_page = page
+        self.container.add_widget(page)
+        _call_page_hook(page, "on_page_show")
+        self._evict()
+        return page
+
+    def _evict(self):
+        for name in list(self._pages):
+            if len(self._pages) <= self.capacity:
+                return
+            if name in self.pinned or name == self.current_name:
+                continue
+            _call_page_hook(self._pages.pop(name), "on_page_destroy")
+
+
+# 页面切换工具函数（保留原调用方式，实际由PageManager完成）
 def switch_page(app_instance, page_name):
-    from app_ui_pages import create_home_page, create_me_page, create_history_page, unregister_history_callback, HISTORY_UPDATE_CALLBACKS
-    # 清理当前页面的回调（如果是历史页面）
-    if hasattr(app_instance, 'current_page') and app_instance.current_page:
-        page_texts = [child.text for child in app_instance.current_page.children if isinstance(child, MDLabel)]
-        if "设备历史数据" in page_texts:
-            # 注销所有历史数据回调
-            for cb in HISTORY_UPDATE_CALLBACKS[:]:
-                unregister_history_callback(cb)
-    
-    app_instance.page_container.clear_widgets()
-    if page_name == "home":
-        app_instance.current_page = create_home_page(app_instance)
-    elif page_name == "me":
-        app_instance.current_page = create_me_page(app_instance)
-    elif page_name == "history":
-        # 每次切换到历史页面都重新创建，确保加载最新数据
-        app_instance.current_page = create_history_page(app_instance)
-    app_instance.page_container.add_widget(app_instance.current_page)
\ No newline at end of file
+    app_instance.page_manager.show(page_name)